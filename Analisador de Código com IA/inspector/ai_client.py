@@ -1,21 +1,400 @@
+import json
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Iterator
 import requests
+from requests.adapters import HTTPAdapter
 import config
+import metrics
+from rate_limiter import RateLimiter
 
-def chat(messages: list[dict]) -> str:
+# Limitador compartilhado por todas as chamadas (e threads) do processo
+rate_limiter = RateLimiter(config.LLM_REQUESTS_PER_MINUTE, config.LLM_TOKENS_PER_MINUTE)
+
+# Status HTTP considerados temporários: a requisição é reenviada
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class RetryableError(Exception):
+    """
+    Falha temporária (timeout, conexão, HTTP 5xx/429); a requisição pode ser reenviada.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimitError(RetryableError):
+    """
+    A API recusou a requisição por excesso de uso (HTTP 429).
+    """
+
+# --- Limite global de requisições simultâneas ---
+# Vale para todas as threads do processo (ex: vários projetos analisados ao mesmo tempo pela CLI).
+_in_flight = threading.BoundedSemaphore(config.LLM_MAX_IN_FLIGHT) if config.LLM_MAX_IN_FLIGHT > 0 else None
+
+def set_max_in_flight(limit: int) -> None:
+    """
+    Define quantas requisições à API podem estar em andamento ao mesmo tempo no processo (0 = sem limite).
+    Deve ser chamada antes do início das análises.
+    """
+    global _in_flight
+    _in_flight = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+# --- Sessão HTTP compartilhada ---
+# Uma única sessão mantém as conexões TCP/TLS abertas (keep-alive) entre as chamadas.
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # O pool precisa comportar todas as threads do Map ao mesmo tempo
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+# --- Estatísticas das chamadas ---
+
+class CallStats:
+    """
+    Registro das últimas chamadas à API (latência, tentativas e resultado), seguro entre threads.
+
+    Cópias "hedged" e trocas de modelo também contam como chamadas; as taxas de summary()
+    são calculadas sobre as requisições originais (chamadas menos cópias e trocas).
+    Cada POST enviado (tentativas, cópias e trocas incluídas) conta em 'requests'.
+    """
+
+    def __init__(self, max_calls: int = 1000):
+        self._lock = threading.Lock()
+        self._max_calls = max_calls
+        self._calls = deque(maxlen=max_calls)
+        # Modelo -> latências das últimas chamadas bem-sucedidas (espera das requisições hedged)
+        self._model_calls = {}
+        self.total_calls = 0
+        self.total_requests = 0
+        self.total_retries = 0
+        self.total_failures = 0
+        self.total_hedges = 0
+        self.hedge_wins = 0
+        self.total_fallbacks = 0
+
+    def record(self, latency: float, attempts: int, ok: bool, model: str | None = None) -> None:
+        with self._lock:
+            self._calls.append(latency)
+            self.total_calls += 1
+            self.total_retries += attempts - 1
+            if not ok:
+                self.total_failures += 1
+            elif model is not None:
+                self._model_calls.setdefault(model, deque(maxlen=self._max_calls)).append(latency)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.total_requests += 1
+
+    def record_hedge(self, won: bool) -> None:
+        with self._lock:
+            self.total_hedges += 1
+            if won:
+                self.hedge_wins += 1
+
+    def record_fallback(self) -> None:
+        with self._lock:
+            self.total_fallbacks += 1
+
+    def model_latency_p95(self, model: str) -> tuple[float, int]:
+        """
+        Returns:
+            tuple[float, int]: p95 da latência das chamadas bem-sucedidas ao modelo e a quantidade delas.
+        """
+        with self._lock:
+            latencies = sorted(self._model_calls.get(model, ()))
+        if not latencies:
+            return 0.0, 0
+        return latencies[int(0.95 * (len(latencies) - 1))], len(latencies)
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: 'calls', 'requests' (POSTs enviados à API), 'retries', 'failures', 'hedges',
+            'hedge_wins', 'fallbacks', 'hedge_rate' e 'fallback_rate' (frações das requisições originais),
+            'latency_p50' e 'latency_p95' (segundos).
+        """
+        with self._lock:
+            latencies = sorted(self._calls)
+            requests_made = max(1, self.total_calls - self.total_hedges - self.total_fallbacks)
+            result = {
+                "calls": self.total_calls,
+                "requests": self.total_requests,
+                "retries": self.total_retries,
+                "failures": self.total_failures,
+                "hedges": self.total_hedges,
+                "hedge_wins": self.hedge_wins,
+                "fallbacks": self.total_fallbacks,
+                "hedge_rate": self.total_hedges / requests_made,
+                "fallback_rate": self.total_fallbacks / requests_made,
+                "latency_p50": 0.0,
+                "latency_p95": 0.0
+            }
+        if latencies:
+            result["latency_p50"] = latencies[int(0.50 * (len(latencies) - 1))]
+            result["latency_p95"] = latencies[int(0.95 * (len(latencies) - 1))]
+        return result
+
+# Estatísticas acumuladas de todas as chamadas do processo
+call_stats = CallStats()
+
+class RequestCounter:
+    """
+    Requisições de um conjunto de chamadas (ex: uma análise), somadas a partir do call_info
+    de cada uma, seguro entre threads. Ao contrário de call_stats, não mistura análises simultâneas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # POSTs enviados: novas tentativas, cópias "hedged" e trocas de modelo incluídas
+        self.requests = 0
+        self.hedges = 0
+        self.fallbacks = 0
+
+    def add(self, call_info: dict) -> None:
+        with self._lock:
+            self.requests += call_info.get("requests", 0)
+            self.hedges += 1 if call_info.get("hedged") else 0
+            self.fallbacks += call_info.get("fallbacks", 0)
+
+def estimate_tokens(messages: list[dict]) -> int:
+    """
+    Estimativa barata de tokens de uma lista de mensagens (~4 caracteres por token).
+    """
+    return sum(len(m.get("content", "")) for m in messages) // 4 + 1
+
+def _record_usage(usage, call_info: dict | None) -> None:
+    """
+    Registra os tokens reais informados pela API no campo "usage" (prompt e resposta).
+    """
+    if not isinstance(usage, dict):
+        return
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    metrics.registry.inc("llm_prompt_tokens", prompt_tokens)
+    metrics.registry.inc("llm_completion_tokens", completion_tokens)
+    if call_info is not None:
+        call_info["prompt_tokens"] = prompt_tokens
+        call_info["completion_tokens"] = completion_tokens
+
+def _record_call(latency: float, attempts: int, ok: bool, model: str | None = None) -> None:
+    call_stats.record(latency, attempts, ok, model)
+    metrics.registry.inc("llm_requests", outcome="ok" if ok else "error")
+    if attempts > 1:
+        metrics.registry.inc("llm_retries", attempts - 1)
+
+def _parse_retry_after(value: str | None) -> float | None:
+    # O OpenRouter envia Retry-After em segundos
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+def _backoff_delay(attempt: int) -> float:
+    """
+    Espera antes da nova tentativa: exponencial com "jitter" completo, para que várias
+    threads que falharam juntas não tentem de novo todas ao mesmo tempo.
+    """
+    ceiling = min(config.RETRY_BACKOFF_MAX_SECONDS, config.RETRY_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+def _model_chain(model: str | None) -> list[str]:
+    """
+    Modelos tentados em ordem: o pedido (padrão: config.OPENROUTER_MODEL) e os de config.FALLBACK_MODELS.
+    """
+    chain = [model or config.OPENROUTER_MODEL]
+    for fallback in config.FALLBACK_MODELS:
+        if fallback not in chain:
+            chain.append(fallback)
+    return chain
+
+def _record_fallback(model: str, call_info: dict | None) -> None:
+    call_stats.record_fallback()
+    metrics.registry.inc("llm_fallbacks", model=model)
+    if call_info is not None:
+        call_info["fallbacks"] = call_info.get("fallbacks", 0) + 1
+
+def _count_request(call_info: dict | None) -> None:
+    # Cada tentativa é um POST à API (ver call_stats.record_request, em _post)
+    if call_info is not None:
+        call_info["requests"] = call_info.get("requests", 0) + 1
+
+def chat(messages: list[dict], call_info: dict | None = None, model: str | None = None, hedge: bool = False) -> str:
     """
     Envia uma lista de mensagens para a API do OpenRouter e retorna o texto da resposta.
-    
+
+    Usa uma sessão HTTP com conexões reaproveitadas e respeita o limite de requisições/tokens
+    por minuto. Timeouts, erros de conexão e respostas 429/5xx são reenviados (até
+    config.HTTP_MAX_RETRIES vezes) com espera exponencial e aleatória, ou pelo tempo indicado
+    em Retry-After. Um 429 pausa todas as chamadas do processo, não só a atual.
+
+    Se o modelo continuar falhando, a mesma requisição vai para os modelos de
+    config.FALLBACK_MODELS, em ordem.
+
     Args:
         messages (list[dict]): Lista de mensagens no formato [{"role": "user", "content": "Olá"}].
-        
+        call_info (dict | None): Se informado, é preenchido com 'latency' (segundos, incluindo
+            esperas e trocas de modelo), 'attempts' e 'model' (o modelo que respondeu), 'requests'
+            (POSTs enviados, com novas tentativas, cópias e trocas de modelo), 'fallbacks' (trocas
+            de modelo), 'hedged' quando uma cópia foi enviada, além de 'prompt_tokens' e
+            'completion_tokens' quando a API informa o consumo.
+        model (str | None): Modelo da requisição. Padrão: config.OPENROUTER_MODEL.
+        hedge (bool): Envia uma cópia da requisição se a resposta demorar (ver _hedged_chat).
+
     Returns:
         str: O conteúdo da resposta da IA.
-        
+
     Raises:
         ValueError: Se a chave da API não estiver configurada.
+        RateLimitError: Se a API continuar respondendo 429 após as novas tentativas.
         Exception: Para erros de conexão, timeout ou erros na resposta da API.
     """
-    
+    models = _model_chain(model)
+    started = time.perf_counter()
+    try:
+        for index, current in enumerate(models):
+            try:
+                if hedge:
+                    result = _hedged_chat(messages, current, call_info)
+                else:
+                    result = _chat_model(messages, current, call_info)
+            except ValueError:
+                # Erro de configuração: nenhum modelo resolveria
+                raise
+            except Exception:
+                if index + 1 == len(models):
+                    raise
+                _record_fallback(current, call_info)
+                continue
+            if call_info is not None:
+                call_info["model"] = current
+            return result
+    finally:
+        if call_info is not None:
+            call_info["latency"] = time.perf_counter() - started
+
+def _hedge_delay(model: str) -> float | None:
+    """
+    Espera antes de enviar a cópia de uma requisição: config.HEDGE_DELAY_SECONDS, ou o p95
+    das últimas chamadas bem-sucedidas ao modelo (None enquanto houver poucas amostras).
+    """
+    if config.HEDGE_DELAY_SECONDS > 0:
+        return config.HEDGE_DELAY_SECONDS
+    p95, samples = call_stats.model_latency_p95(model)
+    if samples < config.HEDGE_MIN_SAMPLES:
+        return None
+    return max(config.HEDGE_MIN_DELAY_SECONDS, p95)
+
+def _hedged_chat(messages: list[dict], model: str, call_info: dict | None = None) -> str:
+    """
+    _chat_model com requisição "hedged": se a resposta não chegar em _hedge_delay(model), uma cópia
+    é enviada e vale a primeira resposta bem-sucedida. A requisição mais lenta não é cancelada
+    (termina em segundo plano e só entra nas estatísticas).
+    """
+    delay = _hedge_delay(model)
+    if delay is None:
+        return _chat_model(messages, model, call_info)
+
+    results = queue.Queue()
+    # call_info de cada requisição (original e cópia), para somar os POSTs das duas
+    infos = {False: {}, True: {}}
+
+    def run(is_hedge: bool) -> None:
+        info = infos[is_hedge]
+        try:
+            results.put((is_hedge, _chat_model(messages, model, info), None, info))
+        except Exception as e:
+            results.put((is_hedge, None, e, info))
+
+    threading.Thread(target=run, args=(False,), daemon=True).start()
+    try:
+        is_hedge, result, error, info = results.get(timeout=delay)
+        hedged = False
+    except queue.Empty:
+        # 1. Sem resposta no tempo esperado: envia a cópia e aguarda a primeira que terminar
+        threading.Thread(target=run, args=(True,), daemon=True).start()
+        metrics.registry.inc("llm_hedges", model=model)
+        hedged = True
+        is_hedge, result, error, info = results.get()
+        # 2. Se a primeira a terminar falhou, ainda vale a resposta da outra
+        if error is not None:
+            is_hedge, result, error, info = results.get()
+        won = error is None and is_hedge
+        call_stats.record_hedge(won)
+        if won:
+            metrics.registry.inc("llm_hedge_wins", model=model)
+
+    if call_info is not None:
+        # A cópia mais lenta continua em segundo plano: as tentativas dela até aqui já contam
+        requests_before = call_info.get("requests", 0)
+        call_info.update(info)
+        call_info["requests"] = requests_before + sum(i.get("requests", 0) for i in infos.values())
+        call_info["hedged"] = hedged
+    if error is not None:
+        raise error
+    return result
+
+def _chat_model(messages: list[dict], model: str, call_info: dict | None = None) -> str:
+    """
+    Envia a requisição a um único modelo, com limitação de taxa e novas tentativas (ver chat()).
+    """
+    tokens = estimate_tokens(messages)
+    started = time.perf_counter()
+    attempts = 0
+    ok = False
+
+    try:
+        while True:
+            attempts += 1
+            rate_limiter.acquire(tokens)
+            _count_request(call_info)
+            try:
+                slot = _in_flight
+                if slot is not None:
+                    with slot:
+                        result = _send(messages, model, call_info)
+                else:
+                    result = _send(messages, model, call_info)
+                ok = True
+                return result
+            except RetryableError as e:
+                if attempts > config.HTTP_MAX_RETRIES:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else _backoff_delay(attempts)
+                if isinstance(e, RateLimitError):
+                    metrics.registry.inc("llm_rate_limited")
+                    rate_limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+    finally:
+        latency = time.perf_counter() - started
+        _record_call(latency, attempts, ok, model)
+        if call_info is not None:
+            call_info["latency"] = latency
+            call_info["attempts"] = attempts
+
+def _build_request(messages: list[dict], stream: bool = False, model: str | None = None) -> tuple[dict, dict]:
+    """
+    Monta os headers e o payload de uma requisição de chat (modelo padrão: config.OPENROUTER_MODEL).
+
+    Returns:
+        tuple[dict, dict]: Headers e payload (corpo JSON).
+    """
+
     # 1. Verificação da Chave da API
     if not config.OPENROUTER_API_KEY:
         raise ValueError(
@@ -34,53 +413,240 @@ def chat(messages: list[dict]) -> str:
 
     # 3. Preparação do Payload (corpo da requisição)
     payload = {
-        "model": config.OPENROUTER_MODEL,
+        "model": model or config.OPENROUTER_MODEL,
         "messages": messages
     }
+    if stream:
+        payload["stream"] = True
+
+    return headers, payload
+
+def _raise_for_status(response: requests.Response) -> None:
+    """
+    Converte respostas HTTP diferentes de 200 em exceções com a mensagem de erro da API.
+
+    Raises:
+        RateLimitError: Para HTTP 429.
+        RetryableError: Para HTTP 5xx temporários.
+        Exception: Para os demais erros.
+    """
+    if response.status_code == 200:
+        return
+
+    error_detail = "Sem detalhes disponíveis."
+    try:
+        # Tenta ler o JSON de erro da API para dar uma mensagem mais útil
+        json_error = response.json()
+        if "error" in json_error:
+            error_detail = json_error["error"].get("message", str(json_error["error"]))
+        else:
+            error_detail = response.text
+    except ValueError:
+        # Se a resposta não for JSON, usa o texto puro
+        error_detail = response.text
+
+    message = f"Erro na API ({response.status_code}): {error_detail}"
+    retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+
+    if response.status_code == 429:
+        raise RateLimitError(message, retry_after=retry_after)
+    if response.status_code in RETRYABLE_STATUS:
+        raise RetryableError(message, retry_after=retry_after)
 
+    raise Exception(message)
+
+def _post(headers: dict, payload: dict, stream: bool = False) -> requests.Response:
+    """
+    Executa o POST na sessão compartilhada, convertendo erros de rede em exceções com mensagens claras.
+    Em modo stream, o timeout de leitura vale para o intervalo entre pedaços da resposta.
+
+    Raises:
+        RetryableError: Para timeout, falha de conexão e HTTP 429/5xx.
+        Exception: Para os demais erros.
+    """
+    call_stats.record_request()
+    metrics.registry.inc("llm_http_requests", model=payload.get("model"))
     try:
-        # 4. Execução da Requisição POST
-        response = requests.post(
+        # Execução da Requisição POST (timeouts separados de conexão e de leitura)
+        response = _get_session().post(
             config.OPENROUTER_URL,
             headers=headers,
             json=payload,
-            timeout=config.TIMEOUT_SECONDS
+            timeout=(config.CONNECT_TIMEOUT_SECONDS, config.TIMEOUT_SECONDS),
+            stream=stream
         )
 
-        # 5. Tratamento de Erros HTTP (Status Code diferente de 200)
-        if response.status_code != 200:
-            error_detail = "Sem detalhes disponíveis."
-            try:
-                # Tenta ler o JSON de erro da API para dar uma mensagem mais útil
-                json_error = response.json()
-                if "error" in json_error:
-                    error_detail = json_error["error"].get("message", str(json_error["error"]))
-                else:
-                    error_detail = response.text
-            except ValueError:
-                # Se a resposta não for JSON, usa o texto puro
-                error_detail = response.text
-
-            raise Exception(
-                f"Erro na API ({response.status_code}): {error_detail}"
-            )
-
-        # 6. Extração do Conteúdo da Resposta
-        data = response.json()
-        
-        # Verifica se a chave 'choices' existe e tem conteúdo
-        if "choices" not in data or not data["choices"]:
-            raise Exception("A API retornou uma resposta vazia ou inválida (sem choices).")
-            
-        # Retorna o texto da primeira escolha (formato padrão OpenAI)
-        return data["choices"][0]["message"]["content"]
-
     except requests.exceptions.Timeout:
-        raise Exception("Erro de Conexão: O tempo limite da requisição foi excedido.")
+        raise RetryableError("Erro de Conexão: O tempo limite da requisição foi excedido.")
 
     except requests.exceptions.ConnectionError:
-        raise Exception("Erro de Conexão: Não foi possível conectar à API. Verifique sua internet.")
+        raise RetryableError("Erro de Conexão: Não foi possível conectar à API. Verifique sua internet.")
 
     except requests.exceptions.RequestException as e:
         # Captura qualquer outro erro relacionado à requisição (ex: DNS, SSLError)
         raise Exception(f"Erro na requisição: {str(e)}")
+
+    # Tratamento de Erros HTTP (Status Code diferente de 200)
+    try:
+        _raise_for_status(response)
+    except Exception:
+        response.close()
+        raise
+
+    return response
+
+def _send(messages: list[dict], model: str | None = None, call_info: dict | None = None) -> str:
+    """
+    Executa uma única requisição à API (sem limitação de taxa nem novas tentativas).
+
+    Raises:
+        RetryableError: Para falhas temporárias (timeout, conexão, 429, 5xx).
+    """
+    headers, payload = _build_request(messages, model=model)
+    response = _post(headers, payload)
+
+    # Extração do Conteúdo da Resposta
+    try:
+        data = response.json()
+    except ValueError:
+        raise Exception("A API retornou uma resposta que não é JSON válido.")
+
+    # Verifica se a chave 'choices' existe e tem conteúdo
+    if "choices" not in data or not data["choices"]:
+        raise Exception("A API retornou uma resposta vazia ou inválida (sem choices).")
+
+    _record_usage(data.get("usage"), call_info)
+
+    # Retorna o texto da primeira escolha (formato padrão OpenAI)
+    return data["choices"][0]["message"]["content"]
+
+def chat_stream(messages: list[dict], call_info: dict | None = None, model: str | None = None) -> Iterator[str]:
+    """
+    Versão em streaming do chat: envia "stream": true e gera o texto à medida que a IA o produz
+    (server-sent events do OpenRouter).
+
+    Falhas antes do primeiro pedaço (timeout, conexão, 429/5xx) são reenviadas como no chat()
+    e, esgotadas as tentativas, passam aos modelos de config.FALLBACK_MODELS. Depois que o texto
+    começou a chegar, erros são repassados ao chamador.
+
+    Args:
+        messages (list[dict]): Lista de mensagens no formato [{"role": "user", "content": "Olá"}].
+        call_info (dict | None): Se informado, é preenchido com 'ttft' (tempo até o primeiro
+            pedaço de texto), 'latency' (tempo total), 'attempts', 'model', 'requests' e 'fallbacks'
+            (ver chat()), além de 'prompt_tokens' e 'completion_tokens' quando a API informa o
+            consumo (último evento).
+        model (str | None): Modelo da requisição. Padrão: config.OPENROUTER_MODEL.
+
+    Yields:
+        str: Pedaços do texto da resposta.
+    """
+    models = _model_chain(model)
+    started = time.perf_counter()
+    try:
+        for index, current in enumerate(models):
+            streamed = False
+            try:
+                for text in _stream_model(messages, current, call_info):
+                    if call_info is not None and "ttft" not in call_info:
+                        call_info["ttft"] = time.perf_counter() - started
+                    streamed = True
+                    yield text
+            except ValueError:
+                raise
+            except Exception:
+                # Com parte do texto já entregue, não há como trocar de modelo
+                if streamed or index + 1 == len(models):
+                    raise
+                _record_fallback(current, call_info)
+                continue
+            if call_info is not None:
+                call_info["model"] = current
+            return
+    finally:
+        if call_info is not None:
+            call_info["latency"] = time.perf_counter() - started
+
+def _stream_model(messages: list[dict], model: str, call_info: dict | None = None) -> Iterator[str]:
+    """
+    Streaming de um único modelo, com novas tentativas até o primeiro pedaço (ver chat_stream()).
+    """
+    headers, payload = _build_request(messages, stream=True, model=model)
+    tokens = estimate_tokens(messages)
+    started = time.perf_counter()
+    attempts = 0
+    ok = False
+    # A vaga no limite global fica ocupada até o fim do streaming
+    slot = _in_flight
+    holding_slot = False
+
+    try:
+        # 1. Conexão (com novas tentativas) até a API aceitar a requisição
+        while True:
+            attempts += 1
+            rate_limiter.acquire(tokens)
+            _count_request(call_info)
+            if slot is not None:
+                slot.acquire()
+                holding_slot = True
+            try:
+                response = _post(headers, payload, stream=True)
+                break
+            except RetryableError as e:
+                if holding_slot:
+                    slot.release()
+                    holding_slot = False
+                if attempts > config.HTTP_MAX_RETRIES:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else _backoff_delay(attempts)
+                if isinstance(e, RateLimitError):
+                    metrics.registry.inc("llm_rate_limited")
+                    rate_limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+
+        # 2. Leitura dos eventos "data: {...}" até "data: [DONE]"
+        # O OpenRouter envia "text/event-stream" sem charset; sem isto, o requests decodificaria
+        # como ISO-8859-1 e os acentos do relatório chegariam corrompidos
+        response.encoding = "utf-8"
+        with response:
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    # Linhas vazias separam eventos; linhas com ":" são comentários (keep-alive)
+                    if not line or line.startswith(":") or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    try:
+                        event = json.loads(data)
+                    except ValueError:
+                        continue
+
+                    if "error" in event:
+                        error = event["error"]
+                        detail = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                        raise Exception(f"Erro na API durante o streaming: {detail}")
+
+                    # O consumo de tokens vem no último evento, normalmente sem texto
+                    if event.get("usage"):
+                        _record_usage(event["usage"], call_info)
+
+                    choices = event.get("choices") or []
+                    if not choices:
+                        continue
+                    text = (choices[0].get("delta") or {}).get("content")
+                    if text:
+                        yield text
+            except requests.exceptions.RequestException:
+                raise Exception("Erro de Conexão: A transmissão da resposta foi interrompida.")
+
+        ok = True
+    finally:
+        if holding_slot:
+            slot.release()
+        latency = time.perf_counter() - started
+        _record_call(latency, attempts, ok, model)
+        if call_info is not None:
+            call_info["latency"] = latency
+            call_info["attempts"] = attempts
@@ -1,58 +1,549 @@
+import bisect
+import hashlib
+import heapq
 import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+import config
+import entropy
+import metrics
+import scanner
+from findings import SECRET_CATEGORY, Finding, FindingIndex
 
-def analyze_security(scanned_files: list[dict]) -> list[dict]:
+# Definição dos padrões de risco (Regex)
+# Chave: Categoria do Risco
+# Valor: Lista de padrões para buscar
+RISK_PATTERNS = {
+    "Possível Segredo Exposto": [
+        r"sk-",                                     # Prefixo comum de chaves de API (Stripe, OpenAI, etc.)
+        r"(?i)api_key\s*=",                        # Atribuição de api_key (case insensitive)
+        r"(?i)secret\s*=\s*[\"'][^\"']{8,}[\"']",  # Texto literal atribuído a secret
+        r"(?i)token\s*=\s*[\"'][^\"']{8,}[\"']",   # Texto literal atribuído a token (não chamadas como get_token())
+        r"-----BEGIN\s+(RSA\s+)?PRIVATE\s+KEY-----" # Chaves privadas no formato PEM
+    ],
+    "Código Perigoso": [
+        r"eval\s*\(",                              # Função eval (execução de código dinâmico)
+        r"exec\s*\(",                              # Função exec (execução de código dinâmico)
+        r"subprocess\..*shell\s*=\s*True",         # subprocess com shell=True (risco de injeção de comando)
+        r"pickle\.load\s*\(",                      # Desserialização insegura com pickle
+        r"yaml\.load\s*\("                         # yaml.load sem Loader explícito (risco de injeção YAML)
+    ]
+}
+
+# Identificador das regras atuais. Muda sempre que os padrões (ou o detector de entropia) mudam,
+# invalidando achados em cache.
+RULES_VERSION = hashlib.sha256(repr((RISK_PATTERNS, entropy.settings())).encode("utf-8")).hexdigest()[:16]
+
+# Trecho literal (em minúsculas) presente em todo match de cada padrão.
+# Serve de pré-filtro: str.find localiza esses trechos muito mais rápido do que qualquer regex.
+# Padrões sem palavra-chave aqui continuam funcionando, via um pré-filtro regex combinado.
+RULE_KEYWORDS = {
+    r"sk-": "sk-",
+    r"(?i)api_key\s*=": "api_key",
+    r"(?i)secret\s*=\s*[\"'][^\"']{8,}[\"']": "secret",
+    r"(?i)token\s*=\s*[\"'][^\"']{8,}[\"']": "token",
+    r"-----BEGIN\s+(RSA\s+)?PRIVATE\s+KEY-----": "-----begin",
+    r"eval\s*\(": "eval",
+    r"exec\s*\(": "exec",
+    r"subprocess\..*shell\s*=\s*True": "subprocess.",
+    r"pickle\.load\s*\(": "pickle.load",
+    r"yaml\.load\s*\(": "yaml.load"
+}
+
+# Converte para minúsculas preservando o tamanho (e as posições) do texto.
+# Inclui os caracteres não ASCII que o re.IGNORECASE considera equivalentes a letras das palavras-chave.
+_CASE_FOLD = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ\u0130\u0131\u017f\u212a",
+    "abcdefghijklmnopqrstuvwxyziisk"
+)
+
+# Separadores de linha do str.splitlines() além de "\n" e "\r\n"
+_EXOTIC_BREAKS = ("\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+# Todos os separadores reconhecidos por str.splitlines(), usados no caminho lento de mapeamento de linhas
+_LINE_BREAK = re.compile(r"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# Valor sem aspas após um padrão de segredo (ex: o restante de "sk-..."), até um espaço ou delimitador
+_UNQUOTED_VALUE = re.compile(r"[^\s\"'`,;()\[\]{}]*")
+
+# Textos que substituem os segredos no conteúdo enviado à IA
+REDACTED_SPAN = "[REDACTED]"
+REDACTED_LINE = "[REDACTED - Segredo Detectado]"
+
+def _scoped(pattern: str) -> str:
+    """
+    Converte flags globais no início do padrão (ex: "(?i)") em um grupo com escopo ("(?i:...)"),
+    para que o padrão possa fazer parte de uma alternância.
+    """
+    match = re.match(r"\(\?([aiLmsux]+)\)", pattern)
+    if match:
+        return f"(?{match.group(1)}:{pattern[match.end():]})"
+    return f"(?:{pattern})"
+
+def _compile_rules():
+    """
+    Compila todas as regras uma única vez.
+
+    Returns:
+        tuple: Lista de regras (categoria, padrão original, padrão compilado, palavra-chave, descrição) na ordem
+        de RISK_PATTERNS, tupla de palavras-chave distintas e o pré-filtro regex (com grupos nomeados)
+        das regras sem palavra-chave, ou None se todas tiverem.
+    """
+    rules = []
+    keywords = []
+    alternatives = []
+    for category, patterns in RISK_PATTERNS.items():
+        for pattern in patterns:
+            keyword = RULE_KEYWORDS.get(pattern)
+            description = f"Padrão detectado: '{pattern}'"
+            rules.append((category, pattern, re.compile(pattern), keyword, description))
+            if keyword is None:
+                alternatives.append(f"(?P<r{len(rules) - 1}>{_scoped(pattern)})")
+            elif keyword not in keywords:
+                keywords.append(keyword)
+
+    fallback = re.compile("|".join(alternatives)) if alternatives else None
+    return rules, tuple(keywords), fallback
+
+_RULES, _KEYWORDS, _FALLBACK_PREFILTER = _compile_rules()
+
+def _fold(text: str) -> str:
+    """
+    Texto em minúsculas, com o mesmo tamanho do original, para buscar as palavras-chave sem distinção de caixa.
+    """
+    # str.lower() só muda o tamanho do texto em "İ" (U+0130); "ı" e "ſ" não viram "i"/"s" com lower()
+    if "\u0130" in text or "\u0131" in text or "\u017f" in text:
+        return text.translate(_CASE_FOLD)
+    return text.lower()
+
+def _candidate_positions(content: str) -> list[int]:
+    """
+    Retorna, em ordem, as posições do texto onde alguma regra pode começar a casar.
+    """
+    lowered = _fold(content)
+
+    positions = []
+    for keyword in _KEYWORDS:
+        position = lowered.find(keyword)
+        while position != -1:
+            positions.append(position)
+            position = lowered.find(keyword, position + 1)
+
+    if _FALLBACK_PREFILTER is not None:
+        positions.extend(match.start() for match in _FALLBACK_PREFILTER.finditer(content))
+
+    positions.sort()
+    return positions
+
+def _has_only_newline_breaks(content: str) -> bool:
+    """
+    Indica se as quebras de linha do texto são apenas "\n" ou "\r\n".
+    Nesse caso as linhas podem ser localizadas com str.find/str.count, sem percorrer o arquivo todo.
+    """
+    if content.count("\r") != content.count("\r\n"):
+        return False
+    return not any(sep in content for sep in _EXOTIC_BREAKS)
+
+def _candidate_lines(content: str, positions: list[int]):
+    """
+    Converte as posições candidatas em linhas, com a mesma numeração de content.splitlines().
+
+    Yields:
+        tuple[int, int, str]: Número da linha (0-based), posição do início da linha em content
+        e o texto da linha, cada linha no máximo uma vez.
+    """
+    if _has_only_newline_breaks(content):
+        # Caminho rápido: conta apenas os "\n" entre um candidato e o anterior
+        line_index = 0
+        cursor = 0
+        next_line_start = 0
+        for position in positions:
+            if position < next_line_start:
+                # Candidato na mesma linha já verificada
+                continue
+            line_index += content.count("\n", cursor, position)
+            cursor = position
+            start = content.rfind("\n", 0, position) + 1
+            end = content.find("\n", position)
+            if end == -1:
+                end = len(content)
+            next_line_start = end + 1
+            line_content = content[start:end]
+            if line_content.endswith("\r"):
+                line_content = line_content[:-1]
+            yield line_index, start, line_content
+        return
+
+    # Caminho lento: calcula o início e o fim de todas as linhas
+    starts = [0]
+    ends = []
+    for match in _LINE_BREAK.finditer(content):
+        ends.append(match.start())
+        starts.append(match.end())
+    ends.append(len(content))
+
+    last_index = -1
+    for position in positions:
+        line_index = bisect.bisect_right(starts, position) - 1
+        if line_index != last_index:
+            last_index = line_index
+            yield line_index, starts[line_index], content[starts[line_index]:ends[line_index]]
+
+def _line_bounds(content: str, line_indexes: list[int]):
+    """
+    Localiza linhas de content (numeração de content.splitlines()) sem dividir o texto inteiro.
+
+    Args:
+        line_indexes (list[int]): Números das linhas (0-based), em ordem crescente e sem repetição.
+
+    Yields:
+        tuple[int, int, int]: Número da linha e as posições de início e fim (sem a quebra) em content.
+        Linhas além do fim do texto são omitidas.
+    """
+    if _has_only_newline_breaks(content):
+        line_index = 0
+        start = 0
+        for target in line_indexes:
+            while line_index < target:
+                start = content.find("\n", start) + 1
+                if start == 0:
+                    return
+                line_index += 1
+            if start == len(content) and start > 0:
+                # Texto terminado em quebra de linha: não há uma linha vazia depois dela
+                return
+            end = content.find("\n", start)
+            if end == -1:
+                end = len(content)
+            if end > start and content[end - 1] == "\r":
+                end -= 1
+            yield target, start, end
+        return
+
+    starts = [0]
+    ends = []
+    for match in _LINE_BREAK.finditer(content):
+        ends.append(match.start())
+        starts.append(match.end())
+    ends.append(len(content))
+    if len(starts) > 1 and starts[-1] == len(content):
+        starts.pop()
+        ends.pop()
+    for target in line_indexes:
+        if target >= len(starts):
+            return
+        yield target, starts[target], ends[target]
+
+def _merge_spans(spans) -> tuple:
+    """
+    Ordena e une faixas (início, fim) que se sobrepõem ou se tocam.
+    """
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+def _secret_spans(line_content: str, compiled: re.Pattern) -> tuple:
+    """
+    Faixas de colunas com o valor sensível de cada ocorrência de um padrão de segredo na linha.
+
+    Em atribuições ("api_key = ...") a faixa começa no valor, não no nome; literais entre aspas
+    são mascarados sem as aspas, e valores sem aspas vão até o próximo espaço ou delimitador.
+    """
+    spans = []
+    for match in compiled.finditer(line_content):
+        start, end = match.span()
+        equals = match.group(0).find("=")
+        if equals != -1:
+            start += equals + 1
+            while start < len(line_content) and line_content[start] in " \t":
+                start += 1
+
+        if start < len(line_content) and line_content[start] in "\"'`":
+            close = line_content.find(line_content[start], start + 1)
+            start += 1
+            end = close if close != -1 else len(line_content)
+        else:
+            end = max(end, _UNQUOTED_VALUE.match(line_content, start).end())
+
+        # Sem valor reconhecível (ex: "api_key =" no fim da linha): mascara o próprio trecho encontrado
+        spans.append((start, end) if end > start else match.span())
+    return _merge_spans(spans)
+
+def _scan_content(file_path: str, content: str, findings: list[Finding], line_offset: int = 0) -> None:
+    """
+    Procura os padrões de risco em um arquivo sem percorrê-lo linha a linha.
+
+    O pré-filtro de palavras-chave localiza as linhas candidatas; só nelas as regras individuais
+    são testadas, na mesma ordem da varredura linha a linha (categoria, depois padrão). Assim os
+    achados são idênticos aos da versão anterior, mas as linhas sem nenhum padrão quase não custam nada.
+
+    Depois, o detector de entropia (entropy.py) aponta literais com cara de credencial nas linhas
+    que ainda não têm um achado de segredo (nas que já têm, as faixas do literal se somam às do achado).
+
+    Achados de segredo guardam as faixas de colunas do valor sensível (Finding.spans), para que
+    redact_secrets mascare só esse trecho.
+
+    line_offset é o número de linhas antes de content (pedaços de arquivos grandes).
+    """
+    first = len(findings)
+    # Primeiro achado de segredo de cada linha, pelas regras
+    secret_findings = {}
+
+    positions = _candidate_positions(content)
+    if positions:
+        for line_index, line_start, line_content in _candidate_lines(content, positions):
+            lowered_line = _fold(line_content)
+            for category, pattern, compiled, keyword, description in _RULES:
+                if keyword is not None and keyword not in lowered_line:
+                    continue
+                if compiled.search(line_content):
+                    spans = _secret_spans(line_content, compiled) if category == SECRET_CATEGORY else ()
+                    finding = Finding(
+                        file_path, line_offset + line_index + 1, category, description, line_content.strip(), spans
+                    )
+                    findings.append(finding)
+                    if category == SECRET_CATEGORY:
+                        secret_findings.setdefault(line_index, finding)
+
+    entropy_spans = entropy.find_secret_spans(content)
+    if not entropy_spans:
+        return
+    added = False
+    next_span = 0
+    for line_index, line_start, line_content in _candidate_lines(content, [start for start, end in entropy_spans]):
+        # Literais desta linha (não atravessam quebras de linha)
+        line_end = line_start + len(line_content)
+        spans = []
+        while next_span < len(entropy_spans) and entropy_spans[next_span][0] <= line_end:
+            start, end = entropy_spans[next_span]
+            spans.append((start - line_start, end - line_start))
+            next_span += 1
+
+        finding = secret_findings.get(line_index)
+        if finding is not None:
+            finding.spans = _merge_spans(finding.spans + tuple(spans))
+            continue
+        findings.append(Finding(
+            file_path, line_offset + line_index + 1, SECRET_CATEGORY, entropy.DESCRIPTION,
+            line_content.strip(), _merge_spans(spans)
+        ))
+        added = True
+    if added and positions:
+        # Mantém os achados do arquivo em ordem de linha (a ordenação é estável)
+        findings[first:] = sorted(findings[first:], key=lambda finding: finding.line)
+
+def _scan_file(file_info, findings: list[Finding]) -> bool:
+    """
+    Analisa um arquivo inteiro ou, se for grande (FileHandle.is_large), pedaço a pedaço via mmap,
+    com a memória limitada ao tamanho de um pedaço.
+
+    Returns:
+        bool: False se o arquivo for binário ou ilegível.
+    """
+    if isinstance(file_info, scanner.FileHandle) and file_info.is_large:
+        for line_offset, text in file_info.iter_chunks():
+            _scan_content(file_info.path, text, findings, line_offset)
+        return file_info.skip_reason is None
+
+    content = file_info["content"]
+    if content is None:
+        # Arquivo binário ou ilegível (detectado apenas na leitura sob demanda)
+        return False
+    _scan_content(file_info["path"], content, findings)
+    return True
+
+def analyze_file(file_info) -> list[Finding]:
+    """
+    Analisa um único arquivo (dict ou FileHandle), sem liberar o conteúdo.
+    Usado pelo pipeline, em que o mesmo texto segue depois para o resumo da IA.
+
+    Returns:
+        list[Finding]: Achados do arquivo, em ordem de linha.
+    """
+    file_findings = []
+    _scan_file(file_info, file_findings)
+    return file_findings
+
+def redact_secrets(content: str, findings: Iterable, line_offset: int = 0) -> str:
+    """
+    Mascara os segredos detectados antes do envio à IA, preservando o restante do código.
+
+    Cada faixa de Finding.spans vira REDACTED_SPAN; achados sem faixas (ex: registros antigos)
+    mascaram a linha inteira com REDACTED_LINE. Só as linhas com segredo são localizadas, e o
+    texto é copiado uma única vez, em pedaços; sem segredos, content é devolvido sem cópia.
+    O resultado depende apenas do conteúdo e dos achados (chave do cache de resumos estável).
+
+    Args:
+        content (str): Conteúdo original do arquivo (ou de um segmento dele).
+        findings (Iterable): Achados de segurança deste arquivo (ex: FindingIndex.for_file).
+        line_offset (int): Linhas do arquivo antes do início de content (segmentos de arquivos grandes).
+
+    Returns:
+        str: Conteúdo com segredos mascarados.
+    """
+    # 1. Faixas a mascarar por linha de content (None = linha inteira)
+    redactions = {}
+    for finding in findings:
+        if finding.get("category") != SECRET_CATEGORY or not finding.get("line"):
+            continue
+        line_index = finding.get("line") - 1 - line_offset
+        if line_index < 0:
+            continue
+        spans = finding.get("spans")
+        if not spans or (line_index in redactions and redactions[line_index] is None):
+            redactions[line_index] = None
+        else:
+            redactions[line_index] = redactions.get(line_index, ()) + tuple(spans)
+
+    if not redactions:
+        return content
+
+    # 2. Cópia em pedaços: trecho sem segredo, marcador, trecho sem segredo...
+    parts = []
+    cursor = 0
+    for line_index, line_start, line_end in _line_bounds(content, sorted(redactions)):
+        spans = redactions[line_index]
+        if spans is None:
+            spans = ((0, line_end - line_start),)
+            marker = REDACTED_LINE
+        else:
+            spans = _merge_spans(spans)
+            marker = REDACTED_SPAN
+        for span_start, span_end in spans:
+            span_start = min(line_start + span_start, line_end)
+            span_end = min(line_start + span_end, line_end)
+            if span_end <= span_start and marker is REDACTED_SPAN:
+                continue
+            parts.append(content[cursor:span_start])
+            parts.append(marker)
+            cursor = span_end
+    parts.append(content[cursor:])
+    return "".join(parts)
+
+def _analyze_files(scanned_files: Iterable) -> tuple[list[Finding], int, int]:
+    """
+    Analisa os arquivos em série, no processo atual.
+
+    Returns:
+        tuple: Achados (sem ordenação final), quantidade de arquivos e de bytes analisados.
+    """
+    findings = []
+    total_files = 0
+    total_bytes = 0
+
+    for file_info in scanned_files:
+        if not _scan_file(file_info, findings):
+            continue
+        total_files += 1
+        total_bytes += _size_of(file_info)
+
+        scanner.release(file_info)
+
+    return findings, total_files, total_bytes
+
+def _size_of(file_info) -> int:
+    # FileHandles conhecem o tamanho sem ler o arquivo; para dicts, usa o tamanho do texto
+    if isinstance(file_info, scanner.FileHandle):
+        return file_info.size
+    return len(file_info["content"] or "")
+
+def _make_shards(scanned_files: list, shard_count: int) -> list[list]:
+    """
+    Divide os arquivos em grupos de volume (bytes) parecido.
+    Usa a heurística "maior primeiro": cada arquivo vai para o grupo com menos bytes até o momento.
+    """
+    shards = [[] for _ in range(shard_count)]
+    heap = [(0, i) for i in range(shard_count)]
+    for file_info in sorted(scanned_files, key=_size_of, reverse=True):
+        load, index = heapq.heappop(heap)
+        shards[index].append(file_info)
+        heapq.heappush(heap, (load + _size_of(file_info), index))
+    return [shard for shard in shards if shard]
+
+def _analyze_shard(shard: list) -> tuple[list[Finding], int, int]:
+    """
+    Ponto de entrada dos processos de análise. FileHandles chegam sem conteúdo e são lidos aqui.
+    """
+    return _analyze_files(shard)
+
+def record_metrics(findings: Iterable) -> None:
+    """
+    Registra em metrics a quantidade de achados por regra ("findings", com categoria e regra).
+    Chamada uma vez com o resultado final de cada análise.
+    """
+    per_rule = Counter((f.category, f.description) for f in findings)
+    for (category, rule), count in per_rule.items():
+        metrics.registry.inc("findings", count, category=category, rule=rule)
+
+def analyze_security(scanned_files: Iterable, workers: int | None = None, stats: dict | None = None) -> FindingIndex:
     """
     Realiza análise estática simples nos arquivos para identificar riscos de segurança.
+
+    Aceita tanto a lista do scan_project quanto um fluxo de FileHandles (iter_project/prefetch).
+    No modo streaming o conteúdo de cada arquivo é liberado logo após a análise.
+
+    Quando recebe uma lista e há mais de um processo configurado, os arquivos são divididos
+    por volume (bytes) entre processos. Entradas pequenas continuam em série, pois iniciar
+    processos custaria mais do que economiza.
     
     Args:
-        scanned_files (list[dict]): Lista de arquivos retornada pelo scanner.
+        scanned_files (Iterable): Arquivos retornados pelo scanner (dicts ou FileHandles).
+        workers (int | None): Número de processos. Padrão: config.ANALYZER_WORKERS.
+        stats (dict | None): Se informado, é preenchido com 'files', 'bytes', 'seconds',
+            'files_per_sec', 'bytes_per_sec' e 'workers' da análise.
         
     Returns:
-        list[dict]: Lista de achados (risco), contendo arquivo, linha, tipo e descrição.
+        FindingIndex: Achados (risco), contendo arquivo, linha, tipo e descrição, indexados
+        por arquivo, linha e categoria.
     """
-    
-    findings = []
+    started = time.perf_counter()
+    workers = config.ANALYZER_WORKERS if workers is None else workers
+    used_workers = 1
 
-    # Definição dos padrões de risco (Regex)
-    # Chave: Categoria do Risco
-    # Valor: Lista de padrões para buscar
-    risk_patterns = {
-        "Possível Segredo Exposto": [
-            r"sk-",                                     # Prefixo comum de chaves de API (Stripe, OpenAI, etc.)
-            r"(?i)api_key\s*=",                        # Atribuição de api_key (case insensitive)
-            r"(?i)secret\s*=",                         # Atribuição de secret
-            r"(?i)token\s*=",                          # Atribuição de token
-            r"-----BEGIN\s+(RSA\s+)?PRIVATE\s+KEY-----" # Chaves privadas no formato PEM
-        ],
-        "Código Perigoso": [
-            r"eval\s*\(",                              # Função eval (execução de código dinâmico)
-            r"exec\s*\(",                              # Função exec (execução de código dinâmico)
-            r"subprocess\..*shell\s*=\s*True",         # subprocess com shell=True (risco de injeção de comando)
-            r"pickle\.load\s*\(",                      # Desserialização insegura com pickle
-            r"yaml\.load\s*\("                         # yaml.load sem Loader explícito (risco de injeção YAML)
-        ]
-    }
+    if isinstance(scanned_files, list):
+        parallel = (
+            workers > 1
+            and len(scanned_files) > 1
+            and sum(_size_of(f) for f in scanned_files) >= config.ANALYZER_PARALLEL_MIN_BYTES
+        )
+        if parallel:
+            shards = _make_shards(scanned_files, workers)
+            used_workers = len(shards)
+            findings = []
+            total_files = 0
+            total_bytes = 0
+            with ProcessPoolExecutor(max_workers=used_workers) as executor:
+                for shard_findings, shard_files, shard_bytes in executor.map(_analyze_shard, shards):
+                    findings.extend(shard_findings)
+                    total_files += shard_files
+                    total_bytes += shard_bytes
+        else:
+            # Em série, os FileHandles ainda são lidos em paralelo pelas threads do scanner
+            findings, total_files, total_bytes = _analyze_files(scanner.prefetch(scanned_files))
+    else:
+        findings, total_files, total_bytes = _analyze_files(scanned_files)
 
-    for file_info in scanned_files:
-        file_path = file_info["path"]
-        content = file_info["content"]
-        lines = content.splitlines()
-
-        for line_number, line_content in enumerate(lines, start=1):
-            # Verifica cada categoria de risco
-            for category, patterns in risk_patterns.items():
-                for pattern in patterns:
-                    # Busca o padrão na linha atual
-                    if re.search(pattern, line_content):
-                        findings.append({
-                            "file": file_path,
-                            "line": line_number,
-                            "category": category,
-                            "description": f"Padrão detectado: '{pattern}'",
-                            "snippet": line_content.strip()
-                        })
-
-    # Ordena os achados pelo nome do arquivo para manter o relatório organizado
-    findings.sort(key=lambda x: x["file"])
+    # O índice ordena os achados por arquivo e linha para manter o relatório organizado.
+    # A ordenação é estável e os achados de cada arquivo vêm de um único processo,
+    # então o resultado é idêntico ao da análise em série.
+    findings = FindingIndex(findings)
+    metrics.registry.observe("phase_seconds", time.perf_counter() - started, phase="analysis")
+    metrics.registry.inc("analyzed_bytes", total_bytes)
+
+    if stats is not None:
+        elapsed = time.perf_counter() - started
+        stats["files"] = total_files
+        stats["bytes"] = total_bytes
+        stats["seconds"] = elapsed
+        stats["files_per_sec"] = total_files / elapsed if elapsed > 0 else 0.0
+        stats["bytes_per_sec"] = total_bytes / elapsed if elapsed > 0 else 0.0
+        stats["workers"] = used_workers
 
     return findings
@@ -1,8 +1,9 @@
 import streamlit as st
 import os
 import config
-import scanner
-import analyzer
+import ai_client
+import jobs
+import metrics
 import summarizer
 
 # Configuração da página do Streamlit
@@ -12,6 +13,37 @@ st.set_page_config(
     layout="wide"
 )
 
+# Máximo de arquivos com achados exibidos nos Detalhes Técnicos
+MAX_FINDING_FILES_SHOWN = 200
+
+# Análises concluídas mantidas na sessão (cada uma guarda relatório e achados em memória)
+MAX_CACHED_JOBS = 3
+
+# Intervalo de atualização do painel de progresso, em segundos
+PROGRESS_REFRESH_SECONDS = 1.0
+
+# Nomes exibidos no painel de métricas
+METRIC_PHASE_LABELS = {
+    "walk": "Percorrer pastas",
+    "scan": "Leitura (pipeline)",
+    "analysis": "Segurança",
+    "map": "Resumos (Map)",
+    "merge": "Consolidação por diretório",
+    "tree_reduce": "Consolidação por diretório",
+    "reduce": "Relatório final (Reduce)"
+}
+SKIP_REASON_LABELS = {
+    "ignored_folder": "Pasta ignorada",
+    "unreadable_folder": "Pasta sem permissão",
+    "gitignore": "Ignorado pelo .gitignore",
+    "extension": "Extensão não suportada",
+    "stat_error": "Erro ao consultar o arquivo",
+    "too_large": "Acima de LARGE_FILE_MAX_BYTES",
+    "binary": "Binário",
+    "not_utf8": "Não é texto UTF-8",
+    "read_error": "Erro de leitura"
+}
+
 # --- Cabeçalho e Introdução ---
 st.title("🔍 Analisador de Código com IA")
 st.markdown("""
@@ -35,16 +67,56 @@ with st.sidebar:
         value=".", 
         help="Digite o caminho completo da pasta do projeto ou use '.' para a pasta atual."
     )
+
+    # Modo de revisão de alterações (ex: pull requests)
+    changed_since = st.text_input(
+        "Apenas alterações desde (opcional)",
+        value="",
+        help="Referência do git (ex: origin/main). Só os arquivos alterados desde ela são analisados e resumidos."
+    ).strip() or None
     
     st.divider()
     
     # Informações do Modelo
-    st.caption(f"Modelo IA: `{config.OPENROUTER_MODEL}`")
+    if config.MAP_MODEL == config.REDUCE_MODEL:
+        st.caption(f"Modelo IA: `{config.MAP_MODEL}`")
+    else:
+        st.caption(f"Modelo IA: `{config.MAP_MODEL}` (resumos), `{config.REDUCE_MODEL}` (relatório)")
+    if config.FALLBACK_MODELS:
+        st.caption("Alternativos: " + ", ".join(f"`{m}`" for m in config.FALLBACK_MODELS))
     st.caption(f"Timeout: {config.TIMEOUT_SECONDS}s")
 
 # --- Área Principal ---
 st.divider()
 
+# Resultados em cache na sessão, por (caminho, estado dos arquivos, modelo).
+# Sobrevivem às reexecuções do script (troca de aba, edição do caminho etc.).
+if "jobs" not in st.session_state:
+    st.session_state["jobs"] = {}
+    st.session_state["active_job"] = None
+
+def start_or_reuse_job(path: str, changed_since: str | None = None) -> None:
+    """
+    Ativa a análise do projeto: reaproveita o resultado em cache se os arquivos não mudaram,
+    ou inicia uma nova análise em segundo plano.
+
+    Raises:
+        ValueError: Se changed_since não puder ser resolvido no repositório git.
+    """
+    cached_jobs = st.session_state["jobs"]
+    key = jobs.job_key(path, changed_since)
+    job = cached_jobs.get(key)
+
+    if job is None or job.state in ("cancelled", "error"):
+        job = jobs.AnalysisJob(path, changed_since).start()
+        cached_jobs[key] = job
+        # Mantém apenas as análises mais recentes (a ativa nunca é removida)
+        while len(cached_jobs) > MAX_CACHED_JOBS:
+            oldest = next(k for k in cached_jobs if k != key)
+            cached_jobs.pop(oldest).cancel()
+
+    st.session_state["active_job"] = key
+
 # Botão de Ação
 if st.button("🚀 Iniciar Análise", type="primary", use_container_width=True):
     
@@ -53,65 +125,323 @@ if st.button("🚀 Iniciar Análise", type="primary", use_container_width=True):
         st.error(f"❌ O caminho informado não é um diretório válido: `{project_path}`")
     else:
         try:
-            # 2. Barra de Progresso e Status
-            # Usamos st.status para mostrar o progresso passo a passo
-            with st.status("Analisando projeto...", expanded=True) as status:
-                
-                # Passo A: Escanear Arquivos
-                st.write("📂 Escaneando arquivos locais...")
-                scanned_files = scanner.scan_project(project_path)
-                
-                if not scanned_files:
-                    st.warning("Nenhum arquivo compatível foi encontrado no diretório.")
-                    status.update(label="Análise finalizada (vazia)", state="complete", expanded=False)
-                    st.stop()
-                
-                st.write(f"✅ {len(scanned_files)} arquivos encontrados para análise.")
-
-                # Passo B: Analisar Segurança
-                st.write("🔒 Verificando segurança estática...")
-                security_findings = analyzer.analyze_security(scanned_files)
-                
-                if security_findings:
-                    st.warning(f"⚠️ {len(security_findings)} possíveis riscos de segurança encontrados.")
-                else:
-                    st.success("✅ Nenhum risco óbvio encontrado na verificação estática.")
-
-                # Passo C: Gerar Relatório com IA
-                st.write("🤖 Gerando relatório executivo com IA (isso pode levar um momento)...")
-                report = summarizer.generate_report(scanned_files, security_findings)
-                
-                status.update(label="Análise concluída com sucesso!", state="complete", expanded=False)
-
-            # 3. Exibição dos Resultados
-            st.success("Relatório gerado com sucesso!")
-            
-            # Organização em Abas
-            tab_resumo, tab_detalhes = st.tabs(["📝 Resumo Executivo", "⚙️ Detalhes Técnicos"])
-
-            with tab_resumo:
-                st.markdown(report)
-
-            with tab_detalhes:
-                st.subheader("Arquivos Analisados")
-                st.caption("Lista de arquivos que foram enviados para a IA.")
-                file_paths = [f['path'] for f in scanned_files]
-                st.write("\n".join([f"- {p}" for p in file_paths]))
-
-                st.divider()
-                
-                st.subheader("Achados de Segurança (Detalhado)")
-                if not security_findings:
-                    st.info("Nenhum achado de segurança registrado.")
-                else:
-                    for finding in security_findings:
-                        with st.expander(f"🚨 {finding['file']} (Linha {finding['line']})"):
-                            st.markdown(f"**Categoria:** {finding['category']}")
-                            st.markdown(f"**Descrição:** {finding['description']}")
-                            st.code(finding['snippet'], language="text")
-
-        except ValueError as ve:
-            st.error(f"Erro de Validação: {ve}")
-        except Exception as e:
+            start_or_reuse_job(project_path, changed_since)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
+@st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+def show_progress(job: jobs.AnalysisJob) -> None:
+    """
+    Painel de progresso da análise em andamento, atualizado sozinho sem reexecutar a página inteira.
+    """
+    if not job.running:
+        # Terminou: reexecuta a página para exibir os resultados
+        st.rerun()
+
+    progress = job.progress
+    st.info(f"⏳ {jobs.PHASE_LABELS.get(progress['phase'], progress['phase'])}... ({job.elapsed():.0f}s)")
+
+    col_scanned, col_analyzed, col_batches, col_eta = st.columns(4)
+    col_scanned.metric("Arquivos lidos", progress["files_scanned"])
+    col_analyzed.metric("Arquivos verificados", progress["files_analyzed"])
+    col_batches.metric("Lotes resumidos", f"{progress['batches_done']}/{progress['batches_total']}")
+    eta = job.eta()
+    col_eta.metric("Tempo restante (estimado)", f"~{eta:.0f}s" if eta is not None else "—")
+
+    if progress["batches_total"]:
+        st.progress(min(1.0, progress["batches_done"] / progress["batches_total"]))
+
+    # O relatório final aparece à medida que a IA o gera
+    if job.report_text:
+        st.markdown(job.report_text)
+
+    if st.button("⛔ Cancelar análise"):
+        job.cancel()
+        st.warning("Cancelando... as requisições já enviadas à IA serão descartadas.")
+
+def show_metrics() -> None:
+    """
+    Painel de métricas (Detalhes Técnicos): tempos por fase, arquivos ignorados por motivo,
+    consumo de tokens e achados por regra, somando as execuções desde o início do servidor.
+    """
+    snapshot = metrics.registry.snapshot()
+    registry = metrics.registry
+
+    col_walked, col_read, col_bytes, col_retries = st.columns(4)
+    col_walked.metric("Arquivos percorridos", f"{registry.counter_value('files_walked'):,.0f}")
+    col_read.metric("Arquivos lidos", f"{registry.counter_value('files_read'):,.0f}")
+    col_bytes.metric("Dados lidos", f"{registry.counter_value('bytes_read') / 1_000_000:.1f} MB")
+    col_retries.metric("Novas tentativas", f"{registry.counter_value('llm_retries'):,.0f}")
+
+    col_prompt, col_completion, col_limited = st.columns(3)
+    col_prompt.metric("Tokens de entrada (API)", f"{registry.counter_value('llm_prompt_tokens'):,.0f}")
+    col_completion.metric("Tokens de saída (API)", f"{registry.counter_value('llm_completion_tokens'):,.0f}")
+    col_limited.metric("Respostas 429", f"{registry.counter_value('llm_rate_limited'):,.0f}")
+
+    # Tempo de cada fase e latência das chamadas à IA por fase
+    durations = [
+        {
+            "Medição": "Fase" if o["name"] == "phase_seconds" else "Chamada à IA",
+            "Etapa": METRIC_PHASE_LABELS.get(o["labels"].get("phase"), o["labels"].get("phase")),
+            "Ocorrências": o["count"],
+            "Total (s)": round(o["sum"], 2),
+            "p50 (s)": round(o["p50"], 2),
+            "p95 (s)": round(o["p95"], 2)
+        }
+        for o in snapshot["observations"]
+        if o["name"] in ("phase_seconds", "llm_call_seconds")
+    ]
+    if durations:
+        st.table(durations)
+
+    col_skipped, col_rules = st.columns(2)
+    with col_skipped:
+        st.markdown("**Ignorados por motivo**")
+        skipped = registry.counters_by_label("files_skipped", "reason")
+        if skipped:
+            st.table([
+                {"Motivo": SKIP_REASON_LABELS.get(reason, reason), "Quantidade": int(count)}
+                for reason, count in sorted(skipped.items(), key=lambda item: -item[1])
+            ])
+        else:
+            st.caption("Nenhum arquivo ignorado.")
+    with col_rules:
+        st.markdown("**Achados por regra**")
+        per_rule = [c for c in snapshot["counters"] if c["name"] == "findings"]
+        if per_rule:
+            st.table([
+                {"Regra": c["labels"]["rule"], "Quantidade": int(c["value"])}
+                for c in sorted(per_rule, key=lambda c: -c["value"])
+            ])
+        else:
+            st.caption("Nenhum achado registrado.")
+
+    st.download_button(
+        "Baixar métricas (Prometheus)",
+        data=metrics.to_prometheus(snapshot),
+        file_name="inspector.prom",
+        mime="text/plain"
+    )
+
+def show_results(job: jobs.AnalysisJob) -> None:
+    """
+    Exibe o relatório e os detalhes técnicos de uma análise concluída.
+    """
+    security_findings = job.security_findings
+    report_stats = job.report_stats
+
+    if not job.file_paths:
+        st.warning("Nenhum arquivo compatível foi encontrado no diretório.")
+        return
+
+    # Resumo das etapas
+    with st.expander(f"✅ Análise concluída em {job.elapsed():.1f}s ({len(job.file_paths)} arquivos)"):
+        if job.index_stats is not None:
+            index_stats = job.index_stats
+            st.caption(
+                f"Índice incremental: {index_stats['reused']} reaproveitados, "
+                f"{index_stats['recomputed']} recalculados, {index_stats['removed']} removidos."
+            )
+        if job.pipeline_stats is not None:
+            pipeline_stats = job.pipeline_stats
+            st.caption(
+                f"Leitura concluída em {pipeline_stats['scan_seconds']:.2f}s, "
+                f"verificação de segurança em {pipeline_stats['analysis_seconds']:.2f}s, "
+                f"resumos em {pipeline_stats['total_seconds']:.2f}s (tempos a partir do início)."
+            )
+        else:
+            analysis_stats = job.analysis_stats
+            st.caption(
+                f"Análise de {analysis_stats['files']} arquivos em {analysis_stats['seconds']:.2f}s "
+                f"({analysis_stats['files_per_sec']:.0f} arquivos/s, "
+                f"{analysis_stats['bytes_per_sec'] / 1_000_000:.2f} MB/s, "
+                f"{analysis_stats['workers']} processo(s))"
+            )
+        # Requisições HTTP de fato enviadas: novas tentativas, cópias e trocas de modelo incluídas
+        request_details = []
+        if report_stats.get("hedges"):
+            request_details.append(f"{report_stats['hedges']} com cópia (hedge)")
+        if report_stats.get("fallbacks"):
+            request_details.append(f"{report_stats['fallbacks']} troca(s) de modelo")
+        requests_text = f"{report_stats['requests']} requisições à IA"
+        if request_details:
+            requests_text += f" ({', '.join(request_details)})"
+        st.caption(
+            f"{requests_text}, "
+            f"~{report_stats['estimated_tokens']:,} tokens nos prompts "
+            f"({report_stats['chunked_files']} arquivos divididos em partes, "
+            f"{report_stats['cache_hits']} lotes reaproveitados do cache)."
+        )
+        if report_stats["reduce_levels"]:
+            st.caption(
+                f"Resumos consolidados por diretório em {report_stats['reduce_levels']} nível(is) "
+                f"({report_stats['reduce_merges']} consolidações)."
+            )
+        if report_stats.get("dedup_files"):
+            st.caption(
+                f"{report_stats['dedup_files']} cópia(s) de arquivos em {report_stats['dedup_groups']} grupo(s) "
+                f"não foram reenviadas à IA (~{report_stats['dedup_tokens_saved']:,} tokens economizados)."
+            )
+        if report_stats.get("compressed_files"):
+            before = report_stats["compression_tokens_before"]
+            after = report_stats["compression_tokens_after"]
+            st.caption(
+                f"{report_stats['compressed_files']} arquivo(s) enviados como esboço: "
+                f"~{before:,} → ~{after:,} tokens ({before / max(1, after):.1f}x menos)."
+            )
+        if job.large_files:
+            st.caption(
+                f"{job.large_files} arquivo(s) grande(s) processado(s) em pedaços "
+                f"(segurança no arquivo inteiro; resumo dos primeiros trechos)."
+            )
+        if job.skipped:
+            st.caption("Arquivos ignorados: " + ", ".join(
+                f"{count} ({SKIP_REASON_LABELS.get(reason, reason).lower()})"
+                for reason, count in sorted(job.skipped.items(), key=lambda item: -item[1])
+            ) + ".")
+
+    if report_stats.get("uncovered_files"):
+        covered = len(report_stats["covered_files"])
+        total = covered + len(report_stats["uncovered_files"])
+        order = " (os mais importantes primeiro)" if report_stats.get("prioritized") else ""
+        detail = summarizer.coverage_detail(report_stats["map_stop_reason"])
+        st.warning(
+            f"⏱️ Relatório parcial: {covered} de {total} arquivos resumidos{order}; {detail} "
+            f"Veja a lista em \"Detalhes Técnicos\"."
+        )
+
+    if report_stats.get("failed_batches"):
+        st.warning(
+            f"⚠️ A IA falhou em {report_stats['failed_batches']} de {report_stats['map_batches']} lotes de resumo; "
+            f"os arquivos desses lotes não entraram no relatório. Uma nova análise tenta só esses lotes."
+        )
+
+    if security_findings:
+        st.warning(f"⚠️ {len(security_findings)} possíveis riscos de segurança encontrados.")
+    else:
+        st.success("✅ Nenhum risco óbvio encontrado na verificação estática.")
+
+    # Organização em Abas
+    tab_resumo, tab_detalhes = st.tabs(["📝 Resumo Executivo", "⚙️ Detalhes Técnicos"])
+
+    with tab_resumo:
+        st.markdown(job.report_text)
+        if report_stats.get("ttft") is not None:
+            st.caption(
+                f"Primeira resposta em {report_stats['ttft']:.2f}s; "
+                f"relatório completo em {report_stats['reduce_seconds']:.2f}s."
+            )
+
+    with tab_detalhes:
+        st.subheader("Arquivos Analisados")
+        st.caption(
+            "Arquivos encontrados na varredura, inclusive os que não foram enviados para a IA "
+            "(cópias de duplicatas, binários e arquivos não resumidos)."
+        )
+        st.write("\n".join([f"- {p}" for p in job.file_paths]))
+
+        if report_stats.get("uncovered_files"):
+            st.subheader("Arquivos Não Resumidos")
+            st.caption("Arquivos que ficaram de fora dos resumos: " + summarizer.coverage_detail(report_stats["map_stop_reason"]))
+            st.write("\n".join([f"- {p}" for p in report_stats["uncovered_files"]]))
+
+        st.divider()
+
+        st.subheader("Chamadas à IA")
+        call_summary = ai_client.call_stats.summary()
+        col_calls, col_retries, col_p50, col_p95 = st.columns(4)
+        col_calls.metric("Chamadas", call_summary["calls"])
+        col_retries.metric("Novas tentativas", call_summary["retries"])
+        col_p50.metric("Latência p50", f"{call_summary['latency_p50']:.2f}s")
+        col_p95.metric("Latência p95", f"{call_summary['latency_p95']:.2f}s")
+        if call_summary["hedges"] or call_summary["fallbacks"]:
+            col_hedges, col_wins, col_fallbacks, _ = st.columns(4)
+            col_hedges.metric("Cópias (hedge)", f"{call_summary['hedge_rate']:.1%}", help="Requisições que receberam uma cópia por demorar mais que o p95.")
+            col_wins.metric("Cópias mais rápidas", call_summary["hedge_wins"])
+            col_fallbacks.metric("Trocas de modelo", f"{call_summary['fallback_rate']:.1%}", help="Requisições repassadas a um modelo alternativo após falha.")
+
+        st.divider()
+
+        if report_stats.get("compression"):
+            st.subheader("Compressão do Prompt")
+            st.caption("Tokens de cada arquivo antes e depois do esboço enviado à IA (maiores reduções primeiro).")
+            st.dataframe(
+                [
+                    {
+                        "Arquivo": f["path"],
+                        "Tokens (original)": f["tokens_before"],
+                        "Tokens (esboço)": f["tokens_after"],
+                        "Redução": f"{1 - f['tokens_after'] / f['tokens_before']:.0%}" if f["tokens_before"] else "0%"
+                    }
+                    for f in sorted(report_stats["compression"], key=lambda f: f["tokens_after"] - f["tokens_before"])
+                ]
+            )
+
+            st.divider()
+
+        st.subheader("Cache de Resumos da IA")
+        col_hits, col_misses, col_rate = st.columns(3)
+        cache_total = report_stats["cache_hits"] + report_stats["cache_misses"]
+        col_hits.metric("Acertos (hits)", report_stats["cache_hits"])
+        col_misses.metric("Falhas (misses)", report_stats["cache_misses"])
+        col_rate.metric(
+            "Taxa de acerto",
+            f"{(report_stats['cache_hits'] / cache_total if cache_total else 0):.0%}"
+        )
+
+        st.divider()
+
+        st.subheader("Métricas da Execução")
+        st.caption("Valores somados de todas as análises desde que o aplicativo foi iniciado.")
+        show_metrics()
+
+        st.divider()
+        
+        st.subheader("Achados de Segurança (Detalhado)")
+        if not security_findings:
+            st.info("Nenhum achado de segurança registrado.")
+        else:
+            # Totais por categoria, a partir do índice de achados
+            category_counts = security_findings.categories()
+            category_columns = st.columns(len(category_counts))
+            for column, (category, count) in zip(category_columns, sorted(category_counts.items())):
+                column.metric(category, count)
+
+            # Um bloco por arquivo (e não por achado), para a página continuar leve em projetos grandes
+            finding_files = security_findings.files()
+            for path in finding_files[:MAX_FINDING_FILES_SHOWN]:
+                file_findings = security_findings.for_file(path)
+                with st.expander(f"🚨 {path} ({len(file_findings)} achado(s))"):
+                    st.code(
+                        "\n".join(
+                            f"Linha {f.line} [{f.category}] {f.description}\n    {f.snippet}"
+                            for f in file_findings
+                        ),
+                        language="text"
+                    )
+            if len(finding_files) > MAX_FINDING_FILES_SHOWN:
+                st.caption(
+                    f"Exibindo {MAX_FINDING_FILES_SHOWN} de {len(finding_files)} arquivos com achados."
+                )
+
+# 2. Exibição da análise ativa (em andamento ou concluída)
+active_key = st.session_state["active_job"]
+active_job = st.session_state["jobs"].get(active_key) if active_key else None
+
+if active_job is not None:
+    if os.path.realpath(project_path) != active_key[0]:
+        st.caption(f"Exibindo a análise de `{active_job.project_path}`.")
+
+    if active_job.running:
+        show_progress(active_job)
+    elif active_job.state == "cancelled":
+        st.warning("Análise cancelada.")
+    elif active_job.state == "error":
+        error = active_job.error
+        if isinstance(error, ValueError):
+            st.error(f"Erro de Validação: {error}")
+        else:
             st.error(f"Ocorreu um erro inesperado durante a análise.")
-            st.exception(e) # Mostra o erro completo para debug
+            st.exception(error) # Mostra o erro completo para debug
+    else:
+        show_results(active_job)
@@ -0,0 +1,291 @@
+"""
+Linha de comando do analisador, sem interface gráfica (CI, análises agendadas, vários projetos).
+
+Para cada projeto são gravados um relatório em Markdown (<nome>.md) e um JSON (<nome>.json)
+com os achados de segurança e os tempos de cada etapa; summary.json reúne todos os projetos.
+
+Uso:
+    python cli.py ../servico-a ../servico-b --output-dir relatorios
+    python cli.py --manifest projetos.txt --jobs 8 --llm-concurrency 6 --max-findings 0
+    python cli.py . --no-report --max-findings 0 --fail-category "Possível Segredo Exposto"
+    python cli.py . --changed-since origin/main --output-dir relatorio-pr
+    python cli.py ../servico-a --metrics-file /var/lib/node_exporter/inspector.prom
+
+Códigos de saída:
+    0: todos os projetos analisados e dentro do limite de achados;
+    1: algum projeto passou do limite de achados (--max-findings);
+    2: algum projeto não pôde ser analisado (inclusive falhas da IA em lotes de resumo ou no relatório final).
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import ai_client
+import analyzer
+import config
+import metrics
+import pipeline
+import scan_index
+import scanner
+import summarizer
+
+EXIT_OK = 0
+EXIT_FINDINGS = 1
+EXIT_ERROR = 2
+
+def read_manifest(manifest_path: str) -> list[str]:
+    """
+    Lê um arquivo com um caminho de projeto por linha. Linhas vazias e comentários (#) são ignorados.
+    Caminhos relativos são resolvidos a partir da pasta do manifesto.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(os.path.normpath(os.path.join(base, os.path.expanduser(line))))
+    return paths
+
+def _output_name(project_path: str) -> str:
+    """
+    Nome dos arquivos de saída de um projeto: nome da pasta + hash curto do caminho completo
+    (projetos diferentes com a mesma pasta final não se sobrescrevem).
+    """
+    real_path = os.path.realpath(project_path)
+    digest = hashlib.sha256(real_path.encode("utf-8")).hexdigest()[:8]
+    return f"{os.path.basename(real_path) or 'raiz'}-{digest}"
+
+def analyze_project(project_path: str, with_report: bool = True, changed_since: str | None = None) -> dict:
+    """
+    Analisa um projeto: leitura, verificação de segurança e (opcionalmente) relatório da IA.
+
+    Args:
+        project_path (str): Caminho raiz do projeto.
+        with_report (bool): Se False, só a verificação de segurança é feita (sem chamadas à IA).
+        changed_since (str | None): Se informado, só os arquivos alterados desde esta referência do git.
+
+    Returns:
+        dict: 'path', 'files', 'findings' (FindingIndex), 'skipped' (arquivos ignorados por motivo),
+        'report' (Markdown ou None), 'uncovered_files' (sem resumo por causa dos limites da fase Map),
+        'llm_error' (falhas da IA nos resumos ou no relatório final, ou None) e 'timing'.
+
+    Raises:
+        ValueError: Se o caminho não for um diretório (ou changed_since não puder ser resolvido).
+    """
+    started = time.perf_counter()
+    timing = {}
+    report = None
+    uncovered = []
+    llm_errors = []
+
+    if with_report:
+        pipeline_stats = {}
+        scanned_files, findings, report_messages = pipeline.run_pipeline(
+            project_path, stats=pipeline_stats, changed_since=changed_since
+        )
+        skipped = pipeline_stats["skipped"]
+        timing["scan_seconds"] = pipeline_stats["scan_seconds"]
+        timing["analysis_seconds"] = pipeline_stats["analysis_seconds"]
+        timing["map_seconds"] = pipeline_stats["total_seconds"]
+
+        report_stats = pipeline_stats["report"]
+        report = "".join(summarizer.stream_report(report_messages, stats=report_stats))
+        timing["report_seconds"] = report_stats.get("reduce_seconds")
+        timing["ttft_seconds"] = report_stats.get("ttft")
+        timing["llm_requests"] = report_stats["requests"]
+        timing["llm_hedges"] = report_stats["hedges"]
+        timing["llm_fallbacks"] = report_stats["fallbacks"]
+        timing["estimated_tokens"] = report_stats["estimated_tokens"]
+        timing["cache_hits"] = report_stats["cache_hits"]
+        timing["dedup_files"] = report_stats["dedup_files"]
+        timing["dedup_tokens_saved"] = report_stats["dedup_tokens_saved"]
+        timing["compression_tokens_saved"] = (
+            report_stats["compression_tokens_before"] - report_stats["compression_tokens_after"]
+        )
+        timing["map_stop_reason"] = report_stats["map_stop_reason"]
+        uncovered = report_stats["uncovered_files"]
+
+        # Falhas da IA viram texto no relatório; aqui elas também viram erro do projeto
+        timing["failed_batches"] = report_stats["failed_batches"]
+        if report_stats["failed_batches"]:
+            llm_errors.append(
+                f"{report_stats['failed_batches']} de {report_stats['map_batches']} lote(s) sem resumo por falha da IA"
+            )
+        if report_stats.get("report_error"):
+            llm_errors.append(f"relatório final não gerado: {report_stats['report_error']}")
+    else:
+        scan_started = time.perf_counter()
+        walk_stats = {}
+        scanned_files = list(scanner.iter_project(project_path, changed_since, stats=walk_stats))
+        timing["scan_seconds"] = time.perf_counter() - scan_started
+
+        analysis_started = time.perf_counter()
+        if config.USE_SCAN_INDEX:
+            findings = scan_index.analyze_incremental(
+                project_path, scanned_files, prune=changed_since is None
+            )
+        else:
+            findings = analyzer.analyze_security(scanned_files)
+        analyzer.record_metrics(findings)
+        timing["analysis_seconds"] = time.perf_counter() - analysis_started
+        skipped = scanner.skipped_counts(walk_stats, scanned_files)
+
+    timing["total_seconds"] = time.perf_counter() - started
+    return {
+        "path": project_path,
+        "files": len(scanned_files),
+        "findings": findings,
+        "skipped": skipped,
+        "report": report,
+        "uncovered_files": uncovered,
+        "llm_error": "; ".join(llm_errors) or None,
+        "timing": timing
+    }
+
+def _count_findings(findings, category: str | None) -> int:
+    if category is None:
+        return len(findings)
+    return findings.categories().get(category, 0)
+
+def write_outputs(result: dict, output_dir: str) -> dict:
+    """
+    Grava o relatório (.md) e os achados com tempos (.json) de um projeto.
+
+    Returns:
+        dict: Resumo do projeto para o summary.json.
+    """
+    name = _output_name(result["path"])
+    findings = result["findings"]
+    paths = {"json": os.path.join(output_dir, f"{name}.json")}
+
+    if result["report"] is not None:
+        paths["markdown"] = os.path.join(output_dir, f"{name}.md")
+        with open(paths["markdown"], "w", encoding="utf-8") as f:
+            f.write(result["report"])
+
+    data = {
+        "path": os.path.realpath(result["path"]),
+        "files": result["files"],
+        "finding_counts": dict(findings.categories()),
+        "skipped": result["skipped"],
+        "uncovered_files": result["uncovered_files"],
+        "llm_error": result["llm_error"],
+        "findings": findings.to_dicts(),
+        "timing": result["timing"]
+    }
+    with open(paths["json"], "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    return {
+        "path": data["path"],
+        "files": data["files"],
+        "findings": len(findings),
+        "finding_counts": data["finding_counts"],
+        "skipped": data["skipped"],
+        "timing": data["timing"],
+        "outputs": paths
+    }
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Analisa um ou mais projetos sem a interface gráfica.")
+    parser.add_argument("paths", nargs="*", help="Pastas dos projetos.")
+    parser.add_argument("--manifest", help="Arquivo com um caminho de projeto por linha.")
+    parser.add_argument("--output-dir", default="inspector-reports", help="Pasta dos relatórios.")
+    parser.add_argument("--jobs", type=int, default=4, help="Projetos analisados ao mesmo tempo.")
+    parser.add_argument(
+        "--llm-concurrency", type=int, default=config.LLM_CONCURRENCY,
+        help="Máximo de requisições à IA em andamento somando todos os projetos."
+    )
+    parser.add_argument(
+        "--changed-since", default=None, metavar="REF",
+        help="Analisa só os arquivos alterados desde esta referência do git (ex: origin/main)."
+    )
+    parser.add_argument("--no-report", action="store_true", help="Só a verificação de segurança, sem IA.")
+    parser.add_argument(
+        "--max-findings", type=int, default=None,
+        help="Sai com código 1 se algum projeto tiver mais achados que isso."
+    )
+    parser.add_argument("--fail-category", default=None, help="Conta só os achados desta categoria.")
+    parser.add_argument(
+        "--metrics-file", default=config.METRICS_EXPORT_PATH or None,
+        help="Grava as métricas da execução (Prometheus se terminar em .prom, JSON nos demais casos)."
+    )
+    args = parser.parse_args(argv)
+
+    paths = list(args.paths)
+    if args.manifest:
+        paths.extend(read_manifest(args.manifest))
+    if not paths:
+        parser.error("informe ao menos um caminho ou --manifest.")
+
+    if not args.no_report and not config.OPENROUTER_API_KEY:
+        print("Erro de Configuração: OPENROUTER_API_KEY não encontrada (use --no-report para análise sem IA).", file=sys.stderr)
+        return EXIT_ERROR
+
+    # Orçamento global: as requisições de todos os projetos disputam as mesmas vagas
+    ai_client.set_max_in_flight(args.llm_concurrency)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    summaries = []
+    errors = []
+    exceeded = []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(args.jobs, len(paths)))) as executor:
+        futures = {
+            executor.submit(analyze_project, path, not args.no_report, args.changed_since): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append({"path": path, "error": str(e)})
+                print(f"[erro] {path}: {e}", file=sys.stderr)
+                continue
+
+            summary = write_outputs(result, args.output_dir)
+            summaries.append(summary)
+            counted = _count_findings(result["findings"], args.fail_category)
+            if args.max_findings is not None and counted > args.max_findings:
+                exceeded.append(summary["path"])
+            if result["llm_error"]:
+                # Relatório incompleto: gravado mesmo assim, mas a execução termina com erro
+                errors.append({"path": path, "error": result["llm_error"]})
+                print(f"[erro] {path}: {result['llm_error']}", file=sys.stderr)
+                continue
+            print(
+                f"[ok] {path}: {summary['files']} arquivos, {summary['findings']} achados, "
+                f"{summary['timing']['total_seconds']:.1f}s",
+                file=sys.stderr
+            )
+
+    summaries.sort(key=lambda s: s["path"])
+    with open(os.path.join(args.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "projects": summaries,
+                "errors": errors,
+                "exceeded_threshold": sorted(exceeded),
+                "total_seconds": time.perf_counter() - started
+            },
+            f, ensure_ascii=False, indent=2
+        )
+    if args.metrics_file:
+        metrics.export(args.metrics_file)
+
+    if errors:
+        return EXIT_ERROR
+    if exceeded:
+        print(f"Limite de achados excedido em {len(exceeded)} projeto(s).", file=sys.stderr)
+        return EXIT_FINDINGS
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,8 +6,9 @@ load_dotenv()
 
 # --- Configurações da API OpenRouter ---
 
-# URL base para o endpoint de chat da API OpenRouter
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# URL base para o endpoint de chat da API OpenRouter.
+# Pode ser trocada (ex: por um servidor local de testes, veja mock_openrouter.py)
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 # Chave da API obtida das variáveis de ambiente
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -16,14 +17,179 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 # Padrão: "google/gemini-flash-1.5" caso não esteja definido no .env
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-flash-1.5")
 
+# Modelo de cada fase (padrão: OPENROUTER_MODEL). Os resumos dos arquivos (Map) e as
+# consolidações por diretório aceitam um modelo rápido; o relatório final (Reduce), um mais forte.
+MAP_MODEL = os.getenv("MAP_MODEL") or OPENROUTER_MODEL
+REDUCE_MODEL = os.getenv("REDUCE_MODEL") or OPENROUTER_MODEL
+
+# Modelos alternativos (separados por vírgula), tentados em ordem quando o modelo da fase falha
+# (erro da API ou novas tentativas esgotadas)
+FALLBACK_MODELS = [m.strip() for m in os.getenv("FALLBACK_MODELS", "").split(",") if m.strip()]
+
+# Requisições "hedged": se a resposta demorar mais que o p95 das últimas chamadas ao mesmo modelo,
+# envia uma cópia da requisição e usa a primeira resposta (reduz a latência de cauda do Map)
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "0") not in ("0", "false", "False")
+# Espera fixa antes da cópia (segundos). 0 = p95 das chamadas bem-sucedidas ao modelo, calculado
+# depois de HEDGE_MIN_SAMPLES chamadas (antes disso, nenhuma cópia é enviada)
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "0"))
+HEDGE_MIN_SAMPLES = 20
+# Espera mínima, para não duplicar respostas que já são rápidas
+HEDGE_MIN_DELAY_SECONDS = 0.5
+
+# Janela de contexto (em tokens) dos modelos conhecidos, usada para dimensionar os lotes do Map
+MODEL_CONTEXT_TOKENS = {
+    "google/gemini-flash-1.5": 1000000,
+    "google/gemini-pro-1.5": 2000000,
+    "openai/gpt-4o": 128000,
+    "openai/gpt-4o-mini": 128000,
+    "anthropic/claude-3.5-sonnet": 200000,
+    "anthropic/claude-3-haiku": 200000,
+    "meta-llama/llama-3.1-8b-instruct": 131072,
+    "mistralai/mistral-7b-instruct": 32768
+}
+
+# Janela de contexto assumida para modelos que não estão na lista acima
+DEFAULT_CONTEXT_TOKENS = 32000
+
+# Tokens de entrada por requisição do Map. 0 = metade da janela de contexto do modelo,
+# limitado a MAP_TOKEN_BUDGET_CAP (lotes enormes geram resumos piores e respostas lentas).
+MAP_TOKEN_BUDGET = int(os.getenv("MAP_TOKEN_BUDGET", "0"))
+MAP_TOKEN_BUDGET_CAP = 24000
+
+# Máximo de arquivos por requisição do Map (cada arquivo rende 1-2 frases de resumo)
+MAP_MAX_FILES_PER_BATCH = 40
+
+# Ordena os arquivos por importância (pontos de entrada, módulos mais importados, achados de
+# segurança...) antes do Map, em vez da ordem das pastas. Ver scheduler.py.
+PRIORITIZE_FILES = os.getenv("PRIORITIZE_FILES", "0") not in ("0", "false", "False")
+
+# Limites da fase Map (0 = sem limite): tempo total (segundos) e tokens somados de todos os lotes.
+# Ao atingir um deles, nenhum lote novo é enviado (no prazo, os lotes sem resposta também deixam de
+# ser aguardados) e o relatório informa os arquivos não resumidos.
+# Com qualquer limite ativo, os arquivos são sempre ordenados por importância.
+MAP_DEADLINE_SECONDS = float(os.getenv("MAP_DEADLINE_SECONDS", "0"))
+MAP_TOKEN_LIMIT = int(os.getenv("MAP_TOKEN_LIMIT", "0"))
+
+# Tokens de resumos enviados de uma vez ao Reduce (relatório final). 0 = mesmo orçamento do Map.
+# Acima disso, os resumos são consolidados por diretório em níveis (redução em árvore).
+REDUCE_TOKEN_BUDGET = int(os.getenv("REDUCE_TOKEN_BUDGET", "0"))
+
+# --- Limites de Uso da API ---
+
+# Número máximo de requisições simultâneas à IA na fase de resumo dos arquivos (Map)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+# Máximo de requisições à IA em andamento ao mesmo tempo em todo o processo (0 = sem limite global).
+# Útil quando vários projetos são analisados em paralelo (ver cli.py --llm-concurrency).
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "0"))
+
+# Limites por minuto aplicados a todas as chamadas (0 = sem limite)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+# Quantas vezes reenviar uma requisição após falha temporária (timeout, conexão, HTTP 429/5xx)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+
+# Espera entre tentativas: exponencial a partir da base, limitada ao máximo, com variação aleatória.
+# Se a API enviar Retry-After, esse tempo é usado no lugar.
+RETRY_BACKOFF_BASE_SECONDS = 1.0
+RETRY_BACKOFF_MAX_SECONDS = 30.0
+
+# Conexões HTTP mantidas abertas (keep-alive) para reaproveitamento entre chamadas
+HTTP_POOL_SIZE = max(10, LLM_CONCURRENCY * 2)
+
 # --- Configurações Gerais do Sistema ---
 
-# Tempo limite (em segundos) para operações de rede
+# Tempo limite (em segundos) para operações de rede (leitura da resposta)
 TIMEOUT_SECONDS = 30
 
-# Tamanho máximo (em bytes) de um arquivo para ser processado
+# Tempo limite (em segundos) para estabelecer a conexão com a API
+CONNECT_TIMEOUT_SECONDS = 5
+
+# Tamanho máximo (em bytes) de um arquivo para ser lido inteiro na memória
 MAX_FILE_BYTES = 200000
 
+# Arquivos maiores que MAX_FILE_BYTES (até este limite) são processados em pedaços:
+# lidos via mmap na análise de segurança e divididos em segmentos no resumo.
+# Acima deste limite o arquivo é ignorado.
+LARGE_FILE_MAX_BYTES = int(os.getenv("LARGE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Tamanho de cada pedaço de um arquivo grande (cortado sempre no fim de uma linha)
+LARGE_FILE_CHUNK_BYTES = int(os.getenv("LARGE_FILE_CHUNK_BYTES", str(1024 * 1024)))
+
+# Segmentos de um arquivo grande enviados para o resumo da IA (os do início do arquivo).
+# A análise de segurança sempre cobre o arquivo inteiro.
+LARGE_FILE_SUMMARY_SEGMENTS = int(os.getenv("LARGE_FILE_SUMMARY_SEGMENTS", "4"))
+
+# Bytes do início do arquivo examinados para detectar binários (byte NUL) antes da leitura completa
+SNIFF_BYTES = 8192
+
+# Número de threads usadas para ler arquivos durante a varredura.
+# Leitura é limitada por I/O (principalmente em discos de rede), então vale usar mais threads que núcleos.
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "16"))
+
+# Número de processos usados na análise de segurança (regex é limitada por CPU e pelo GIL).
+# 0 ou 1 mantém a análise em um único processo (padrão).
+ANALYZER_WORKERS = int(os.getenv("ANALYZER_WORKERS", "0"))
+
+# Volume mínimo (em bytes) para usar vários processos. Abaixo disso, o custo de iniciar
+# os processos é maior que o ganho e a análise roda em série.
+ANALYZER_PARALLEL_MIN_BYTES = int(os.getenv("ANALYZER_PARALLEL_MIN_BYTES", "5000000"))
+
+# Pasta onde ficam os caches persistentes (ex: índice incremental de varredura)
+CACHE_DIR = os.getenv("INSPECTOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "inspector"))
+
+# Cache persistente dos resumos gerados pela IA (chave: modelo + prompt + conteúdo mascarado)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+# Limites do cache de resumos: tamanho total (bytes) e idade máxima das entradas (dias).
+# Acima do tamanho, as entradas usadas há mais tempo são removidas primeiro (LRU).
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+LLM_CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# Se True, reaproveita os achados de arquivos que não mudaram desde a última análise
+USE_SCAN_INDEX = os.getenv("USE_SCAN_INDEX", "1") not in ("0", "false", "False")
+
+# Se True, leitura, análise de segurança e resumos pela IA acontecem ao mesmo tempo (pipeline):
+# os primeiros lotes vão para a IA enquanto o projeto ainda está sendo percorrido.
+# Com USE_SCAN_INDEX, arquivos inalterados (caminho, tamanho e data) não passam de novo pelas regras
+# de segurança, mas continuam sendo lidos para o resumo.
+PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "1") not in ("0", "false", "False")
+
+# Arquivos em espera entre as etapas do pipeline (limita a memória quando uma etapa é mais lenta)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+
+# Arquivo onde as métricas de cada execução são gravadas ("" desativa).
+# Terminando em ".prom", usa o formato de texto do Prometheus (textfile collector); senão, JSON.
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "")
+
+# Se True, a lista de arquivos vem do git (versionados e novos fora do .gitignore), ignorando
+# pastas geradas, caches e dependências. Fora de um repositório git (ou sem o git instalado),
+# a varredura das pastas respeita os arquivos .gitignore.
+GIT_DISCOVERY = os.getenv("GIT_DISCOVERY", "1") not in ("0", "false", "False")
+
+# Arquivos com conteúdo idêntico (ex: bibliotecas copiadas, licenças) são resumidos pela IA uma só vez.
+# A análise de segurança continua cobrindo todas as cópias.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") not in ("0", "false", "False")
+
+# Se True, arquivos quase idênticos (MinHash, requer numpy) também são agrupados
+DEDUP_NEAR_DUPLICATES = os.getenv("DEDUP_NEAR_DUPLICATES", "0") not in ("0", "false", "False")
+
+# Similaridade mínima (0 a 1, Jaccard estimado dos trechos de 5 palavras) para dois arquivos serem "quase idênticos"
+DEDUP_NEAR_THRESHOLD = float(os.getenv("DEDUP_NEAR_THRESHOLD", "0.9"))
+
+# Se True, a fase Map envia à IA um esboço de cada arquivo (importações, assinaturas e docstrings,
+# ver outline.py) em vez do conteúdo completo, reduzindo tokens e latência dos resumos.
+PROMPT_COMPRESSION = os.getenv("PROMPT_COMPRESSION", "0") not in ("0", "false", "False")
+
+# Processos usados para gerar os esboços (o ast é limitado por CPU e pelo GIL).
+# 0 ou 1 gera os esboços no processo atual.
+PROMPT_COMPRESSION_WORKERS = int(os.getenv("PROMPT_COMPRESSION_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Se True, a análise de segurança também aponta literais com alta entropia (chaves e tokens
+# aleatórios sem prefixo conhecido), avaliados em lote com NumPy. Sem o numpy, fica desativada.
+ENTROPY_DETECTION = os.getenv("ENTROPY_DETECTION", "1") not in ("0", "false", "False")
+
 # --- Listas de Exclusão e Permissão ---
 
 # Lista de pastas que devem ser ignoradas automaticamente durante a varredura
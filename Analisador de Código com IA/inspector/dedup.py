@@ -0,0 +1,153 @@
+import hashlib
+import re
+import zlib
+import config
+
+# Palavras por "shingle" (trecho comparado entre arquivos) na detecção de quase-duplicatas
+SHINGLE_SIZE = 5
+
+# Quantidade de funções de hash da assinatura MinHash, divididas em faixas para a busca (LSH)
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+# Arquivos com menos shingles que isto só são comparados por conteúdo idêntico
+# (em textos muito curtos, poucas palavras em comum já parecem "quase iguais")
+MIN_SHINGLES = 20
+
+_WORD = re.compile(r"\w+")
+
+# NumPy, importado no primeiro uso (None = ainda não tentou, False = indisponível)
+_numpy = None
+# Parâmetros das funções de hash da MinHash (semente fixa: assinaturas iguais entre execuções)
+_hash_params = None
+
+def _get_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            # NumPy ausente: só duplicatas idênticas são detectadas
+            _numpy = False
+    return _numpy
+
+def _minhash(content: str):
+    """
+    Assinatura MinHash dos shingles de palavras do texto, calculada de forma vetorizada.
+
+    Usa hash "multiply-shift" (a * x + b em 64 bits, 32 bits mais altos), uma família
+    de funções de hash universal que não precisa de aritmética modular.
+
+    Returns:
+        numpy.ndarray | None: MINHASH_PERMUTATIONS valores, ou None se o texto for curto demais.
+    """
+    global _hash_params
+    np = _get_numpy()
+    words = _WORD.findall(content)
+    if len(words) < SHINGLE_SIZE + MIN_SHINGLES - 1:
+        return None
+
+    if _hash_params is None:
+        rng = np.random.default_rng(20240607)
+        multipliers = rng.integers(1, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+        offsets = rng.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+        _hash_params = (multipliers[:, None], offsets[:, None])
+    multipliers, offsets = _hash_params
+
+    # Hash de cada palavra, combinado em um hash por shingle (janela de SHINGLE_SIZE palavras)
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    count = len(words) - SHINGLE_SIZE + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for position in range(SHINGLE_SIZE):
+            shingles = shingles * np.uint64(1000003) + word_hashes[position:position + count]
+        shingles = np.unique(shingles)
+        hashed = (multipliers * shingles[None, :] + offsets) >> np.uint64(32)
+    return hashed.min(axis=1)
+
+class Deduplicator:
+    """
+    Detecta arquivos com conteúdo idêntico (hash SHA-256) ou quase idêntico (MinHash + LSH)
+    aos já vistos, para que cada grupo seja resumido pela IA uma única vez.
+
+    O primeiro arquivo de cada grupo é o representante (resumido); os demais são membros.
+    Usado por uma única thread (o consumidor dos arquivos no summarizer).
+    """
+
+    def __init__(self, near_duplicates: bool | None = None, threshold: float | None = None):
+        """
+        Args:
+            near_duplicates (bool | None): Detectar também quase-duplicatas. Padrão: config.DEDUP_NEAR_DUPLICATES.
+            threshold (float | None): Similaridade mínima (Jaccard estimado). Padrão: config.DEDUP_NEAR_THRESHOLD.
+        """
+        if near_duplicates is None:
+            near_duplicates = config.DEDUP_NEAR_DUPLICATES
+        self.near_duplicates = near_duplicates and bool(_get_numpy())
+        self.threshold = config.DEDUP_NEAR_THRESHOLD if threshold is None else threshold
+
+        self._by_hash = {}
+        self._signatures = {}
+        self._bands = {}
+        # Representante -> [(membro, "exact" ou "near")]
+        self.groups = {}
+
+    def check(self, path: str, content: str) -> tuple[str, str] | None:
+        """
+        Registra um arquivo e indica se ele duplica um arquivo já visto.
+
+        Returns:
+            tuple[str, str] | None: (representante, "exact" ou "near"), ou None se o arquivo
+            for novo (ele passa a ser representante do próprio grupo).
+        """
+        digest = hashlib.sha256(content.encode("utf-8")).digest()
+        representative = self._by_hash.get(digest)
+        if representative is not None:
+            self.groups[representative].append((path, "exact"))
+            return representative, "exact"
+
+        if self.near_duplicates:
+            signature = _minhash(content)
+            if signature is not None:
+                representative = self._find_similar(signature)
+                if representative is not None:
+                    # Cópias exatas deste arquivo entram no mesmo grupo
+                    self._by_hash[digest] = representative
+                    self.groups[representative].append((path, "near"))
+                    return representative, "near"
+                self._add_signature(path, signature)
+
+        self._by_hash[digest] = path
+        self.groups[path] = []
+        return None
+
+    def _band_keys(self, signature) -> list[tuple]:
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+    def _find_similar(self, signature) -> str | None:
+        # Candidatos: arquivos com ao menos uma faixa da assinatura igual
+        candidates = []
+        for key in self._band_keys(signature):
+            for candidate in self._bands.get(key, ()):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float((self._signatures[candidate] == signature).mean())
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def _add_signature(self, path: str, signature) -> None:
+        self._signatures[path] = signature
+        for key in self._band_keys(signature):
+            self._bands.setdefault(key, []).append(path)
+
+    def duplicate_groups(self) -> dict:
+        """
+        Returns:
+            dict: Representante -> lista de (membro, "exact" ou "near"), só para grupos com membros.
+        """
+        return {representative: members for representative, members in self.groups.items() if members}
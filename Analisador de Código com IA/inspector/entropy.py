@@ -0,0 +1,145 @@
+import re
+import config
+
+# Descrição dos achados deste detector (categoria "Possível Segredo Exposto")
+DESCRIPTION = "Literal com alta entropia (possível credencial)"
+
+# Caracteres aceitos em um literal candidato (base64, base64url, hex, JWT); espaços descartam o literal
+CHARSET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=_-.~"
+
+# Tamanhos dos literais avaliados
+MIN_LENGTH = 20
+MAX_LENGTH = 256
+# Literais só com dígitos hexadecimais (ex: hashes, ids) precisam ser mais longos e estar
+# perto de uma palavra como "key"/"token"; caso contrário, seriam hashes de commit e checksums
+MIN_HEX_LENGTH = 32
+HEX_MIN_ENTROPY = 3.0
+
+# Entropia mínima (bits por caractere): uma fração do máximo possível para o tamanho do literal
+# (log2 do tamanho), limitada a MAX_ENTROPY_THRESHOLD para literais longos
+ENTROPY_RATIO = 0.85
+MAX_ENTROPY_THRESHOLD = 4.2
+
+# Literais entre aspas e valores sem aspas no fim de uma linha "CHAVE=valor" / "chave: valor" (.env, YAML, INI)
+_CANDIDATE = re.compile(
+    r"""(["'`])([A-Za-z0-9+/=_\-.~]{%d,%d})\1|[=:][ \t]*([A-Za-z0-9+/=_\-.~]{%d,%d})[ \t]*\r?$"""
+    % (MIN_LENGTH, MAX_LENGTH, MIN_LENGTH, MAX_LENGTH),
+    re.MULTILINE
+)
+
+# Contexto exigido para literais hexadecimais (na mesma linha, antes do literal)
+_KEY_CONTEXT = re.compile(r"(?i)key|secret|token|passw|auth|cred|signature")
+
+# Checksums de lockfiles ("sha512-...") não são segredos
+_INTEGRITY = re.compile(r"sha\d+-")
+
+# Caminhos ("/usr/lib/...", "./dist/...", "pasta/arquivo" sem maiúsculas) não são segredos;
+# chaves base64 também têm "/", mas quase sempre misturam maiúsculas e minúsculas
+_PATH = re.compile(r"[/.~]|[^A-Z]*/[^A-Z]*\Z")
+
+# NumPy e tabelas derivadas do CHARSET, preparados no primeiro uso
+# (None = ainda não tentou, False = NumPy indisponível)
+_tables = None
+
+def _get_tables():
+    global _tables
+    if _tables is None:
+        try:
+            import numpy as np
+        except ImportError:
+            _tables = False
+            return _tables
+
+        # Byte -> índice do caractere no CHARSET (os candidatos só contêm esses caracteres)
+        char_index = np.zeros(256, dtype=np.int64)
+        for index, char in enumerate(CHARSET):
+            char_index[ord(char)] = index
+        columns = lambda chars: np.array([CHARSET.index(c) for c in chars])
+        _tables = (
+            np,
+            char_index,
+            columns("abcdefghijklmnopqrstuvwxyz"),
+            columns("ABCDEFGHIJKLMNOPQRSTUVWXYZ"),
+            columns("0123456789"),
+            # Qualquer caractere fora de 0-9a-fA-F tira o literal da classe hexadecimal
+            columns("".join(c for c in CHARSET if c not in "0123456789abcdefABCDEF"))
+        )
+    return _tables
+
+def settings() -> tuple:
+    """
+    Parâmetros que afetam os resultados do detector (fazem parte de analyzer.RULES_VERSION).
+    """
+    enabled = config.ENTROPY_DETECTION and bool(_get_tables())
+    return (
+        enabled, DESCRIPTION, CHARSET, MIN_LENGTH, MAX_LENGTH, MIN_HEX_LENGTH,
+        HEX_MIN_ENTROPY, ENTROPY_RATIO, MAX_ENTROPY_THRESHOLD, _CANDIDATE.pattern, _KEY_CONTEXT.pattern,
+        _INTEGRITY.pattern, _PATH.pattern
+    )
+
+def find_secret_spans(content: str) -> list[tuple[int, int]]:
+    """
+    Localiza literais com cara de credencial: longos, sem espaços e com alta entropia de Shannon.
+
+    Os candidatos do arquivo inteiro são extraídos por uma única regex e avaliados juntos em
+    operações vetorizadas do NumPy (histograma de caracteres, entropia e classes de caracteres
+    por literal), sem laço em Python por linha ou por caractere.
+
+    Args:
+        content (str): Texto do arquivo (ou de um pedaço dele).
+
+    Returns:
+        list[tuple[int, int]]: Posições (início, fim) de cada literal suspeito em content, em ordem.
+    """
+    tables = _get_tables() if config.ENTROPY_DETECTION else False
+    if not tables:
+        return []
+    np, char_index, lower_columns, upper_columns, digit_columns, non_hex_columns = tables
+
+    values = []
+    spans = []
+    for match in _CANDIDATE.finditer(content):
+        group = 2 if match.group(2) is not None else 3
+        value = match.group(group)
+        if _INTEGRITY.match(value) or _PATH.match(value):
+            continue
+        values.append(value)
+        spans.append(match.span(group))
+    if not values:
+        return []
+
+    # 1. Histograma de caracteres de cada literal: uma linha por literal, uma coluna por caractere
+    lengths = np.fromiter((len(value) for value in values), dtype=np.int64, count=len(values))
+    data = np.frombuffer("".join(values).encode("ascii"), dtype=np.uint8)
+    literal_ids = np.repeat(np.arange(len(values)), lengths)
+    width = len(CHARSET)
+    counts = np.bincount(literal_ids * width + char_index[data], minlength=len(values) * width)
+    counts = counts.reshape(len(values), width)
+
+    # 2. Entropia de Shannon (bits por caractere) de cada literal
+    probabilities = counts / lengths[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(counts > 0, probabilities * np.log2(probabilities), 0.0)
+    entropy = -terms.sum(axis=1)
+
+    # 3. Classes de caracteres
+    has_lower = counts[:, lower_columns].any(axis=1)
+    has_upper = counts[:, upper_columns].any(axis=1)
+    has_digit = counts[:, digit_columns].any(axis=1)
+    is_hex = ~counts[:, non_hex_columns].any(axis=1) & has_digit
+
+    # 4. Decisão: base64/tokens precisam de letras e dígitos e entropia perto do máximo do tamanho;
+    #    hexadecimais, de tamanho mínimo, entropia própria e contexto (verificado abaixo)
+    threshold = np.minimum(MAX_ENTROPY_THRESHOLD, ENTROPY_RATIO * np.log2(lengths))
+    general = ~is_hex & has_digit & (has_lower | has_upper) & (entropy >= threshold)
+    hex_candidates = is_hex & (lengths >= MIN_HEX_LENGTH) & (entropy >= HEX_MIN_ENTROPY)
+
+    found = [spans[i] for i in np.flatnonzero(general)]
+    for i in np.flatnonzero(hex_candidates):
+        start = spans[i][0]
+        line_start = content.rfind("\n", 0, start) + 1
+        if _KEY_CONTEXT.search(content, line_start, start):
+            found.append(spans[i])
+
+    found.sort()
+    return found
@@ -0,0 +1,213 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Iterable, Iterator
+
+# Categoria dos achados que são mascarados antes do envio à IA
+SECRET_CATEGORY = "Possível Segredo Exposto"
+
+class Finding:
+    """
+    Um achado de segurança: arquivo, linha, categoria, descrição e trecho da linha.
+
+    Achados de segredos também guardam spans: as faixas (início, fim) de colunas da linha com o
+    valor sensível, usadas para mascarar só esse trecho antes do envio à IA. Sem spans, a linha
+    inteira é mascarada.
+
+    Registro compacto (__slots__), sem dicionário por instância. Caminhos, categorias e
+    descrições repetidos são compartilhados entre os registros (sys.intern).
+
+    Para compatibilidade com os registros em dicionário, suporta finding["file"],
+    finding.get(...) e to_dict()/from_dict().
+    """
+
+    __slots__ = ("file", "line", "category", "description", "snippet", "spans")
+
+    def __init__(self, file: str, line: int, category: str, description: str, snippet: str, spans: tuple = ()):
+        self.file = sys.intern(file)
+        self.line = line
+        self.category = sys.intern(category)
+        self.description = sys.intern(description)
+        self.snippet = snippet
+        self.spans = spans
+
+    def __getitem__(self, key: str):
+        if key in Finding.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        if key in Finding.__slots__:
+            return getattr(self, key)
+        return default
+
+    def to_dict(self) -> dict:
+        data = {key: getattr(self, key) for key in Finding.__slots__}
+        data["spans"] = [list(span) for span in self.spans]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Finding":
+        # Registros antigos (sem "spans") continuam válidos: a linha inteira é mascarada
+        spans = tuple(tuple(span) for span in data.get("spans", ()))
+        return cls(data["file"], data["line"], data["category"], data["description"], data["snippet"], spans)
+
+    def __getstate__(self):
+        return (self.file, self.line, self.category, self.description, self.snippet, self.spans)
+
+    def __setstate__(self, state):
+        self.file, self.line, self.category, self.description, self.snippet, self.spans = state
+        self.file = sys.intern(self.file)
+        self.category = sys.intern(self.category)
+        self.description = sys.intern(self.description)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Finding):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __repr__(self) -> str:
+        return f"Finding({self.file!r}, linha {self.line}, {self.category!r})"
+
+class FindingIndex:
+    """
+    Coleção imutável de achados, ordenada por arquivo e linha, com índices para consulta rápida.
+
+    - por arquivo: cada arquivo ocupa uma faixa contínua da lista;
+    - por linha: as linhas ficam em um array paralelo, e uma faixa de linhas é achada por busca binária;
+    - por categoria: posições dos achados de cada categoria.
+
+    Pode ser usada como a antiga lista de dicts: len(), iteração e acesso por posição.
+    """
+
+    def __init__(self, findings: Iterable = ()):
+        """
+        Args:
+            findings (Iterable): Achados (Finding ou dicts no formato antigo), em qualquer ordem.
+                A ordem relativa dos achados de um mesmo arquivo e linha é preservada.
+        """
+        items = [f if isinstance(f, Finding) else Finding.from_dict(f) for f in findings]
+        items.sort(key=lambda f: (f.file, f.line))
+        self._items = items
+        self._lines = array("l", (f.line for f in items))
+
+        # Faixa [início, fim) de cada arquivo e posições de cada categoria
+        self._file_ranges = {}
+        self._category_positions = {}
+        for position, finding in enumerate(items):
+            start_end = self._file_ranges.get(finding.file)
+            if start_end is None:
+                self._file_ranges[finding.file] = [position, position + 1]
+            else:
+                start_end[1] = position + 1
+            self._category_positions.setdefault(finding.category, array("l")).append(position)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Finding]:
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def files(self) -> list[str]:
+        """Arquivos com pelo menos um achado, em ordem alfabética."""
+        return list(self._file_ranges)
+
+    def categories(self) -> Counter:
+        """Quantidade de achados por categoria."""
+        return Counter({category: len(positions) for category, positions in self._category_positions.items()})
+
+    def count_for_file(self, path: str) -> int:
+        start, end = self._file_ranges.get(path, (0, 0))
+        return end - start
+
+    def for_file(
+        self,
+        path: str,
+        start_line: int | None = None,
+        end_line: int | None = None,
+        category: str | None = None
+    ) -> list[Finding]:
+        """
+        Achados de um arquivo, opcionalmente limitados a uma faixa de linhas e a uma categoria.
+
+        Args:
+            path (str): Caminho relativo do arquivo.
+            start_line (int | None): Primeira linha (inclusive).
+            end_line (int | None): Última linha (inclusive).
+            category (str | None): Categoria desejada.
+
+        Returns:
+            list[Finding]: Achados em ordem de linha.
+        """
+        file_range = self._file_ranges.get(path)
+        if file_range is None:
+            return []
+        start, end = file_range
+        if start_line is not None:
+            start = bisect_left(self._lines, start_line, start, end)
+        if end_line is not None:
+            end = bisect_right(self._lines, end_line, start, end)
+
+        selected = self._items[start:end]
+        if category is not None:
+            selected = [f for f in selected if f.category == category]
+        return selected
+
+    def by_category(self, category: str) -> list[Finding]:
+        """Achados de uma categoria, em ordem de arquivo e linha."""
+        return [self._items[position] for position in self._category_positions.get(category, ())]
+
+    def to_dicts(self) -> list[dict]:
+        return [f.to_dict() for f in self._items]
+
+class FindingCollector:
+    """
+    Achados acumulados arquivo a arquivo, enquanto a análise ainda está em andamento (pipeline).
+
+    Oferece a mesma consulta for_file() do FindingIndex para os arquivos já analisados,
+    e vira um FindingIndex completo com as_index() quando a análise termina. Seguro entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_file = {}
+
+    def add(self, path: str, file_findings: list[Finding]) -> None:
+        """Registra os achados de um arquivo (lista vazia se não houver nenhum)."""
+        with self._lock:
+            self._by_file[path] = FindingIndex(file_findings)
+
+    def for_file(
+        self,
+        path: str,
+        start_line: int | None = None,
+        end_line: int | None = None,
+        category: str | None = None
+    ) -> list[Finding]:
+        with self._lock:
+            file_index = self._by_file.get(path)
+        if file_index is None:
+            return []
+        return file_index.for_file(path, start_line, end_line, category)
+
+    def __iter__(self) -> Iterator[Finding]:
+        with self._lock:
+            file_indexes = list(self._by_file.values())
+        for file_index in file_indexes:
+            yield from file_index
+
+def as_index(findings: Iterable) -> FindingIndex:
+    """
+    Retorna os achados como FindingIndex (sem copiar, se já forem um).
+    """
+    if isinstance(findings, FindingIndex):
+        return findings
+    return FindingIndex(findings)
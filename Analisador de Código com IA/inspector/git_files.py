@@ -0,0 +1,209 @@
+import os
+import re
+import shutil
+import subprocess
+
+# Tempo máximo de cada comando git (segundos)
+GIT_TIMEOUT_SECONDS = 60
+
+def _run_git(root_path: str, args: list[str]) -> str | None:
+    """
+    Executa um comando git na pasta informada.
+
+    Returns:
+        str | None: A saída do comando, ou None se o git não estiver instalado,
+        a pasta não for um repositório ou o comando falhar.
+    """
+    if shutil.which("git") is None:
+        return None
+    try:
+        result = subprocess.run(
+            ["git", "-C", root_path, *args],
+            capture_output=True,
+            timeout=GIT_TIMEOUT_SECONDS
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode("utf-8", errors="surrogateescape")
+
+def _split_paths(output: str) -> list[str]:
+    # Saída com -z: caminhos separados por NUL, sem aspas nem escapes; duplicatas
+    # aparecem em arquivos com conflito de merge
+    return list(dict.fromkeys(path for path in output.split("\0") if path))
+
+def list_files(root_path: str) -> list[str] | None:
+    """
+    Arquivos do projeto segundo o git: os versionados e os novos que não estão no .gitignore.
+
+    Args:
+        root_path (str): Pasta do projeto (pode ser uma subpasta do repositório).
+
+    Returns:
+        list[str] | None: Caminhos relativos a root_path (separados por "/"),
+        ou None se a pasta não estiver em um repositório git.
+    """
+    output = _run_git(root_path, ["ls-files", "-z", "--cached", "--others", "--exclude-standard"])
+    if output is None:
+        return None
+    return _split_paths(output)
+
+def changed_files(root_path: str, ref: str) -> list[str]:
+    """
+    Arquivos criados ou alterados desde uma referência do git (commit, branch ou tag),
+    incluindo mudanças ainda não commitadas e arquivos novos fora do .gitignore.
+    Arquivos removidos não entram na lista.
+
+    Args:
+        root_path (str): Pasta do projeto (pode ser uma subpasta do repositório).
+        ref (str): Referência de comparação (ex: "origin/main", "HEAD~3").
+
+    Returns:
+        list[str]: Caminhos relativos a root_path (separados por "/").
+
+    Raises:
+        ValueError: Se a pasta não estiver em um repositório git ou a referência não existir.
+    """
+    if ref.startswith("-"):
+        raise ValueError(f"Referência do git inválida: {ref}")
+    if _run_git(root_path, ["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"]) is None:
+        raise ValueError(f"Não foi possível comparar com '{ref}': a pasta não é um repositório git ou a referência não existe.")
+
+    changed = _run_git(root_path, ["diff", "--name-only", "-z", "--relative", "--diff-filter=ACMRT", ref, "--"])
+    untracked = _run_git(root_path, ["ls-files", "-z", "--others", "--exclude-standard"])
+    if changed is None or untracked is None:
+        raise ValueError(f"Falha ao listar as alterações desde '{ref}'.")
+    return _split_paths(changed + "\0" + untracked)
+
+def _glob_to_regex(pattern: str) -> str:
+    """
+    Converte um padrão do .gitignore (sem "!" e sem "/" final) em expressão regular.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            # "**/" casa com zero ou mais pastas
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                content = pattern[i + 1:end]
+                if content.startswith("!"):
+                    content = "^" + content[1:]
+                parts.append("[" + content.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return "".join(parts)
+
+class GitIgnore:
+    """
+    Regras de um arquivo .gitignore, compiladas em expressões regulares.
+
+    Usado quando o git não está disponível: a varredura lê o .gitignore de cada pasta e
+    consulta as regras de todas as pastas acima do arquivo (a última regra que casa vale,
+    e "!padrão" volta a incluir o caminho, como no git).
+    """
+
+    def __init__(self, base: str, lines: list[str]):
+        """
+        Args:
+            base (str): Pasta do .gitignore, relativa à raiz do projeto ("" para a raiz).
+            lines (list[str]): Linhas do arquivo.
+        """
+        self.base = base
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            # Espaços finais são ignorados, exceto se escapados
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+
+            # Padrões com "/" (fora do final) valem a partir da pasta do .gitignore;
+            # os demais casam com o nome em qualquer nível
+            if "/" in line:
+                regex = _glob_to_regex(line.lstrip("/"))
+            else:
+                regex = "(?:.*/)?" + _glob_to_regex(line)
+            self.rules.append((re.compile(regex + r"\Z", re.DOTALL), negate, dir_only))
+
+    @classmethod
+    def load(cls, folder: str, base: str) -> "GitIgnore | None":
+        """
+        Lê o .gitignore de uma pasta.
+
+        Returns:
+            GitIgnore | None: As regras, ou None se a pasta não tiver .gitignore com regras.
+        """
+        try:
+            with open(os.path.join(folder, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+                ignore = cls(base, f.readlines())
+        except OSError:
+            return None
+        return ignore if ignore.rules else None
+
+    def match(self, relative_path: str, is_dir: bool) -> bool | None:
+        """
+        Args:
+            relative_path (str): Caminho relativo à raiz do projeto, separado por "/".
+            is_dir (bool): Se o caminho é uma pasta.
+
+        Returns:
+            bool | None: True se ignorado, False se incluído por uma regra "!",
+            None se nenhuma regra deste arquivo se aplica.
+        """
+        if self.base:
+            if not relative_path.startswith(self.base + "/"):
+                return None
+            relative_path = relative_path[len(self.base) + 1:]
+
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                result = not negate
+        return result
+
+def is_ignored(ignores: list[GitIgnore], relative_path: str, is_dir: bool) -> bool:
+    """
+    Consulta as regras de várias pastas, da raiz para a mais interna (a mais interna prevalece).
+    """
+    ignored = False
+    for ignore in ignores:
+        result = ignore.match(relative_path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import threading
+import time
+import analyzer
+import config
+import metrics
+import pipeline
+import scan_index
+import scanner
+import summarizer
+
+# Descrição de cada fase, exibida no painel de progresso
+PHASE_LABELS = {
+    "starting": "Iniciando",
+    "scan": "Lendo arquivos",
+    "analysis": "Verificando segurança",
+    "map": "Resumindo arquivos com IA",
+    "tree_reduce": "Consolidando resumos por diretório",
+    "report": "Gerando relatório final",
+    "done": "Concluído"
+}
+
+def project_fingerprint(root_path: str, changed_since: str | None = None) -> str:
+    """
+    Identificador do estado atual do projeto, calculado só com os metadados dos arquivos
+    (caminho, tamanho e data de modificação), sem ler o conteúdo.
+    Muda sempre que algum arquivo analisável é criado, alterado ou removido.
+    """
+    digest = hashlib.sha256()
+    for handle in scanner.iter_project(root_path, changed_since):
+        digest.update(f"{handle.path}\0{handle.size}\0{handle.mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def job_key(root_path: str, changed_since: str | None = None) -> tuple:
+    """
+    Chave dos resultados em cache na sessão: (caminho, referência do git, estado dos arquivos, modelos).
+
+    Raises:
+        ValueError: Se changed_since não puder ser resolvido no repositório git.
+    """
+    return (
+        os.path.realpath(root_path),
+        changed_since,
+        project_fingerprint(root_path, changed_since),
+        config.MAP_MODEL,
+        config.REDUCE_MODEL
+    )
+
+class AnalysisJob:
+    """
+    Uma análise completa (leitura, segurança, resumos e relatório) executada em segundo plano.
+
+    A interface consulta progress e report_text a cada atualização, sem bloquear; cancel()
+    interrompe a execução no próximo ponto de verificação (entre lotes ou pedaços do relatório).
+    """
+
+    def __init__(self, project_path: str, changed_since: str | None = None):
+        self.project_path = project_path
+        # Referência do git: se informada, só os arquivos alterados desde ela são analisados
+        self.changed_since = changed_since
+        self.state = "running"
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+        # Contadores atualizados pelas etapas durante a execução
+        self.progress = {
+            "phase": "starting",
+            "files_scanned": 0,
+            "files_analyzed": 0,
+            "batches_total": 0,
+            "batches_done": 0
+        }
+        # Relatório final, preenchido aos poucos à medida que a IA responde
+        self.report_text = ""
+
+        # Resultados (preenchidos ao final de cada etapa)
+        self.file_paths = []
+        self.security_findings = None
+        self.report_stats = {}
+        self.pipeline_stats = None
+        self.analysis_stats = None
+        self.index_stats = None
+        # Arquivos ignorados por motivo e arquivos grandes processados em pedaços
+        self.skipped = {}
+        self.large_files = 0
+
+        self._cancel = threading.Event()
+        self._map_started = None
+        self._thread = threading.Thread(target=self._run, name="inspector-job", daemon=True)
+
+    def start(self) -> "AnalysisJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def eta(self) -> float | None:
+        """
+        Estimativa do tempo restante do resumo dos arquivos, pelo ritmo dos lotes já concluídos.
+        Enquanto o projeto ainda está sendo lido, o total de lotes cresce e a estimativa é um piso.
+
+        Returns:
+            float | None: Segundos restantes, ou None se ainda não há base para estimar.
+        """
+        done = self.progress["batches_done"]
+        total = self.progress["batches_total"]
+        if self.progress["phase"] != "map" or not done or self._map_started is None:
+            return None
+        per_batch = (time.time() - self._map_started) / done
+        return per_batch * max(0, total - done)
+
+    def _run(self) -> None:
+        try:
+            if config.PIPELINE_ENABLED:
+                self._map_started = time.time()
+                self.pipeline_stats = {}
+                scanned_files, self.security_findings, report_messages = pipeline.run_pipeline(
+                    self.project_path, stats=self.pipeline_stats, progress=self.progress,
+                    cancel=self._cancel, changed_since=self.changed_since
+                )
+                self.report_stats = self.pipeline_stats["report"]
+                self.skipped = self.pipeline_stats["skipped"]
+                self.large_files = self.pipeline_stats["large_files"]
+                self.index_stats = self.pipeline_stats["index"]
+            else:
+                # 1. Leitura (apenas metadados) e análise de segurança
+                self.progress["phase"] = "scan"
+                walk_stats = {}
+                scanned_files = list(scanner.iter_project(self.project_path, self.changed_since, stats=walk_stats))
+                self.progress["files_scanned"] = len(scanned_files)
+
+                self.progress["phase"] = "analysis"
+                if config.USE_SCAN_INDEX:
+                    self.index_stats = {}
+                    self.security_findings = scan_index.analyze_incremental(
+                        self.project_path, scanned_files, stats=self.index_stats,
+                        prune=self.changed_since is None
+                    )
+                    self.analysis_stats = self.index_stats["analysis"]
+                else:
+                    self.analysis_stats = {}
+                    self.security_findings = analyzer.analyze_security(scanned_files, stats=self.analysis_stats)
+                analyzer.record_metrics(self.security_findings)
+                self.progress["files_analyzed"] = len(scanned_files)
+
+                # 2. Resumos dos arquivos
+                self._map_started = time.time()
+                report_messages = summarizer.build_report_messages(
+                    scanner.prefetch(scanned_files), self.security_findings,
+                    stats=self.report_stats, progress=self.progress, cancel=self._cancel
+                )
+                self.skipped = scanner.skipped_counts(walk_stats, scanned_files)
+                self.large_files = sum(1 for f in scanned_files if f.is_large and f.skip_reason is None)
+
+            self.file_paths = [f["path"] for f in scanned_files]
+
+            # 3. Relatório final em streaming
+            self.progress["phase"] = "report"
+            report_stream = summarizer.stream_report(report_messages, stats=self.report_stats)
+            try:
+                for chunk in report_stream:
+                    if self._cancel.is_set():
+                        raise summarizer.AnalysisCancelled("Análise cancelada pelo usuário.")
+                    self.report_text += chunk
+            finally:
+                # Fecha a conexão do streaming, inclusive em caso de cancelamento
+                report_stream.close()
+
+            self.progress["phase"] = "done"
+            self.state = "done"
+        except summarizer.AnalysisCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.state = "error"
+        finally:
+            self.finished = time.time()
+            # Exporta as métricas acumuladas, se METRICS_EXPORT_PATH estiver configurado
+            try:
+                metrics.export()
+            except OSError:
+                pass
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import config
+
+# Nome do arquivo SQLite dentro de config.CACHE_DIR
+CACHE_FILENAME = "llm_cache.sqlite3"
+
+class CacheStats:
+    """
+    Contadores de acertos (hits) e falhas (misses) do cache, seguros entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+# Totais acumulados desde o início do processo
+totals = CacheStats()
+
+# Garante que a criação do banco aconteça uma única vez, mesmo com várias threads
+_init_lock = threading.Lock()
+_initialized_path = None
+
+def _connect() -> sqlite3.Connection:
+    """
+    Abre uma conexão com o banco do cache (uma por operação, pois é usado por várias threads).
+    """
+    global _initialized_path
+    path = os.path.join(config.CACHE_DIR, CACHE_FILENAME)
+    if _initialized_path != path:
+        os.makedirs(config.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+
+    if _initialized_path != path:
+        with _init_lock:
+            if _initialized_path != path:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS entries (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+                conn.commit()
+                _initialized_path = path
+    return conn
+
+def make_key(model: str, template: str, content: str) -> str:
+    """
+    Gera a chave de cache (endereçada pelo conteúdo) para uma requisição.
+
+    Args:
+        model (str): Modelo usado na requisição.
+        template (str): Texto fixo do prompt (instruções).
+        content (str): Conteúdo variável já mascarado (ex: arquivos do lote).
+    """
+    payload = json.dumps([model, template, content], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key: str, stats: CacheStats | None = None) -> str | None:
+    """
+    Busca uma resposta no cache. Entradas mais antigas que config.LLM_CACHE_MAX_AGE_DAYS são ignoradas.
+
+    Args:
+        key (str): Chave gerada por make_key.
+        stats (CacheStats | None): Contadores da execução atual (além dos totais do processo).
+
+    Returns:
+        str | None: A resposta armazenada, ou None se não houver.
+    """
+    if not config.LLM_CACHE_ENABLED:
+        return None
+
+    now = time.time()
+    min_created = now - config.LLM_CACHE_MAX_AGE_DAYS * 86400
+    value = None
+
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND created >= ?", (key, min_created)
+            ).fetchone()
+            if row is not None:
+                value = row[0]
+                # Atualiza o último acesso (base da remoção por LRU)
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        # Cache indisponível (ex: disco cheio ou bloqueado) não deve interromper a análise
+        value = None
+
+    totals.record(value is not None)
+    if stats is not None:
+        stats.record(value is not None)
+    return value
+
+def put(key: str, value: str) -> None:
+    """
+    Armazena uma resposta no cache.
+    """
+    if not config.LLM_CACHE_ENABLED:
+        return
+
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+def evict() -> int:
+    """
+    Remove entradas expiradas (idade) e, se o cache passar de config.LLM_CACHE_MAX_BYTES,
+    as usadas há mais tempo (LRU) até voltar ao limite.
+
+    Returns:
+        int: Quantidade de entradas removidas.
+    """
+    if not config.LLM_CACHE_ENABLED:
+        return 0
+
+    min_created = time.time() - config.LLM_CACHE_MAX_AGE_DAYS * 86400
+    removed = 0
+
+    try:
+        conn = _connect()
+        try:
+            # 1. Remoção por idade
+            removed += conn.execute("DELETE FROM entries WHERE created < ?", (min_created,)).rowcount
+
+            # 2. Remoção por tamanho: percorre do acesso mais antigo ao mais recente
+            total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total_size > config.LLM_CACHE_MAX_BYTES:
+                to_delete = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                    if total_size <= config.LLM_CACHE_MAX_BYTES:
+                        break
+                    to_delete.append((key,))
+                    total_size -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+                removed += len(to_delete)
+
+            conn.commit()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return removed
+
+    return removed
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import config
+
+# Prefixo dos nomes no formato Prometheus
+PROMETHEUS_PREFIX = "inspector_"
+
+# Observações guardadas por série para calcular p50/p95 (as mais recentes)
+_MAX_SAMPLES = 2000
+
+def _series_key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+class Metrics:
+    """
+    Contadores e medições de tempo de todas as etapas, seguros entre threads.
+
+    - inc(): contadores (ex: arquivos ignorados por motivo, bytes lidos, achados por regra);
+    - observe() / timer(): durações (ex: tempo de cada fase, latência de cada chamada à IA),
+      resumidas em quantidade, soma, p50 e p95.
+
+    Cada série é identificada pelo nome e por rótulos (ex: reason="extension", phase="map").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._observations = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            series = self._observations.get(key)
+            if series is None:
+                series = self._observations[key] = {"count": 0, "sum": 0.0, "samples": deque(maxlen=_MAX_SAMPLES)}
+            series["count"] += 1
+            series["sum"] += value
+            series["samples"].append(value)
+
+    @contextmanager
+    def timer(self, phase: str):
+        """
+        Mede a duração de um bloco como "phase_seconds" da fase informada.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("phase_seconds", time.perf_counter() - started, phase=phase)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: 'counters' e 'observations' (listas de séries com 'name' e 'labels'),
+            além de 'started' (início da coleta, em segundos desde a época).
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            observations = [
+                (name, dict(labels), series["count"], series["sum"], list(series["samples"]))
+                for (name, labels), series in sorted(self._observations.items())
+            ]
+        return {
+            "started": self.started,
+            "counters": counters,
+            "observations": [
+                {
+                    "name": name,
+                    "labels": labels,
+                    "count": count,
+                    "sum": total,
+                    "p50": _percentile(samples, 0.50),
+                    "p95": _percentile(samples, 0.95)
+                }
+                for name, labels, count, total, samples in observations
+            ]
+        }
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_series_key(name, labels), 0)
+
+    def counters_by_label(self, name: str, label: str) -> dict:
+        """
+        Valores de um contador agrupados por um rótulo (ex: arquivos ignorados por motivo).
+        """
+        result = {}
+        with self._lock:
+            for (series_name, labels), value in self._counters.items():
+                if series_name == name:
+                    key = dict(labels).get(label)
+                    result[key] = result.get(key, 0) + value
+        return result
+
+def _prometheus_labels(labels: dict, **extra) -> str:
+    merged = dict(labels, **extra)
+    if not merged:
+        return ""
+    escaped = []
+    for key, value in sorted(merged.items()):
+        text = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{text}"')
+    return "{" + ",".join(escaped) + "}"
+
+def to_prometheus(snapshot: dict) -> str:
+    """
+    Converte uma fotografia das métricas para o formato de texto do Prometheus
+    (compatível com o textfile collector do node_exporter).
+    """
+    lines = []
+    declared = set()
+
+    for counter in snapshot["counters"]:
+        name = f"{PROMETHEUS_PREFIX}{counter['name']}_total"
+        if name not in declared:
+            lines.append(f"# TYPE {name} counter")
+            declared.add(name)
+        lines.append(f"{name}{_prometheus_labels(counter['labels'])} {counter['value']}")
+
+    for observation in snapshot["observations"]:
+        name = f"{PROMETHEUS_PREFIX}{observation['name']}"
+        if name not in declared:
+            lines.append(f"# TYPE {name} summary")
+            declared.add(name)
+        labels = observation["labels"]
+        lines.append(f"{name}{_prometheus_labels(labels, quantile='0.5')} {observation['p50']}")
+        lines.append(f"{name}{_prometheus_labels(labels, quantile='0.95')} {observation['p95']}")
+        lines.append(f"{name}_sum{_prometheus_labels(labels)} {observation['sum']}")
+        lines.append(f"{name}_count{_prometheus_labels(labels)} {observation['count']}")
+
+    return "\n".join(lines) + "\n"
+
+def export(path: str | None = None, metrics: Metrics | None = None) -> str | None:
+    """
+    Grava as métricas em arquivo: formato Prometheus se o nome terminar em ".prom",
+    JSON nos demais casos. A escrita é atômica (arquivo temporário + rename), para que
+    coletores nunca leiam um arquivo pela metade.
+
+    Args:
+        path (str | None): Arquivo de destino. Padrão: config.METRICS_EXPORT_PATH.
+        metrics (Metrics | None): Métricas a exportar. Padrão: as do processo (registry).
+
+    Returns:
+        str | None: O caminho gravado, ou None se nenhum destino estiver configurado.
+    """
+    path = path or config.METRICS_EXPORT_PATH
+    if not path:
+        return None
+    snapshot = (metrics or registry).snapshot()
+
+    if path.endswith(".prom"):
+        text = to_prometheus(snapshot)
+    else:
+        text = json.dumps(snapshot, ensure_ascii=False, indent=2)
+
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
+
+# Métricas acumuladas de todas as execuções do processo
+registry = Metrics()
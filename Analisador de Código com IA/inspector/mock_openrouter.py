@@ -0,0 +1,244 @@
+"""
+Servidor HTTP local que imita o endpoint de chat do OpenRouter.
+
+Permite testar o ai_client e medir o desempenho sem acessar a API real (nem gastar créditos).
+Latência, variação (jitter), respostas lentas ocasionais (latência de cauda), taxa de erros e
+modelos indisponíveis são configuráveis. Requisições com "stream": true recebem a resposta em
+server-sent events, como a API real.
+
+Uso:
+    python mock_openrouter.py --port 8765 --latency 0.5 --error-rate 0.1
+    python mock_openrouter.py --latency 0.2 --slow-rate 0.1 --slow-latency 3 --fail-model google/gemini-flash-1.5
+    OPENROUTER_URL=http://127.0.0.1:8765/api/v1/chat/completions OPENROUTER_API_KEY=teste streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockSettings:
+    """
+    Comportamento do servidor simulado. Pode ser alterado com o servidor em execução.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        retry_after: float | None = None,
+        fail_first: int = 0,
+        chunk_delay: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        failing_models: set[str] | None = None,
+        reply: str | None = None,
+        seed: int | None = None
+    ):
+        """
+        Args:
+            latency (float): Atraso base de cada resposta, em segundos.
+            jitter (float): Variação aleatória somada ao atraso (0 a jitter segundos).
+            error_rate (float): Fração das requisições que recebem erro (0.0 a 1.0).
+            error_status (int): Status HTTP dos erros simulados (ex: 500, 503, 429).
+            retry_after (float | None): Valor do header Retry-After enviado com os erros.
+            fail_first (int): Quantidade de requisições iniciais que sempre falham.
+            chunk_delay (float): Atraso entre os pedaços de uma resposta em streaming, em segundos.
+            slow_rate (float): Fração das requisições com atraso extra (latência de cauda, 0.0 a 1.0).
+            slow_latency (float): Atraso extra dessas requisições, em segundos.
+            failing_models (set[str] | None): Modelos que sempre recebem HTTP 404 (modelo indisponível).
+            reply (str | None): Texto fixo das respostas. Padrão: descrição da requisição recebida.
+            seed (int | None): Semente do gerador aleatório (resultados reproduzíveis).
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.fail_first = fail_first
+        self.chunk_delay = chunk_delay
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.failing_models = set(failing_models or ())
+        self.reply = reply
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.slow_requests = 0
+        # Modelo -> requisições recebidas
+        self.models = {}
+
+def _make_handler(settings: MockSettings):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 permite keep-alive (conexões reaproveitadas pelo cliente)
+        protocol_version = "HTTP/1.1"
+        # Envia cabeçalho e corpo sem esperar o ACK (evita ~40ms de atraso artificial por resposta)
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            with settings.lock:
+                settings.requests += 1
+                number = settings.requests
+                model = body.get("model")
+                settings.models[model] = settings.models.get(model, 0) + 1
+                delay = settings.latency + settings.random.uniform(0, settings.jitter)
+                if settings.random.random() < settings.slow_rate:
+                    settings.slow_requests += 1
+                    delay += settings.slow_latency
+                model_missing = model in settings.failing_models
+                fail = number <= settings.fail_first or settings.random.random() < settings.error_rate
+                if fail or model_missing:
+                    settings.errors += 1
+
+            if model_missing:
+                # Como a API real: modelo inexistente é recusado na hora, sem nova tentativa
+                payload = {"error": {"message": f"Modelo indisponível no servidor de testes: {model}"}}
+                self._send_json(404, payload)
+                return
+
+            time.sleep(delay)
+
+            if fail:
+                payload = {"error": {"message": "Erro simulado pelo servidor de testes."}}
+                headers = {}
+                if settings.retry_after is not None:
+                    headers["Retry-After"] = str(settings.retry_after)
+                self._send_json(settings.error_status, payload, headers)
+                return
+
+            messages = body.get("messages", [])
+            prompt = "".join(m.get("content", "") for m in messages)
+            files = prompt.count("Arquivo: ")
+            content = settings.reply or f"Resposta simulada ({files} arquivo(s), {len(prompt)} caracteres de entrada)."
+            usage = {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4
+            }
+            if body.get("stream"):
+                self._send_stream(f"mock-{number}", body.get("model"), content, usage)
+                return
+            payload = {
+                "id": f"mock-{number}",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": usage
+            }
+            self._send_json(200, payload)
+
+        def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # O cliente desistiu (ex: timeout de leitura); nada a fazer
+                pass
+
+        def _send_stream(self, response_id: str, model: str | None, content: str, usage: dict):
+            # Sem Content-Length: o fim da resposta é indicado pelo fechamento da conexão.
+            # Como na API real, o texto vai em UTF-8 sem "\uXXXX" e sem charset no Content-Type.
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            # Um pedaço por palavra, precedido de um comentário de keep-alive (como o OpenRouter envia)
+            events = [": OPENROUTER PROCESSING"]
+            for word in content.split(" "):
+                chunk = {
+                    "id": response_id,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}}]
+                }
+                events.append("data: " + json.dumps(chunk, ensure_ascii=False))
+            # O consumo de tokens vai em um último evento sem texto
+            events.append("data: " + json.dumps({"id": response_id, "model": model, "choices": [], "usage": usage}))
+            events.append("data: [DONE]")
+
+            try:
+                for event in events:
+                    self.wfile.write((event + "\n\n").encode("utf-8"))
+                    self.wfile.flush()
+                    if settings.chunk_delay:
+                        time.sleep(settings.chunk_delay)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            # Silencia o log padrão (uma linha por requisição)
+            pass
+
+    return Handler
+
+def start_mock_server(settings: MockSettings | None = None, port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Inicia o servidor simulado em uma thread de fundo.
+
+    Args:
+        settings (MockSettings | None): Comportamento do servidor. Padrão: sem atraso nem erros.
+        port (int): Porta local (0 = escolhe uma porta livre).
+
+    Returns:
+        tuple: O servidor (use server.shutdown() para parar) e a URL do endpoint de chat.
+    """
+    settings = settings or MockSettings()
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(settings))
+    server.daemon_threads = True
+    server.settings = settings
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/v1/chat/completions"
+    return server, url
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API do OpenRouter.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Atraso base (segundos).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação aleatória do atraso (segundos).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas com erro.")
+    parser.add_argument("--error-status", type=int, default=500, help="Status HTTP dos erros.")
+    parser.add_argument("--retry-after", type=float, default=None, help="Header Retry-After dos erros.")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Atraso entre pedaços do streaming (segundos).")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fração de respostas com atraso extra.")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Atraso extra dessas respostas (segundos).")
+    parser.add_argument(
+        "--fail-model", action="append", default=[],
+        help="Modelo sempre recusado com HTTP 404 (pode ser repetido)."
+    )
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        chunk_delay=args.chunk_delay,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        failing_models=set(args.fail_model)
+    )
+    server, url = start_mock_server(settings, port=args.port)
+    print(f"Servidor simulado em {url} (Ctrl+C para parar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
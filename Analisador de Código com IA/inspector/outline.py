@@ -0,0 +1,286 @@
+import ast
+import json
+import os
+import re
+
+# Tamanho máximo de um valor ou de uma linha mantidos no esboço (o restante vira "...")
+MAX_VALUE_CHARS = 80
+MAX_DOC_CHARS = 200
+
+# Docstrings que começam por uma destas seções não têm uma frase de descrição a aproveitar
+_DOC_SECTIONS = ("Args:", "Returns:", "Yields:", "Raises:")
+
+# Linguagens de chaves: literais de texto de cada família (JS/TS aceitam '...' e `...` com várias
+# letras; em C, Java, Go e Rust, '...' é um único caractere, e em Rust 'a também é um lifetime)
+_JS_TOKEN = re.compile(
+    r"""//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`|[{};]""",
+    re.DOTALL
+)
+_C_TOKEN = re.compile(
+    r"""//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])'|`[^`]*`|[{};]""",
+    re.DOTALL
+)
+# Em CSS só há comentários "/* */" ("//" aparece em URLs)
+_CSS_TOKEN = re.compile(r"""/\*.*?\*/|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|[{};]""", re.DOTALL)
+_BRACE_TOKENIZERS = {
+    ".js": _JS_TOKEN, ".jsx": _JS_TOKEN, ".ts": _JS_TOKEN, ".tsx": _JS_TOKEN, ".css": _CSS_TOKEN,
+    ".c": _C_TOKEN, ".cpp": _C_TOKEN, ".h": _C_TOKEN, ".java": _C_TOKEN, ".go": _C_TOKEN, ".rs": _C_TOKEN
+}
+
+# Blocos cujo conteúdo é mantido (declarações de tipos e módulos); os demais blocos no nível
+# mantido (corpos de funções, objetos literais, regras CSS) viram "{ ... }"
+_SCOPE_HEADER = re.compile(
+    r"\b(?:class|interface|struct|enum|union|namespace|impl|trait|module|extern|object)\b"
+)
+
+# Comentários de linha inteira nos formatos de configuração e scripts
+_LINE_COMMENT_PREFIXES = {
+    ".sh": ("#",), ".yaml": ("#",), ".yml": ("#",), ".toml": ("#",),
+    ".ini": ("#", ";"), ".cfg": ("#", ";"), ".bat": ("::", "rem ", "@rem ")
+}
+
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_HTML_STYLE = re.compile(r"(<style\b[^>]*>).*?(</style>)", re.DOTALL | re.IGNORECASE)
+_HTML_SVG = re.compile(r"(<svg\b[^>]*>).*?(</svg>)", re.DOTALL | re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n[ \t]*(?:\n[ \t]*)+")
+_TRAILING_SPACE = re.compile(r"[ \t]+$", re.MULTILINE)
+
+def _shorten(text: str, limit: int = MAX_VALUE_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _doc_line(node) -> str | None:
+    """
+    Primeiro parágrafo da docstring de um módulo, classe ou função, em uma linha.
+    """
+    doc = ast.get_docstring(node)
+    if not doc or doc.startswith(_DOC_SECTIONS):
+        return None
+    return '"""' + _shorten(doc.strip().split("\n\n")[0], MAX_DOC_CHARS) + '"""'
+
+def _signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature + ":"
+
+def _python_body(nodes: list, depth: int, lines: list[str], source_lines: list[str]) -> None:
+    indent = "    " * depth
+    for node in nodes:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(indent + ast.unparse(node))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            lines.extend(indent + "@" + _shorten(ast.unparse(d)) for d in node.decorator_list)
+            if isinstance(node, ast.ClassDef):
+                bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+                lines.append(indent + f"class {node.name}" + (f"({', '.join(bases)})" if bases else "") + ":")
+            else:
+                lines.append(indent + _signature(node))
+            doc = _doc_line(node)
+            if doc:
+                lines.append(indent + "    " + doc)
+            if isinstance(node, ast.ClassDef):
+                before = len(lines)
+                _python_body(node.body, depth + 1, lines, source_lines)
+                if len(lines) == before and not doc:
+                    lines.append(indent + "    ...")
+            else:
+                lines.append(indent + "    ...")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            # Constantes e campos: nome (e tipo) com o valor encurtado
+            lines.append(indent + _shorten(ast.unparse(node)))
+        elif isinstance(node, ast.Try) and depth == 0:
+            # Importações opcionais ("try: import x / except ImportError")
+            _python_body(node.body, depth, lines, source_lines)
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            # Docstrings já foram incluídas; outros textos soltos são ruído
+            continue
+        elif depth == 0:
+            # Demais comandos do módulo (ex: scripts, "if __name__ == '__main__'"): só a primeira linha
+            first_line = source_lines[node.lineno - 1].strip() if node.lineno <= len(source_lines) else ""
+            multiline = node.end_lineno is not None and node.end_lineno > node.lineno
+            lines.append(_shorten(first_line) + (" ..." if multiline else ""))
+
+def python_outline(content: str) -> str | None:
+    """
+    Esboço de um módulo Python pelo ast: docstring do módulo, importações, constantes, assinaturas
+    de classes e funções (com decoradores e a primeira frase da docstring) e a primeira linha dos
+    demais comandos do módulo. Corpos de funções e comentários são descartados.
+
+    Returns:
+        str | None: O esboço, ou None se o código não for Python válido.
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+
+    lines = []
+    doc = _doc_line(tree)
+    if doc:
+        lines.append(doc)
+    try:
+        _python_body(tree.body, 0, lines, content.splitlines())
+    except RecursionError:
+        return None
+    return "\n".join(lines)
+
+def _doc_comment(comment: str) -> str:
+    # Primeira linha de texto de um comentário de documentação ("/** ... */")
+    for line in comment[3:-2].splitlines():
+        line = line.strip().lstrip("*").strip()
+        if line:
+            return "/** " + _shorten(line, MAX_DOC_CHARS) + " */"
+    return ""
+
+def brace_outline(content: str, tokenizer: re.Pattern) -> str | None:
+    """
+    Esboço de código com chaves (JS/TS, C/C++, Java, Go, Rust, CSS) por um tokenizador simples:
+    remove comentários (exceto a primeira linha dos "/** */"), mantém o nível de topo e o conteúdo
+    de classes, structs, interfaces e namespaces, e troca os demais blocos por "{ ... }".
+
+    Returns:
+        str | None: O esboço, ou None se as chaves não fecharem (tokenização incerta).
+    """
+    parts = []
+    # Blocos abertos cujo conteúdo é mantido, e profundidade dentro de um bloco descartado
+    kept = []
+    skipping = 0
+    # Início do comando atual (texto desde o último ";", "{" ou "}")
+    statement_start = 0
+    cursor = 0
+
+    for match in tokenizer.finditer(content):
+        token = match.group(0)
+        start, end = match.span()
+        if skipping:
+            if token == "{":
+                skipping += 1
+            elif token == "}":
+                skipping -= 1
+                if skipping == 0:
+                    parts.append("{ ... }")
+                    cursor = statement_start = end
+            continue
+
+        if token.startswith("//") or token.startswith("/*"):
+            parts.append(content[cursor:start])
+            if token.startswith("/**") and len(token) > 4:
+                parts.append(_doc_comment(token))
+            cursor = end
+        elif token == "{":
+            header = content[statement_start:start]
+            if _SCOPE_HEADER.search(header):
+                kept.append(True)
+                parts.append(content[cursor:end])
+                cursor = statement_start = end
+            else:
+                parts.append(content[cursor:start])
+                skipping = 1
+        elif token == "}":
+            if not kept:
+                return None
+            kept.pop()
+            parts.append(content[cursor:end])
+            cursor = statement_start = end
+        elif token == ";":
+            parts.append(content[cursor:end])
+            cursor = statement_start = end
+
+    if skipping or kept:
+        return None
+    parts.append(content[cursor:])
+    return "".join(parts)
+
+def json_outline(content: str) -> str | None:
+    """
+    Esboço de um JSON: chaves até o segundo nível, com listas e valores longos resumidos.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+
+    def describe(value, depth: int):
+        if isinstance(value, dict):
+            if depth >= 2:
+                return f"{{{len(value)} chaves}}"
+            return {key: describe(item, depth + 1) for key, item in value.items()}
+        if isinstance(value, list):
+            if depth >= 2 or len(value) > 3:
+                return f"[{len(value)} itens]"
+            return [describe(item, depth + 1) for item in value]
+        if isinstance(value, str):
+            return _shorten(value)
+        return value
+
+    return json.dumps(describe(data, 0), ensure_ascii=False, indent=1)
+
+def markdown_outline(content: str) -> str:
+    """
+    Esboço de um Markdown: títulos e a primeira linha de texto de cada seção, sem blocos de código.
+    """
+    lines = []
+    in_code = False
+    want_text = True
+    for line in content.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            in_code = not in_code
+            continue
+        if in_code or not stripped:
+            continue
+        if stripped.startswith("#"):
+            lines.append(stripped)
+            want_text = True
+        elif want_text:
+            lines.append(_shorten(stripped, MAX_DOC_CHARS))
+            want_text = False
+    return "\n".join(lines)
+
+def _strip_line_comments(content: str, prefixes: tuple) -> str:
+    return "\n".join(
+        line for line in content.splitlines()
+        if not line.lstrip().lower().startswith(prefixes)
+    )
+
+def _normalize_whitespace(content: str) -> str:
+    # Sem espaços no fim das linhas e sem sequências de linhas em branco
+    return _BLANK_LINES.sub("\n\n", _TRAILING_SPACE.sub("", content)).strip("\n")
+
+def compress(path: str, content: str) -> str | None:
+    """
+    Versão reduzida de um arquivo para o resumo da IA (fase Map), escolhida pela extensão:
+    ast para Python, tokenizadores simples para as demais linguagens de ALLOWED_EXTENSIONS.
+
+    Função pura (sem estado global), executada nos processos do pool de compressão.
+
+    Args:
+        path (str): Caminho do arquivo (só a extensão é usada).
+        content (str): Conteúdo já mascarado (analyzer.redact_secrets).
+
+    Returns:
+        str | None: O esboço, ou None se ele não for menor que o original.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    outline = None
+
+    if extension == ".py":
+        outline = python_outline(content)
+    elif extension in _BRACE_TOKENIZERS:
+        outline = brace_outline(content, _BRACE_TOKENIZERS[extension])
+    elif extension == ".json":
+        outline = json_outline(content)
+    elif extension == ".md":
+        outline = markdown_outline(content)
+    elif extension == ".html":
+        outline = _HTML_SVG.sub(r"\1...\2", _HTML_STYLE.sub(r"\1...\2", _HTML_COMMENT.sub("", content)))
+    elif extension in _LINE_COMMENT_PREFIXES:
+        outline = _strip_line_comments(content, _LINE_COMMENT_PREFIXES[extension])
+
+    # Sem esboço próprio (ou falha ao gerá-lo): só remove espaços e linhas em branco
+    outline = _normalize_whitespace(content if outline is None else outline)
+    if not outline or len(outline) >= len(content):
+        return None
+    return outline
@@ -0,0 +1,204 @@
+import queue
+import threading
+import time
+from typing import Iterator
+import analyzer
+import config
+import metrics
+import scan_index
+import scanner
+import summarizer
+from findings import FindingCollector, FindingIndex, as_index
+
+# Marcador de fim de fluxo entre as etapas
+_DONE = object()
+
+def _put(channel: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Coloca um item na fila, esperando enquanto ela estiver cheia (contrapressão).
+
+    Returns:
+        bool: False se o pipeline foi interrompido antes de haver espaço.
+    """
+    while not stop.is_set():
+        try:
+            channel.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(channel: queue.Queue, stop: threading.Event):
+    """
+    Retira o próximo item da fila. Retorna _DONE se o pipeline foi interrompido.
+    """
+    while not stop.is_set():
+        try:
+            return channel.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+def _drain(channel: queue.Queue, stop: threading.Event, errors: list | None = None) -> Iterator:
+    """
+    Gera os itens da fila até o fim do fluxo. Se errors for informado e uma etapa anterior
+    tiver falhado, lança o primeiro erro em vez de terminar normalmente.
+    """
+    while True:
+        item = _get(channel, stop)
+        if item is _DONE:
+            if errors:
+                raise errors[0]
+            return
+        yield item
+
+def run_pipeline(
+    root_path: str,
+    stats: dict | None = None,
+    progress: dict | None = None,
+    cancel: threading.Event | None = None,
+    changed_since: str | None = None
+) -> tuple[list, FindingIndex, list[dict] | None]:
+    """
+    Executa leitura, análise de segurança e resumos pela IA ao mesmo tempo.
+
+    Cada etapa roda em sua própria thread, ligada à seguinte por uma fila limitada
+    (config.PIPELINE_QUEUE_SIZE): os primeiros lotes vão para a IA enquanto o projeto ainda
+    está sendo percorrido, e uma etapa mais rápida espera quando a fila seguinte enche,
+    mantendo a memória limitada. O tempo total tende ao da etapa mais lenta, e não à soma das etapas.
+
+    Args:
+        root_path (str): Caminho raiz do projeto.
+        stats (dict | None): Se informado, é preenchido com 'files', 'analyzed_files', 'analyzed_bytes',
+            'findings', 'large_files' (lidos em pedaços), 'skipped' (ignorados por motivo), 'scan_seconds', 'analysis_seconds', 'total_seconds' (a partir do início),
+            'index' ('reused', 'recomputed' e 'removed' do índice incremental, ou None sem config.USE_SCAN_INDEX)
+            e 'report' (estatísticas do summarizer.build_report_messages).
+        progress (dict | None): Se informado, é atualizado durante a execução com 'files_scanned',
+            'files_analyzed' e os contadores de lotes do summarizer.
+        cancel (threading.Event | None): Se acionado, interrompe todas as etapas.
+        changed_since (str | None): Se informado, só os arquivos alterados desde esta
+            referência do git (ver scanner.iter_project).
+
+    Returns:
+        tuple: FileHandles do projeto (sem conteúdo carregado), achados de segurança
+        e as mensagens do relatório final (None se nenhum arquivo pôde ser resumido).
+
+    Raises:
+        ValueError: Se o caminho não for um diretório (ou changed_since não puder ser resolvido).
+        summarizer.AnalysisCancelled: Se a execução for cancelada.
+    """
+    started = time.perf_counter()
+    read_queue = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    analyzed_queue = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    errors = []
+
+    def fail(error: Exception) -> None:
+        # Interrompe todas as etapas: nenhum lote novo vai para a IA com o projeto incompleto
+        errors.append(error)
+        stop.set()
+
+    scanned_files = []
+    collector = FindingCollector()
+    timings = {"analyzed_files": 0, "analyzed_bytes": 0}
+    walk_stats = {}
+    if progress is not None:
+        progress.update(phase="scan", files_scanned=0, files_analyzed=0)
+
+    # 1. Leitura: percorre o projeto e lê os arquivos em paralelo (threads do scanner)
+    def scan_stage():
+        try:
+            for handle in scanner.prefetch(scanner.iter_project(root_path, changed_since, stats=walk_stats)):
+                scanned_files.append(handle)
+                if progress is not None:
+                    progress["files_scanned"] += 1
+                if not _put(read_queue, handle, stop):
+                    break
+        except Exception as e:
+            fail(e)
+        finally:
+            timings["scan_seconds"] = time.perf_counter() - started
+            _put(read_queue, _DONE, stop)
+
+    # 2. Análise de segurança: os achados de cada arquivo ficam prontos antes do seu resumo.
+    #    Com o índice incremental, arquivos inalterados reaproveitam os achados da última análise.
+    index_stats = {}
+
+    def analyze_stage():
+        index = None
+        try:
+            if config.USE_SCAN_INDEX:
+                index = scan_index.FileIndex(root_path)
+            for handle in _drain(read_queue, stop):
+                if index is not None:
+                    collector.add(handle.path, index.analyze(handle))
+                else:
+                    collector.add(handle.path, analyzer.analyze_file(handle))
+                if progress is not None:
+                    progress["files_analyzed"] += 1
+                # Arquivos grandes não ficam carregados; foram lidos em pedaços pelo analyze_file
+                if handle.skip_reason is None and (handle.is_large or handle.content is not None):
+                    timings["analyzed_files"] += 1
+                    timings["analyzed_bytes"] += handle.size
+                if not _put(analyzed_queue, handle, stop):
+                    break
+        except Exception as e:
+            fail(e)
+        finally:
+            if index is not None:
+                # Só remove do índice os arquivos ausentes se o projeto inteiro foi percorrido
+                try:
+                    index.close(prune=changed_since is None and not errors and not stop.is_set())
+                    index_stats.update(index.stats())
+                except Exception as e:
+                    fail(e)
+            timings["analysis_seconds"] = time.perf_counter() - started
+            _put(analyzed_queue, _DONE, stop)
+
+    stages = [
+        threading.Thread(target=scan_stage, name="inspector-scan", daemon=True),
+        threading.Thread(target=analyze_stage, name="inspector-analyze", daemon=True)
+    ]
+    for stage in stages:
+        stage.start()
+
+    # 3. Resumos: a thread atual consome os arquivos analisados e envia os lotes à IA
+    report_stats = {}
+    try:
+        report_messages = summarizer.build_report_messages(
+            _drain(analyzed_queue, stop, errors), collector, stats=report_stats, progress=progress, cancel=cancel
+        )
+    finally:
+        # Em caso de erro, libera as etapas anteriores que estejam esperando nas filas
+        stop.set()
+        for stage in stages:
+            stage.join()
+
+    if errors:
+        raise errors[0]
+
+    # A leitura terminou; os handles voltam sem conteúdo para não reter memória
+    for handle in scanned_files:
+        handle.release()
+
+    security_findings = as_index(collector)
+    analyzer.record_metrics(security_findings)
+    metrics.registry.inc("analyzed_bytes", timings["analyzed_bytes"])
+    # Fases simultâneas: cada duração conta a partir do início do pipeline
+    metrics.registry.observe("phase_seconds", timings["scan_seconds"], phase="scan")
+    metrics.registry.observe("phase_seconds", timings["analysis_seconds"], phase="analysis")
+
+    if stats is not None:
+        stats["files"] = len(scanned_files)
+        stats["analyzed_files"] = timings["analyzed_files"]
+        stats["analyzed_bytes"] = timings["analyzed_bytes"]
+        stats["findings"] = len(security_findings)
+        stats["large_files"] = sum(1 for handle in scanned_files if handle.is_large and handle.skip_reason is None)
+        stats["skipped"] = scanner.skipped_counts(walk_stats, scanned_files)
+        stats["scan_seconds"] = timings["scan_seconds"]
+        stats["analysis_seconds"] = timings["analysis_seconds"]
+        stats["total_seconds"] = time.perf_counter() - started
+        stats["index"] = index_stats or None
+        stats["report"] = report_stats
+
+    return scanned_files, security_findings, report_messages
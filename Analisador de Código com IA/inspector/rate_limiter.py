@@ -0,0 +1,85 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Limitador de taxa compartilhado entre threads, com dois "baldes de fichas":
+    requisições por minuto e tokens por minuto.
+
+    Cada chamada a acquire() bloqueia até haver capacidade nos dois baldes. Quando a API
+    responde 429, pause() suspende todas as chamadas até o fim do período indicado.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        Args:
+            requests_per_minute (int): Máximo de requisições por minuto (0 = sem limite).
+            tokens_per_minute (int): Máximo de tokens estimados por minuto (0 = sem limite).
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                self.requests_per_minute,
+                self._request_allowance + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute,
+                self._token_allowance + elapsed * self.tokens_per_minute / 60
+            )
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Aguarda até que uma requisição com o número de tokens estimado possa ser enviada.
+
+        Args:
+            tokens (int): Tokens estimados da requisição.
+
+        Returns:
+            float: Tempo total de espera, em segundos.
+        """
+        # Uma requisição maior que o limite por minuto nunca caberia; limita ao tamanho do balde
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    wait = 0.0
+                    if self.requests_per_minute and self._request_allowance < 1:
+                        wait = (1 - self._request_allowance) * 60 / self.requests_per_minute
+                    if self.tokens_per_minute and self._token_allowance < tokens:
+                        wait = max(wait, (tokens - self._token_allowance) * 60 / self.tokens_per_minute)
+
+                    if wait == 0.0:
+                        if self.requests_per_minute:
+                            self._request_allowance -= 1
+                        if self.tokens_per_minute:
+                            self._token_allowance -= tokens
+                        return waited
+
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Suspende todas as requisições por alguns segundos (ex: após uma resposta 429).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
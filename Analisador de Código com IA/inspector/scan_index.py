@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Iterable
+import analyzer
+import config
+import scanner
+from findings import Finding, FindingIndex
+
+# Nome do arquivo SQLite dentro de config.CACHE_DIR
+INDEX_FILENAME = "scan_index.sqlite3"
+
+# Espera máxima (segundos) por outra conexão que esteja gravando no índice
+# (análises simultâneas na CLI com --jobs ou em várias sessões do app)
+INDEX_BUSY_TIMEOUT_SECONDS = 30
+
+def _connect() -> sqlite3.Connection:
+    """
+    Abre (e cria, se necessário) o banco do índice incremental.
+
+    Em modo WAL, leituras não bloqueiam a gravação de outra conexão; as gravações
+    esperam umas pelas outras até INDEX_BUSY_TIMEOUT_SECONDS.
+    """
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(config.CACHE_DIR, INDEX_FILENAME), timeout=INDEX_BUSY_TIMEOUT_SECONDS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Com WAL, NORMAL só sincroniza o disco nos checkpoints: commits pequenos e frequentes ficam baratos
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS files (
+            root TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            findings TEXT NOT NULL,
+            PRIMARY KEY (root, path)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS roots (
+            root TEXT PRIMARY KEY,
+            rules_version TEXT NOT NULL
+        )
+        """
+    )
+    return conn
+
+def _content_hash(content: str | None) -> str:
+    # Arquivos binários/ilegíveis recebem um hash vazio: nada a analisar neles
+    if content is None:
+        return ""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def _handle_hash(handle: scanner.FileHandle) -> str:
+    """
+    Hash do conteúdo de um arquivo. Arquivos grandes (is_large) são lidos em blocos,
+    sem carregar o arquivo inteiro.
+    """
+    if not handle.is_large:
+        return _content_hash(handle.load())
+    digest = hashlib.sha256()
+    try:
+        with open(handle.abs_path, "rb") as f:
+            for block in iter(lambda: f.read(config.LARGE_FILE_CHUNK_BYTES), b""):
+                digest.update(block)
+    except OSError:
+        return ""
+    return "large:" + digest.hexdigest()
+
+def _load_root(conn: sqlite3.Connection, root_key: str) -> dict:
+    """
+    Entradas do índice de um projeto: caminho -> (tamanho, data, hash, achados em JSON).
+    Regras diferentes (analyzer.RULES_VERSION) invalidam todo o índice do projeto,
+    em uma transação própria (a trava de gravação não fica com o chamador).
+    """
+    row = conn.execute("SELECT rules_version FROM roots WHERE root = ?", (root_key,)).fetchone()
+    if row is None or row[0] != analyzer.RULES_VERSION:
+        conn.execute("DELETE FROM files WHERE root = ?", (root_key,))
+        conn.execute(
+            "INSERT OR REPLACE INTO roots (root, rules_version) VALUES (?, ?)",
+            (root_key, analyzer.RULES_VERSION)
+        )
+        conn.commit()
+
+    return {
+        path: (size, mtime_ns, sha256, findings)
+        for path, size, mtime_ns, sha256, findings in conn.execute(
+            "SELECT path, size, mtime_ns, sha256, findings FROM files WHERE root = ?", (root_key,)
+        )
+    }
+
+def _store(conn: sqlite3.Connection, root_key: str, handle: scanner.FileHandle, sha256: str, file_findings: list) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO files (root, path, size, mtime_ns, sha256, findings) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            root_key, handle.path, handle.size, handle.mtime_ns, sha256,
+            json.dumps([f.to_dict() for f in file_findings])
+        )
+    )
+
+def _touch(conn: sqlite3.Connection, root_key: str, handle: scanner.FileHandle) -> None:
+    # Mesmo conteúdo com outra data (ex: checkout do git): só atualiza tamanho e data
+    conn.execute(
+        "UPDATE files SET size = ?, mtime_ns = ? WHERE root = ? AND path = ?",
+        (handle.size, handle.mtime_ns, root_key, handle.path)
+    )
+
+def _prune(conn: sqlite3.Connection, root_key: str, indexed: dict, seen_paths: set) -> list[str]:
+    removed = [path for path in indexed if path not in seen_paths]
+    conn.executemany(
+        "DELETE FROM files WHERE root = ? AND path = ?",
+        [(root_key, path) for path in removed]
+    )
+    return removed
+
+class FileIndex:
+    """
+    Índice incremental consultado arquivo a arquivo, para a etapa de análise do pipeline
+    (em que cada arquivo já chega lido para o resumo da IA).
+
+    Arquivos com caminho, tamanho e data de modificação iguais aos do índice (ou com outra data,
+    mas o mesmo hash do conteúdo) reaproveitam os achados sem passar pelas regras do analyzer.
+
+    Cada gravação é confirmada na hora: entre um arquivo e outro (ex: enquanto o pipeline espera
+    pelos resumos da IA), o índice não fica travado para outras análises.
+
+    A conexão SQLite pertence à thread que criou o objeto: use-o em uma única thread.
+    """
+
+    def __init__(self, root_path: str):
+        self.root_key = os.path.realpath(root_path)
+        self._conn = _connect()
+        self._indexed = _load_root(self._conn, self.root_key)
+        self._seen_paths = set()
+        self.reused = 0
+        self.recomputed = 0
+        self.removed = 0
+
+    def analyze(self, handle: scanner.FileHandle) -> list[Finding]:
+        """
+        Achados de um arquivo (do índice ou de analyzer.analyze_file), sem liberar o conteúdo.
+        """
+        self._seen_paths.add(handle.path)
+        entry = self._indexed.get(handle.path)
+        if entry is not None and entry[0] == handle.size and entry[1] == handle.mtime_ns:
+            self.reused += 1
+            return [Finding.from_dict(f) for f in json.loads(entry[3])]
+
+        sha256 = _handle_hash(handle)
+        if entry is not None and entry[2] == sha256:
+            _touch(self._conn, self.root_key, handle)
+            self._conn.commit()
+            self.reused += 1
+            return [Finding.from_dict(f) for f in json.loads(entry[3])]
+
+        file_findings = analyzer.analyze_file(handle)
+        _store(self._conn, self.root_key, handle, sha256, file_findings)
+        self._conn.commit()
+        self.recomputed += 1
+        return file_findings
+
+    def close(self, prune: bool = True) -> None:
+        """
+        Remove os arquivos ausentes (se prune) e fecha a conexão.
+
+        Args:
+            prune (bool): Remove os arquivos do índice que não passaram por analyze(). Use False
+                se a análise foi interrompida ou cobriu só parte do projeto (ex: changed_since).
+        """
+        try:
+            if prune:
+                self.removed = len(_prune(self._conn, self.root_key, self._indexed, self._seen_paths))
+            self._conn.commit()
+        finally:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        return {"reused": self.reused, "recomputed": self.recomputed, "removed": self.removed}
+
+def analyze_incremental(
+    root_path: str,
+    file_handles: Iterable,
+    stats: dict | None = None,
+    prune: bool = True
+) -> FindingIndex:
+    """
+    Executa a análise de segurança reaproveitando resultados de execuções anteriores.
+
+    Para cada arquivo o índice guarda tamanho, data de modificação, hash do conteúdo e os achados.
+    - Tamanho e data iguais: os achados são reaproveitados sem ler o arquivo.
+    - Data diferente mas hash igual (ex: checkout do git): reaproveita e atualiza a data.
+    - Arquivo novo ou alterado: é lido e analisado novamente.
+    - Arquivo que não existe mais: sai do índice (se prune=True).
+
+    Args:
+        root_path (str): Caminho raiz do projeto (chave do índice).
+        file_handles (Iterable): FileHandles do projeto (saída de scanner.iter_project).
+        stats (dict | None): Se informado, é preenchido com 'reused', 'recomputed', 'removed',
+            'seconds', 'read' (leitura para conferir o hash) e 'analysis' (estatísticas do analyzer).
+        prune (bool): Use False quando file_handles for só parte do projeto (ex: arquivos
+            alterados desde uma referência do git), para não apagar os demais do índice.
+
+    Returns:
+        FindingIndex: Achados no mesmo formato de analyzer.analyze_security.
+    """
+    started = time.perf_counter()
+    root_key = os.path.realpath(root_path)
+
+    conn = _connect()
+    try:
+        # 1. Regras diferentes invalidam todo o índice deste projeto
+        indexed = _load_root(conn, root_key)
+
+        findings = []
+        seen_paths = set()
+        stale = []
+        reused = 0
+
+        # 2. Arquivos com tamanho e data inalterados não precisam ser lidos
+        for handle in file_handles:
+            seen_paths.add(handle.path)
+            entry = indexed.get(handle.path)
+            if entry is not None and entry[0] == handle.size and entry[1] == handle.mtime_ns:
+                findings.extend(json.loads(entry[3]))
+                reused += 1
+            else:
+                stale.append(handle)
+
+        # 3. Para os demais, o hash do conteúdo decide se é preciso reanalisar
+        read_stats = {}
+        changed = []
+        for handle in scanner.prefetch(stale, stats=read_stats):
+            sha256 = _handle_hash(handle)
+            entry = indexed.get(handle.path)
+            if entry is not None and entry[2] == sha256:
+                findings.extend(json.loads(entry[3]))
+                _touch(conn, root_key, handle)
+                reused += 1
+            else:
+                changed.append((handle, sha256))
+            scanner.release(handle)
+
+        # 4. Análise apenas dos arquivos novos ou alterados
+        analysis_stats = {}
+        new_findings = analyzer.analyze_security([h for h, _ in changed], stats=analysis_stats)
+
+        for handle, sha256 in changed:
+            file_findings = new_findings.for_file(handle.path)
+            findings.extend(file_findings)
+            _store(conn, root_key, handle, sha256, file_findings)
+
+        # 5. Remove do índice os arquivos que não existem mais
+        removed = _prune(conn, root_key, indexed, seen_paths) if prune else []
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Mesma ordenação do analyzer.analyze_security (o índice ordena por arquivo e linha)
+    findings = FindingIndex(findings)
+
+    if stats is not None:
+        stats["reused"] = reused
+        stats["recomputed"] = len(changed)
+        stats["removed"] = len(removed)
+        stats["seconds"] = time.perf_counter() - started
+        stats["read"] = read_stats
+        stats["analysis"] = analysis_stats
+
+    return findings
@@ -1,67 +1,549 @@
+import codecs
+import mmap
 import os
+import time
+from collections import deque
+from stat import S_ISREG
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
 import config
+import git_files
+import metrics
 
-def scan_project(root_path: str) -> list[dict]:
+# Marcador para "conteúdo ainda não carregado" (None significa "arquivo não é texto")
+_NOT_LOADED = object()
+
+class FileHandle:
     """
-    Varre um diretório local recursivamente para encontrar arquivos de texto permitidos.
-    
+    Referência leve a um arquivo do projeto.
+
+    Guarda apenas caminho, tamanho e data de modificação. O conteúdo é lido sob demanda
+    e pode ser liberado depois do uso, para que a memória não cresça com o tamanho do projeto.
+
+    Arquivos maiores que config.MAX_FILE_BYTES (is_large) nunca são carregados inteiros:
+    load() retorna None e o texto é lido em pedaços com iter_chunks().
+
+    Para compatibilidade com os registros em dicionário do scan_project, suporta
+    file_handle["path"], file_handle["content"] e file_handle.get(...).
+    """
+
+    __slots__ = ("path", "abs_path", "size", "mtime_ns", "skip_reason", "_content")
+
+    def __init__(self, path: str, abs_path: str, size: int, mtime_ns: int):
+        self.path = path
+        self.abs_path = abs_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # Motivo pelo qual o arquivo não pôde ser lido ("binary", "not_utf8", "read_error")
+        self.skip_reason = None
+        self._content = _NOT_LOADED
+
+    @property
+    def is_large(self) -> bool:
+        return self.size > config.MAX_FILE_BYTES
+
+    def load(self) -> str | None:
+        """
+        Retorna o conteúdo do arquivo, lendo do disco se necessário.
+
+        Returns:
+            str | None: O texto do arquivo, ou None se ele for binário, não for texto válido,
+            não puder ser lido ou for grande demais para ser carregado inteiro (ver iter_chunks).
+        """
+        if self.is_large:
+            return None
+        if self._content is _NOT_LOADED:
+            self._content, self.skip_reason = _read_text(self.abs_path)
+        return self._content
+
+    def iter_chunks(self, chunk_bytes: int | None = None) -> Iterator[tuple[int, str]]:
+        """
+        Lê o arquivo em pedaços de linhas inteiras, sem carregá-lo todo na memória (mmap).
+
+        Args:
+            chunk_bytes (int | None): Tamanho aproximado de cada pedaço. Padrão: config.LARGE_FILE_CHUNK_BYTES.
+
+        Yields:
+            tuple[int, str]: Linhas antes do pedaço (para numerar os achados) e o texto do pedaço.
+            Nada é gerado se o arquivo for binário ou ilegível (o motivo fica em skip_reason).
+        """
+        self.skip_reason = None
+        yield from _iter_text_chunks(self, chunk_bytes or config.LARGE_FILE_CHUNK_BYTES)
+
+    @property
+    def content(self) -> str | None:
+        return self.load()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._content is not _NOT_LOADED
+
+    def release(self) -> None:
+        """Libera o conteúdo carregado. Ele será lido novamente se for acessado outra vez."""
+        self._content = _NOT_LOADED
+
+    def __getstate__(self):
+        # O conteúdo nunca é serializado (ex: envio para outro processo); ele é relido no destino
+        return (self.path, self.abs_path, self.size, self.mtime_ns)
+
+    def __setstate__(self, state):
+        self.path, self.abs_path, self.size, self.mtime_ns = state
+        self.skip_reason = None
+        self._content = _NOT_LOADED
+
+    def __getitem__(self, key: str):
+        if key == "path":
+            return self.path
+        if key == "content":
+            return self.load()
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return f"FileHandle({self.path!r}, size={self.size})"
+
+def release(file_info) -> None:
+    """
+    Libera o conteúdo de um arquivo já processado.
+    Registros em dicionário (scan_project) são ignorados, pois o chamador controla a lista.
+    """
+    if isinstance(file_info, FileHandle):
+        file_info.release()
+
+def _walk_order_key(relative_path: str) -> tuple:
+    """
+    Chave de ordenação que reproduz a ordem da varredura por pastas: em cada pasta,
+    os arquivos (em ordem alfabética) vêm antes das subpastas.
+    """
+    parts = relative_path.split("/")
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+def _record_walk(walked: int, skipped: dict, busy: float, stats: dict | None) -> None:
+    metrics.registry.inc("files_walked", walked)
+    for reason, count in skipped.items():
+        if count:
+            metrics.registry.inc("files_skipped", count, reason=reason)
+    metrics.registry.observe("phase_seconds", busy, phase="walk")
+
+    if stats is not None:
+        stats["walked"] = walked
+        stats["skipped"] = {reason: count for reason, count in skipped.items() if count}
+
+def _walk_candidates(root_path: str, use_gitignore: bool = False, stats: dict | None = None):
+    """
+    Percorre a árvore de diretórios com os.scandir e gera os arquivos candidatos à leitura.
+
+    A ordem é determinística: as entradas de cada pasta são ordenadas por nome, os arquivos
+    da pasta atual vêm antes das subpastas (mesma ordem "top-down" do os.walk).
+
     Args:
-        root_path (str): O caminho raiz do projeto a ser analisado.
-        
-    Returns:
-        list[dict]: Uma lista de dicionários contendo 'path' (caminho relativo) e 'content' (texto).
+        root_path (str): O caminho raiz do projeto.
+        use_gitignore (bool): Se True, também respeita os arquivos .gitignore das pastas
+            (usado quando o git não está disponível).
+        stats (dict | None): Se informado, recebe ao final 'walked' e 'skipped' (ignorados por motivo).
+
+    Yields:
+        tuple[str, os.stat_result]: Caminho completo do arquivo e o stat da entrada.
     """
-    
-    # Verifica se o caminho raiz existe e é um diretório
-    if not os.path.isdir(root_path):
-        raise ValueError(f"O caminho fornecido não é um diretório válido: {root_path}")
+    # Pilha de pastas pendentes (busca em profundidade sem recursão), com o caminho
+    # relativo à raiz e as regras de .gitignore das pastas acima
+    pending_dirs = [(root_path, "", [])]
 
-    scanned_files = []
+    # Contadores locais (registrados em metrics ao final, sem custo por arquivo)
+    walked = 0
+    skipped = {
+        "ignored_folder": 0, "unreadable_folder": 0, "gitignore": 0,
+        "extension": 0, "stat_error": 0, "too_large": 0
+    }
+    # Tempo gasto aqui dentro, sem contar o processamento de quem consome os arquivos
+    busy = 0.0
+    resumed = time.perf_counter()
 
-    # os.walk gera os nomes dos arquivos em uma árvore de diretórios, percorrendo de cima para baixo
-    for current_dir, dirs, files in os.walk(root_path):
-        
-        # 1. Filtragem de Pastas
-        # Modificamos a lista 'dirs' in-place para impedir que o os.walk entre em pastas ignoradas.
-        # Isso é mais eficiente do que verificar o caminho completo depois.
-        dirs[:] = [d for d in dirs if d not in config.IGNORED_FOLDERS]
-
-        for filename in files:
-            file_path = os.path.join(current_dir, filename)
-            
-            # 2. Verificação de Extensão
-            # Verifica se a extensão do arquivo está na lista de permitidos
-            _, ext = os.path.splitext(filename)
-            if ext not in config.ALLOWED_EXTENSIONS:
-                continue
+    try:
+        while pending_dirs:
+            current_dir, relative_dir, ignores = pending_dirs.pop()
 
-            # 3. Verificação de Tamanho
-            # Ignora arquivos que excedem o limite de bytes configurado
             try:
-                if os.path.getsize(file_path) > config.MAX_FILE_BYTES:
-                    continue
+                with os.scandir(current_dir) as it:
+                    entries = sorted(it, key=lambda e: e.name)
             except OSError:
-                # Se não for possível obter o tamanho (ex: link quebrado, permissão), ignora
+                # Pasta sem permissão ou removida durante a varredura
+                skipped["unreadable_folder"] += 1
+                continue
+
+            if use_gitignore:
+                folder_ignore = git_files.GitIgnore.load(current_dir, relative_dir)
+                if folder_ignore is not None:
+                    ignores = ignores + [folder_ignore]
+
+            subdirs = []
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                try:
+                    # 1. Filtragem de Pastas
+                    # Links simbólicos para pastas não são seguidos (mesmo comportamento do os.walk)
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name in config.IGNORED_FOLDERS:
+                            skipped["ignored_folder"] += 1
+                        elif ignores and git_files.is_ignored(ignores, relative_path, is_dir=True):
+                            skipped["gitignore"] += 1
+                        else:
+                            subdirs.append((entry.path, relative_path, ignores))
+                        continue
+
+                    if not entry.is_file():
+                        continue
+                    walked += 1
+
+                    if ignores and git_files.is_ignored(ignores, relative_path, is_dir=False):
+                        skipped["gitignore"] += 1
+                        continue
+
+                    # 2. Verificação de Extensão
+                    _, ext = os.path.splitext(entry.name)
+                    if ext not in config.ALLOWED_EXTENSIONS:
+                        skipped["extension"] += 1
+                        continue
+
+                    # 3. Verificação de Tamanho
+                    # O stat da entrada é reaproveitado, sem uma chamada extra a os.path.getsize
+                    stat = entry.stat()
+                except OSError:
+                    # Se não for possível obter o tamanho (ex: link quebrado, permissão), ignora
+                    skipped["stat_error"] += 1
+                    continue
+
+                if stat.st_size > config.LARGE_FILE_MAX_BYTES:
+                    skipped["too_large"] += 1
+                    continue
+
+                busy += time.perf_counter() - resumed
+                yield entry.path, stat
+                resumed = time.perf_counter()
+
+            # Empilha as subpastas em ordem reversa para visitá-las em ordem alfabética
+            pending_dirs.extend(reversed(subdirs))
+    finally:
+        busy += time.perf_counter() - resumed
+        _record_walk(walked, skipped, busy, stats)
+
+def _listed_candidates(root_path: str, relative_paths: list[str], stats: dict | None = None):
+    """
+    Mesmo filtro do _walk_candidates (pastas ignoradas, extensão e tamanho) aplicado a uma
+    lista pronta de arquivos (ex: fornecida pelo git), na mesma ordem da varredura por pastas.
+
+    Args:
+        root_path (str): O caminho raiz do projeto.
+        relative_paths (list[str]): Caminhos relativos à raiz, separados por "/".
+        stats (dict | None): Se informado, recebe ao final 'walked' e 'skipped' (ignorados por motivo).
+
+    Yields:
+        tuple[str, os.stat_result]: Caminho completo do arquivo e o seu stat.
+    """
+    ignored_folders = set(config.IGNORED_FOLDERS)
+    walked = 0
+    skipped = {"ignored_folder": 0, "extension": 0, "stat_error": 0, "too_large": 0}
+    busy = 0.0
+    resumed = time.perf_counter()
+
+    try:
+        for relative_path in sorted(relative_paths, key=_walk_order_key):
+            walked += 1
+            folders = relative_path.split("/")[:-1]
+            if ignored_folders.intersection(folders):
+                skipped["ignored_folder"] += 1
+                continue
+
+            _, ext = os.path.splitext(relative_path)
+            if ext not in config.ALLOWED_EXTENSIONS:
+                skipped["extension"] += 1
                 continue
 
-            # 4. Leitura do Conteúdo
+            file_path = os.path.join(root_path, *relative_path.split("/"))
             try:
-                # Tenta abrir o arquivo como UTF-8 (padrão para código fonte moderno)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                # Se falhar a decodificação, não é um arquivo de texto válido (ou é binário)
+                stat = os.stat(file_path)
+            except OSError:
+                # Ex: arquivo versionado mas removido da cópia de trabalho
+                skipped["stat_error"] += 1
                 continue
-            except (IOError, PermissionError):
-                # Ignora erros de leitura/permissão para não quebrar o scanner
+            if not S_ISREG(stat.st_mode):
+                # Ex: submódulos do git aparecem como uma entrada da lista
                 continue
 
-            # 5. Cálculo do Caminho Relativo
-            # Retorna o caminho relativo ao root_path para facilitar a visualização
-            relative_path = os.path.relpath(file_path, root_path)
+            if stat.st_size > config.LARGE_FILE_MAX_BYTES:
+                skipped["too_large"] += 1
+                continue
+
+            busy += time.perf_counter() - resumed
+            yield file_path, stat
+            resumed = time.perf_counter()
+    finally:
+        busy += time.perf_counter() - resumed
+        _record_walk(walked, skipped, busy, stats)
+
+def _sniff_encoding(head: bytes) -> str | None:
+    """
+    Decide a codificação pelo início do arquivo, antes de lê-lo inteiro.
+
+    Returns:
+        str | None: "utf-8-sig" ou "utf-16" se houver BOM, "utf-8" nos demais casos,
+        ou None se houver um byte NUL (arquivo binário).
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if b"\0" in head:
+        return None
+    return "utf-8"
+
+def _normalize_newlines(text: str) -> str:
+    # Mesmo resultado da leitura em modo texto do Python ("\r\n" e "\r" viram "\n")
+    if "\r" in text:
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def _skip(reason: str) -> str:
+    metrics.registry.inc("files_skipped", reason=reason)
+    return reason
+
+def _read_text(file_path: str) -> tuple[str | None, str | None]:
+    """
+    Lê um arquivo de texto. Binários são descartados pelos primeiros config.SNIFF_BYTES bytes,
+    sem ler o restante do arquivo.
+
+    Returns:
+        tuple: O texto (ou None) e o motivo do descarte ("binary", "not_utf8", "read_error" ou None).
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(config.SNIFF_BYTES)
+            encoding = _sniff_encoding(head)
+            if encoding is None:
+                return None, _skip("binary")
+            data = head + f.read()
+    except OSError:
+        # Ignora erros de leitura/permissão para não quebrar o scanner
+        return None, _skip("read_error")
+
+    try:
+        content = _normalize_newlines(data.decode(encoding))
+    except UnicodeDecodeError:
+        # Se falhar a decodificação, não é um arquivo de texto válido
+        return None, _skip("not_utf8")
+
+    metrics.registry.inc("files_read")
+    metrics.registry.inc("bytes_read", len(data))
+    return content, None
+
+def _lines_in_chunk(text: str) -> int:
+    """
+    Linhas completas de um pedaço, na mesma contagem de str.splitlines() (usada na numeração dos achados).
+    """
+    lines = len(text.splitlines())
+    # Pedaço cortado no meio de uma linha muito longa: a linha continua no próximo
+    if text and not text.endswith("\n"):
+        lines -= 1
+    return lines
+
+def _iter_text_chunks(handle: FileHandle, chunk_bytes: int) -> Iterator[tuple[int, str]]:
+    try:
+        with open(handle.abs_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            encoding = _sniff_encoding(data[:config.SNIFF_BYTES])
+            if encoding is None or encoding == "utf-16":
+                # UTF-16 não pode ser cortado nos bytes de "\n"; arquivos grandes só em UTF-8
+                handle.skip_reason = _skip("binary" if encoding is None else "not_utf8")
+                return
+
+            metrics.registry.inc("files_read")
+            metrics.registry.inc("large_files")
+            # O decodificador incremental junta caracteres multibyte cortados entre dois pedaços
+            decoder = codecs.getincrementaldecoder(encoding)()
+            size = len(data)
+            start = 0
+            line_offset = 0
+
+            while start < size:
+                end = min(start + chunk_bytes, size)
+                if end < size:
+                    newline = data.rfind(b"\n", start, end)
+                    if newline != -1:
+                        end = newline + 1
+                    elif data[end - 1] == ord("\r") and end - 1 > start:
+                        # Não separa um "\r\n" entre dois pedaços
+                        end -= 1
+
+                try:
+                    text = _normalize_newlines(decoder.decode(data[start:end], final=end == size))
+                except UnicodeDecodeError:
+                    handle.skip_reason = _skip("not_utf8")
+                    return
+                metrics.registry.inc("bytes_read", end - start)
+
+                yield line_offset, text
+                line_offset += _lines_in_chunk(text)
+                start = end
+    except (OSError, ValueError):
+        # ValueError: arquivo esvaziado entre a listagem e a leitura (mmap de tamanho zero)
+        handle.skip_reason = _skip("read_error")
+
+def _discover(root_path: str, changed_since: str | None, stats: dict | None):
+    """
+    Escolhe como listar os arquivos do projeto:
+    - changed_since: apenas os alterados desde a referência do git;
+    - config.GIT_DISCOVERY: os arquivos que o git conhece (versionados e novos fora do .gitignore),
+      ou uma varredura que respeita os .gitignore se a pasta não for um repositório git;
+    - caso contrário, a varredura completa das pastas.
+    """
+    if changed_since:
+        metrics.registry.inc("discovery", mode="changed")
+        return _listed_candidates(root_path, git_files.changed_files(root_path, changed_since), stats)
+
+    if config.GIT_DISCOVERY:
+        tracked = git_files.list_files(root_path)
+        if tracked is not None:
+            metrics.registry.inc("discovery", mode="git")
+            return _listed_candidates(root_path, tracked, stats)
+        metrics.registry.inc("discovery", mode="gitignore")
+        return _walk_candidates(root_path, use_gitignore=True, stats=stats)
+
+    metrics.registry.inc("discovery", mode="walk")
+    return _walk_candidates(root_path, stats=stats)
+
+def iter_project(
+    root_path: str,
+    changed_since: str | None = None,
+    stats: dict | None = None
+) -> Iterator[FileHandle]:
+    """
+    Versão "streaming" da varredura: gera FileHandles sem ler o conteúdo dos arquivos.
+
+    Args:
+        root_path (str): O caminho raiz do projeto a ser analisado.
+        changed_since (str | None): Se informado, só os arquivos criados ou alterados desde
+            esta referência do git (ex: "origin/main"), inclusive mudanças não commitadas.
+        stats (dict | None): Se informado, recebe ao final 'walked' (arquivos encontrados) e
+            'skipped' (ignorados por motivo: "extension", "too_large", "gitignore"...).
+
+    Yields:
+        FileHandle: Um handle por arquivo permitido, em ordem determinística.
+
+    Raises:
+        ValueError: Se o caminho não for um diretório, ou se changed_since for informado
+            e a pasta não estiver em um repositório git com essa referência.
+    """
+
+    # Verifica se o caminho raiz existe e é um diretório
+    if not os.path.isdir(root_path):
+        raise ValueError(f"O caminho fornecido não é um diretório válido: {root_path}")
+
+    for file_path, stat in _discover(root_path, changed_since, stats):
+        # Retorna o caminho relativo ao root_path para facilitar a visualização
+        relative_path = os.path.relpath(file_path, root_path)
+        yield FileHandle(relative_path, file_path, stat.st_size, stat.st_mtime_ns)
+
+def skipped_counts(walk_stats: dict, file_handles: Iterable) -> dict:
+    """
+    Arquivos ignorados por motivo: os descartados na listagem (stats de iter_project) somados
+    aos descartados na leitura ("binary", "not_utf8", "read_error").
+    """
+    counts = dict(walk_stats.get("skipped", {}))
+    for handle in file_handles:
+        reason = getattr(handle, "skip_reason", None)
+        if reason is not None:
+            counts[reason] = counts.get(reason, 0) + 1
+    return counts
+
+def prefetch(
+    file_handles: Iterable,
+    max_workers: int | None = None,
+    stats: dict | None = None
+) -> Iterator[FileHandle]:
+    """
+    Carrega o conteúdo dos handles em paralelo, mantendo a ordem original.
+
+    Apenas uma janela limitada de arquivos fica carregada ao mesmo tempo; o consumidor
+    deve chamar release() em cada handle depois de usá-lo. Registros em dicionário
+    (scan_project) já têm conteúdo e arquivos grandes (is_large, lidos em pedaços)
+    são repassados sem alteração.
+
+    Args:
+        file_handles (Iterable): Handles a carregar (ex: saída de iter_project).
+        max_workers (int | None): Número de threads de leitura. Padrão: config.SCAN_WORKERS.
+        stats (dict | None): Se informado, é preenchido com 'files', 'bytes', 'seconds',
+            'files_per_sec' e 'bytes_per_sec' ao final da iteração.
+
+    Yields:
+        FileHandle | dict: Os mesmos itens, já com o conteúdo carregado.
+    """
+    workers = max(1, max_workers or config.SCAN_WORKERS)
+    window = workers * 4
+    started = time.perf_counter()
+    total_files = 0
+    total_bytes = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        handles = iter(file_handles)
+
+        while True:
+            # Completa a janela de leituras pendentes
+            while len(in_flight) < window:
+                handle = next(handles, None)
+                if handle is None:
+                    break
+                if isinstance(handle, FileHandle) and not handle.is_large:
+                    in_flight.append((handle, executor.submit(handle.load)))
+                else:
+                    in_flight.append((handle, None))
+
+            if not in_flight:
+                break
+
+            handle, future = in_flight.popleft()
+            if future is not None and future.result() is not None:
+                total_files += 1
+                total_bytes += handle.size
+            yield handle
+
+    if stats is not None:
+        elapsed = time.perf_counter() - started
+        stats["files"] = total_files
+        stats["bytes"] = total_bytes
+        stats["seconds"] = elapsed
+        stats["files_per_sec"] = total_files / elapsed if elapsed > 0 else 0.0
+        stats["bytes_per_sec"] = total_bytes / elapsed if elapsed > 0 else 0.0
+
+def scan_project(root_path: str, max_workers: int | None = None, stats: dict | None = None) -> list[dict]:
+    """
+    Varre um diretório local recursivamente para encontrar arquivos de texto permitidos.
+
+    A listagem usa os.scandir e a leitura dos arquivos é feita em paralelo por um pool de threads.
+    O resultado mantém uma ordem determinística, independente da ordem de conclusão das leituras.
+    Para projetos grandes, prefira iter_project + prefetch, que não mantêm todo o conteúdo em memória.
+    Arquivos maiores que config.MAX_FILE_BYTES não entram na lista (só iter_project os processa, em pedaços).
+
+    Args:
+        root_path (str): O caminho raiz do projeto a ser analisado.
+        max_workers (int | None): Número de threads de leitura. Padrão: config.SCAN_WORKERS.
+        stats (dict | None): Se informado, é preenchido com 'files', 'bytes', 'seconds',
+            'files_per_sec' e 'bytes_per_sec' da varredura.
+
+    Returns:
+        list[dict]: Uma lista de dicionários contendo 'path' (caminho relativo) e 'content' (texto).
+    """
+    scanned_files = []
 
+    for handle in prefetch(iter_project(root_path), max_workers=max_workers, stats=stats):
+        content = handle.load()
+        if content is not None:
             scanned_files.append({
-                "path": relative_path,
+                "path": handle.path,
                 "content": content
             })
 
@@ -0,0 +1,270 @@
+import math
+import os
+import posixpath
+import re
+import time
+import config
+import scanner
+
+# Nomes (sem extensão) de arquivos que costumam ser pontos de entrada do programa
+ENTRY_POINT_NAMES = {"main", "__main__", "app", "cli", "server", "index", "manage", "run", "wsgi", "asgi"}
+
+# Pesos da pontuação de cada arquivo (sinais estáticos, calculados sem chamar a IA)
+ENTRY_POINT_WEIGHT = 50.0
+# Por arquivo do projeto que importa este (até IMPORTERS_CAP arquivos)
+IMPORTER_WEIGHT = 5.0
+IMPORTERS_CAP = 20
+# Por achado de segurança (até FINDINGS_CAP achados)
+FINDING_WEIGHT = 2.0
+FINDINGS_CAP = 10
+# Por KB (escala logarítmica): arquivos maiores tendem a concentrar a lógica
+SIZE_WEIGHT = 2.0
+# Por nível de pasta abaixo da raiz
+DEPTH_PENALTY = 3.0
+
+# Bytes do início de cada arquivo lidos para achar as importações (elas ficam no topo):
+# a ordenação não carrega o conteúdo completo dos arquivos
+IMPORT_SCAN_BYTES = 16 * 1024
+
+_PYTHON_IMPORT = re.compile(
+    r"^[ \t]*(?:from[ \t]+(\.*)([\w.]*)[ \t]+import[ \t]+\(?([\w., \t]+)|import[ \t]+([\w., \t]+))",
+    re.MULTILINE
+)
+_JS_IMPORT = re.compile(r"""(?:\bfrom|\bimport|\brequire[ \t]*\()[ \t]*\(?[ \t]*['"](\.{1,2}/[^'"\n]+)['"]""")
+_C_INCLUDE = re.compile(r'^[ \t]*#[ \t]*include[ \t]*"([^"\n]+)"', re.MULTILINE)
+_JAVA_IMPORT = re.compile(r"^[ \t]*import[ \t]+(?:static[ \t]+)?([\w.]+)[ \t]*;", re.MULTILINE)
+
+# Extensões tentadas ao resolver importações relativas de JS/TS sem extensão
+_JS_SUFFIXES = ("", ".js", ".ts", ".jsx", ".tsx", "/index.js", "/index.ts", "/index.jsx", "/index.tsx")
+
+class _ModuleMap:
+    """
+    Caminhos do projeto por nome de módulo, para resolver importações em arquivos.
+    """
+
+    def __init__(self, paths: list[str]):
+        self.paths = set(paths)
+        # "pacote.modulo" e seus sufixos ("modulo") -> caminhos .py; idem para classes Java
+        self.python = {}
+        self.java = {}
+        # Nome do arquivo -> caminhos (includes de C/C++ resolvidos pelo nome)
+        self.by_name = {}
+        for path in paths:
+            stem, extension = posixpath.splitext(path)
+            self.by_name.setdefault(posixpath.basename(path), []).append(path)
+            parts = stem.split("/")
+            if extension == ".py":
+                if parts[-1] == "__init__":
+                    parts = parts[:-1]
+                for i in range(len(parts)):
+                    self.python.setdefault(".".join(parts[i:]), []).append(path)
+            elif extension == ".java":
+                for i in range(len(parts)):
+                    self.java.setdefault(".".join(parts[i:]), []).append(path)
+
+    def _unique(self, candidates: list[str] | None) -> str | None:
+        # Nomes ambíguos (ex: vários "utils.py") não contam para nenhum arquivo
+        return candidates[0] if candidates and len(candidates) == 1 else None
+
+    def python_module(self, name: str) -> str | None:
+        # "a.b.c" pode ser o módulo a/b/c.py ou um atributo do módulo a/b.py
+        parts = name.split(".")
+        for end in range(len(parts), 0, -1):
+            found = self._unique(self.python.get(".".join(parts[:end])))
+            if found:
+                return found
+        return None
+
+    def python_relative(self, importer: str, dots: str, module: str, names: list[str]) -> list[str]:
+        base = posixpath.dirname(importer)
+        for _ in range(len(dots) - 1):
+            base = posixpath.dirname(base)
+        prefix = posixpath.join(base, *module.split(".")) if module else base
+        targets = [prefix + ".py", posixpath.join(prefix, "__init__.py")]
+        if not module:
+            # "from . import x": x é um módulo da pasta
+            targets = [posixpath.join(prefix, name + ".py") for name in names]
+        return [target.lstrip("/") for target in targets if target.lstrip("/") in self.paths]
+
+    def js_relative(self, importer: str, target: str) -> str | None:
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(importer), target))
+        for suffix in _JS_SUFFIXES:
+            if resolved + suffix in self.paths:
+                return resolved + suffix
+        return None
+
+    def c_include(self, importer: str, target: str) -> str | None:
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(importer), target))
+        if resolved in self.paths:
+            return resolved
+        return self._unique(self.by_name.get(posixpath.basename(target)))
+
+def _imported_paths(path: str, content: str, modules: _ModuleMap) -> set[str]:
+    """
+    Arquivos do projeto importados por um arquivo (Python, JS/TS, C/C++ e Java), por expressões
+    regulares simples: basta para contar quantos arquivos dependem de cada módulo.
+    """
+    extension = posixpath.splitext(path)[1]
+    found = set()
+    if extension == ".py":
+        for match in _PYTHON_IMPORT.finditer(content):
+            dots, module, names, plain = match.groups()
+            if plain is not None:
+                for name in plain.split(","):
+                    name = name.strip().split(" ")[0]
+                    if name:
+                        found.add(modules.python_module(name))
+            elif dots:
+                names = [n.strip().split(" ")[0] for n in names.split(",") if n.strip()]
+                found.update(modules.python_relative(path, dots, module, names))
+            elif module:
+                found.add(modules.python_module(module))
+    elif extension in (".js", ".jsx", ".ts", ".tsx"):
+        for match in _JS_IMPORT.finditer(content):
+            found.add(modules.js_relative(path, match.group(1)))
+    elif extension in (".c", ".cpp", ".h"):
+        for match in _C_INCLUDE.finditer(content):
+            found.add(modules.c_include(path, match.group(1)))
+    elif extension == ".java":
+        for match in _JAVA_IMPORT.finditer(content):
+            found.add(modules._unique(modules.java.get(match.group(1))))
+    found.discard(None)
+    found.discard(path)
+    return found
+
+def _import_head(file_info) -> str | None:
+    """
+    Início do arquivo (até IMPORT_SCAN_BYTES), para a contagem de importações.
+
+    FileHandles ainda não carregados são lidos só nesse trecho, sem guardar o conteúdo;
+    binários e ilegíveis ficam marcados em skip_reason, como na leitura completa.
+    """
+    if not isinstance(file_info, scanner.FileHandle) or file_info.is_loaded:
+        content = file_info["content"]
+        return content[:IMPORT_SCAN_BYTES] if content is not None else None
+
+    try:
+        with open(file_info.abs_path, "rb") as f:
+            head = f.read(max(IMPORT_SCAN_BYTES, config.SNIFF_BYTES))
+    except OSError:
+        file_info.skip_reason = "read_error"
+        return None
+    encoding = scanner._sniff_encoding(head[:config.SNIFF_BYTES])
+    if encoding is None:
+        file_info.skip_reason = "binary"
+        return None
+    # O corte pode cair no meio de um caractere: basta para as expressões das importações
+    return scanner._normalize_newlines(head[:IMPORT_SCAN_BYTES].decode(encoding, errors="ignore"))
+
+def _posix_path(path: str) -> str:
+    # O scanner gera caminhos com os.sep; a resolução de importações usa sempre "/"
+    return path.replace(os.sep, "/") if os.sep != "/" else path
+
+def _size_of(file_info) -> int:
+    if isinstance(file_info, scanner.FileHandle):
+        return file_info.size
+    return len(file_info["content"] or "")
+
+def rank_files(files: list, findings_lookup, scores: dict | None = None) -> list:
+    """
+    Ordena os arquivos do mais para o menos importante para o resumo do projeto, por sinais
+    estáticos baratos: nome de ponto de entrada, quantos arquivos do projeto o importam,
+    tamanho, quantidade de achados de segurança e profundidade da pasta.
+
+    Empates mantêm a ordem original (a ordem é a mesma entre execuções). Dos FileHandles,
+    usa o tamanho e só o início do arquivo (IMPORT_SCAN_BYTES): o conteúdo não é carregado.
+
+    Args:
+        files (list): Arquivos (dicts ou FileHandles).
+        findings_lookup: Achados de segurança com consulta por arquivo (FindingIndex ou FindingCollector).
+        scores (dict | None): Se informado, é preenchido com a pontuação de cada caminho.
+
+    Returns:
+        list: Os mesmos arquivos, em ordem de prioridade.
+    """
+    paths = [_posix_path(file_info["path"]) for file_info in files]
+    modules = _ModuleMap(paths)
+
+    # 1. Grau de entrada no grafo de importações (arquivos do projeto que importam cada um)
+    importers = dict.fromkeys(paths, 0)
+    for file_info in files:
+        head = _import_head(file_info)
+        if head is None:
+            continue
+        for imported in _imported_paths(_posix_path(file_info["path"]), head, modules):
+            importers[imported] += 1
+
+    # 2. Pontuação de cada arquivo
+    def score(file_info) -> float:
+        path = file_info["path"]
+        module_path = _posix_path(path)
+        stem = posixpath.splitext(posixpath.basename(module_path))[0].lower()
+        value = ENTRY_POINT_WEIGHT if stem in ENTRY_POINT_NAMES else 0.0
+        value += IMPORTER_WEIGHT * min(importers[module_path], IMPORTERS_CAP)
+        value += FINDING_WEIGHT * min(len(findings_lookup.for_file(path)), FINDINGS_CAP)
+        value += SIZE_WEIGHT * math.log2(1 + _size_of(file_info) / 1024)
+        value -= DEPTH_PENALTY * module_path.count("/")
+        if scores is not None:
+            scores[path] = value
+        return value
+
+    return sorted(files, key=score, reverse=True)
+
+class MapBudget:
+    """
+    Limites da fase Map: prazo (tempo desde o envio do primeiro lote) e tokens somados dos lotes enviados.
+
+    O prazo só começa a contar no primeiro admit(): no pipeline, a leitura e a análise que
+    antecedem o primeiro lote (e a ordenação dos arquivos) não consomem o prazo dos resumos.
+    """
+
+    def __init__(self, deadline_seconds: float | None = None, token_limit: int | None = None):
+        """
+        Args:
+            deadline_seconds (float | None): Prazo em segundos. Padrão: config.MAP_DEADLINE_SECONDS (0 = sem prazo).
+            token_limit (int | None): Tokens dos lotes. Padrão: config.MAP_TOKEN_LIMIT (0 = sem limite).
+        """
+        self.deadline_seconds = config.MAP_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+        self.token_limit = config.MAP_TOKEN_LIMIT if token_limit is None else token_limit
+        # Instante (time.monotonic) do primeiro lote aceito, ou None antes dele
+        self.started = None
+        self.batches = 0
+        self.tokens = 0
+        # Motivo da parada ("deadline" ou "tokens"), ou None enquanto houver orçamento
+        self.stop_reason = None
+
+    @property
+    def active(self) -> bool:
+        return self.deadline_seconds > 0 or self.token_limit > 0
+
+    @property
+    def deadline(self) -> float | None:
+        """Instante do prazo (time.monotonic), ou None se não houver prazo ou nenhum lote foi aceito."""
+        if self.deadline_seconds <= 0 or self.started is None:
+            return None
+        return self.started + self.deadline_seconds
+
+    def expire(self) -> None:
+        """Registra que o prazo acabou com lotes ainda em andamento (nenhum outro é enviado)."""
+        if self.stop_reason is None:
+            self.stop_reason = "deadline"
+
+    def admit(self, batch_tokens: int) -> bool:
+        """
+        Indica se um lote ainda pode ser enviado e, se puder, desconta os seus tokens.
+        O primeiro lote sempre é aceito (o relatório nunca fica sem nenhum resumo).
+        """
+        if self.stop_reason is not None:
+            return False
+        if self.batches > 0:
+            if self.deadline_seconds > 0 and time.monotonic() - self.started >= self.deadline_seconds:
+                self.stop_reason = "deadline"
+            elif self.token_limit > 0 and self.tokens + batch_tokens > self.token_limit:
+                self.stop_reason = "tokens"
+            if self.stop_reason is not None:
+                return False
+        if self.started is None:
+            self.started = time.monotonic()
+        self.batches += 1
+        self.tokens += batch_tokens
+        return True
@@ -1,109 +1,776 @@
 import ai_client
+import analyzer
+import config
+import dedup
+import llm_cache
+import metrics
+import multiprocessing
+import os
+import outline
 import re
+import scanner
+import scheduler
+import token_budget
+from collections import Counter, deque
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Iterable, Iterator
+from findings import SECRET_CATEGORY, FindingCollector, FindingIndex, as_index
 
-def _mask_secrets(content: str, findings: list[dict]) -> str:
+class AnalysisCancelled(Exception):
     """
-    Substitui linhas contendo segredos detectados por [REDACTED].
-    
-    Args:
-        content (str): Conteúdo original do arquivo.
-        findings (list[dict]): Lista de achados de segurança (filtrados para este arquivo).
-        
-    Returns:
-        str: Conteúdo com segredos mascarados.
+    A análise foi cancelada pelo usuário (ver o parâmetro cancel de build_report_messages).
     """
-    lines = content.splitlines()
-    # Conjunto de índices de linhas (0-based) que devem ser ocultados
-    lines_to_redact = set()
-    
-    for finding in findings:
-        # Focamos apenas na categoria de segredos
-        if finding.get("category") == "Possível Segredo Exposto":
-            line_num = finding.get("line")
-            if line_num:
-                lines_to_redact.add(line_num - 1) # Converter para 0-based index
-
-    new_lines = []
-    for i, line in enumerate(lines):
-        if i in lines_to_redact:
-            new_lines.append("[REDACTED - Segredo Detectado]")
-        else:
-            new_lines.append(line)
-            
-    return "\n".join(new_lines)
 
-def _summarize_batch(files_batch: list[dict], all_findings: list[dict]) -> str:
+def _check_cancel(cancel: threading.Event | None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise AnalysisCancelled("Análise cancelada pelo usuário.")
+
+def _wait(future: Future, cancel: threading.Event | None, deadline: float | None = None):
+    """
+    Aguarda o resultado de uma tarefa, verificando o cancelamento a intervalos curtos.
+
+    Raises:
+        concurrent.futures.TimeoutError: Se o prazo (time.monotonic) passar antes do resultado.
+    """
+    while True:
+        _check_cancel(cancel)
+        timeout = 0.2 if deadline is None else min(0.2, max(0.0, deadline - time.monotonic()))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise
+
+# Relatório devolvido quando nenhum arquivo pôde ser resumido
+EMPTY_REPORT = "# Relatório de Análise\n\nNenhum arquivo encontrado para análise."
+
+def _phase_model(phase: str) -> str:
+    # Resumos e consolidações usam o modelo do Map; o relatório final, o do Reduce
+    return config.REDUCE_MODEL if phase == "reduce" else config.MAP_MODEL
+
+def _chat(
+    messages: list[dict],
+    phase: str,
+    call_info: dict | None = None,
+    request_counter: ai_client.RequestCounter | None = None
+) -> str:
+    """
+    ai_client.chat com o modelo da fase e a latência registrada em metrics ("llm_call_seconds" da fase).
+    Com config.HEDGE_REQUESTS, as chamadas curtas (resumos e consolidações) são "hedged";
+    o relatório final não, porque duplicá-lo custa um prompt inteiro do Reduce.
+    call_info, se informado, recebe os dados da chamada (ver ai_client.chat), inclusive o modelo que respondeu;
+    request_counter, se informado, soma as requisições enviadas (também em caso de erro).
+    """
+    call_info = {} if call_info is None else call_info
+    hedge = config.HEDGE_REQUESTS and phase != "reduce"
+    try:
+        return ai_client.chat(messages, call_info=call_info, model=_phase_model(phase), hedge=hedge)
+    finally:
+        if "latency" in call_info:
+            metrics.registry.observe("llm_call_seconds", call_info["latency"], phase=phase)
+        if request_counter is not None:
+            request_counter.add(call_info)
+
+def _cacheable(call_info: dict, phase: str) -> bool:
+    # A chave do cache é a do modelo da fase: respostas de um modelo reserva não são guardadas
+    return call_info.get("model") == _phase_model(phase)
+
+# Instruções fixas do prompt do Map (também fazem parte da chave do cache de resumos)
+MAP_PROMPT_INSTRUCTIONS = (
+    "Abaixo está o conteúdo de um ou mais arquivos de código. "
+    "Resuma a função de cada arquivo em 1-2 frases técnicas. "
+    "Ignore erros de sintaxe menores, foque na lógica de negócio.\n\n"
+)
+
+def _summarize_batch(
+    files_batch: list,
+    all_findings: FindingIndex | FindingCollector,
+    cache_stats: llm_cache.CacheStats | None = None,
+    abandoned: threading.Event | None = None,
+    request_counter: ai_client.RequestCounter | None = None
+) -> tuple[str | None, bool]:
     """
     Envia um lote de arquivos para a IA e pede um resumo técnico conciso.
     (Fase do Map)
+
+    O resumo é guardado no cache persistente (llm_cache), com chave derivada do modelo,
+    das instruções e do conteúdo já mascarado do lote; lotes inalterados não vão à rede.
+    Resumos de um modelo reserva (config.FALLBACK_MODELS) não são guardados.
+
+    Se abandoned for acionado (prazo do Map esgotado ou execução interrompida), o lote não é
+    enviado e uma resposta que chegue depois disso é descartada, sem entrar no cache.
+
+    Returns:
+        tuple[str | None, bool]: O resumo (ou a mensagem de erro, se a IA falhar) e se ele foi gerado;
+        (None, False) se o lote foi abandonado.
     """
     batch_content = []
     
     for file_info in files_batch:
         path = file_info["path"]
         content = file_info["content"]
+        if content is None:
+            # Arquivo binário ou ilegível (detectado apenas na leitura sob demanda)
+            continue
         
-        # Filtra achados pertinentes a este arquivo
-        file_findings = [f for f in all_findings if f.get("file") == path]
+        # Segmentos de arquivos grandes trazem a posição da primeira linha e um rótulo próprio
+        line_offset = file_info.get("line_offset", 0)
+        label = file_info.get("label", path)
+
+        # Segredos deste arquivo a partir do início do segmento (consulta no índice, sem varrer todos os achados)
+        file_findings = all_findings.for_file(path, start_line=line_offset + 1, category=SECRET_CATEGORY)
         
-        # Mascarar segredos antes de enviar
-        safe_content = _mask_secrets(content, file_findings)
+        # Mascarar segredos antes de enviar (sem cópia quando o arquivo não tem nenhum).
+        # Esboços (_compressed_files) já chegam mascarados.
+        if file_info.get("redacted"):
+            safe_content = content
+        else:
+            safe_content = analyzer.redact_secrets(content, file_findings, line_offset)
         
-        batch_content.append(f"Arquivo: {path}\n```\n{safe_content}\n```")
+        batch_content.append(f"Arquivo: {label}\n```\n{safe_content}\n```")
 
-    prompt_text = (
-        "Abaixo está o conteúdo de um ou mais arquivos de código. "
-        "Resuma a função de cada arquivo em 1-2 frases técnicas. "
-        "Ignore erros de sintaxe menores, foque na lógica de negócio.\n\n"
-        + "\n".join(batch_content)
-    )
+        # O texto já foi copiado para o prompt; libera o conteúdo original
+        scanner.release(file_info)
+
+    if not batch_content:
+        return "", True
+
+    files_text = "\n".join(batch_content)
+    cache_key = llm_cache.make_key(_phase_model("map"), MAP_PROMPT_INSTRUCTIONS, files_text)
+    cached = llm_cache.get(cache_key, cache_stats)
+    if cached is not None:
+        return cached, True
+
+    prompt_text = MAP_PROMPT_INSTRUCTIONS + files_text
     
     messages = [{"role": "user", "content": prompt_text}]
     
+    if abandoned is not None and abandoned.is_set():
+        return None, False
+
+    call_info = {}
     try:
-        return ai_client.chat(messages)
+        summary = _chat(messages, "map", call_info, request_counter)
     except Exception as e:
-        return f"Erro ao resumir lote: {str(e)}"
+        # Erros não vão para o cache: o lote será tentado de novo na próxima execução
+        return f"Erro ao resumir lote: {str(e)}", False
+
+    if abandoned is not None and abandoned.is_set():
+        # Ninguém espera mais por este lote: a resposta tardia não vai para o cache
+        return None, False
 
-def generate_report(scanned_files: list[dict], security_findings: list[dict]) -> str:
+    if _cacheable(call_info, "map"):
+        llm_cache.put(cache_key, summary)
+    return summary, True
+
+def _map_batches(
+    batches: Iterable[list],
+    all_findings: FindingIndex | FindingCollector,
+    concurrency: int | None = None,
+    cache_stats: llm_cache.CacheStats | None = None,
+    cancel: threading.Event | None = None,
+    budget: scheduler.MapBudget | None = None,
+    request_counter: ai_client.RequestCounter | None = None
+) -> Iterator[tuple[str | None, bool]]:
     """
-    Gera o relatório executivo completo usando IA.
-    Implementa chunking (map-reduce) para processar os arquivos.
-    
+    Resume os lotes em paralelo, devolvendo os resultados de _summarize_batch na ordem original dos lotes.
+
+    No máximo 2 × concurrency lotes ficam pendentes ao mesmo tempo, para que a leitura
+    dos arquivos não avance muito à frente das respostas da IA. Se cancel for acionado,
+    os lotes ainda não enviados são descartados e AnalysisCancelled é lançada.
+
+    Com prazo no budget, os lotes sem resposta quando ele acaba são abandonados: saem como
+    (None, False) e o budget fica com stop_reason "deadline". O primeiro lote é sempre
+    aguardado, para o relatório não ficar sem nenhum resumo. Abandonar não interrompe as
+    requisições já em andamento: elas terminam em segundo plano (até config.TIMEOUT_SECONDS
+    por tentativa) e as respostas são descartadas, sem entrar no cache.
+    """
+    workers = max(1, concurrency or config.LLM_CONCURRENCY)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    delivered = 0
+    completed = False
+    expired = False
+    # Acionado quando os lotes pendentes deixam de ser aguardados (prazo, cancelamento ou erro)
+    abandoned = threading.Event()
+
+    def collect(future: Future) -> tuple[str | None, bool]:
+        nonlocal delivered, expired
+        # O prazo começa no primeiro lote aceito pelo budget (ver MapBudget)
+        deadline = budget.deadline if budget is not None and delivered > 0 else None
+        try:
+            result = _wait(future, cancel, deadline)
+        except FutureTimeout:
+            future.cancel()
+            budget.expire()
+            abandoned.set()
+            expired = True
+            result = (None, False)
+        delivered += 1
+        return result
+
+    try:
+        for batch in batches:
+            _check_cancel(cancel)
+            pending.append(executor.submit(
+                _summarize_batch, batch, all_findings, cache_stats, abandoned, request_counter
+            ))
+            if len(pending) >= workers * 2:
+                yield collect(pending.popleft())
+
+        while pending:
+            yield collect(pending.popleft())
+        completed = True
+    finally:
+        # Em caso de cancelamento, erro ou prazo esgotado, não espera pelas requisições em andamento
+        if not completed:
+            abandoned.set()
+        executor.shutdown(wait=completed and not expired, cancel_futures=True)
+
+# Instruções fixas do prompt de consolidação (Reduce intermediário)
+MERGE_PROMPT_INSTRUCTIONS = (
+    "Abaixo estão resumos técnicos de partes de um mesmo módulo de um projeto de software. "
+    "Consolide-os em um único resumo conciso do módulo: propósito, principais componentes, "
+    "integrações externas (APIs, bancos de dados) e pontos de atenção. "
+    "Não invente nada que não esteja nos resumos.\n\n"
+)
+
+# Tokens aproximados do texto fixo do prompt final (sistema + instruções)
+REDUCE_PROMPT_OVERHEAD_TOKENS = 600
+
+# Limites da listagem agregada de achados no prompt final
+FINDINGS_MAX_FILES_PER_CATEGORY = 15
+# Arquivos não resumidos listados no prompt final (os mais importantes primeiro)
+COVERAGE_MAX_FILES = 30
+FINDINGS_MAX_LINES_PER_FILE = 5
+
+def _batch_directory(batch: list) -> str:
+    """
+    Diretório comum aos arquivos de um lote ("" = raiz do projeto).
+    """
+    common = None
+    for file_info in batch:
+        parts = os.path.dirname(file_info["path"]).split(os.sep)
+        if common is None:
+            common = parts
+        else:
+            size = 0
+            while size < min(len(common), len(parts)) and common[size] == parts[size]:
+                size += 1
+            common = common[:size]
+    return os.sep.join(part for part in common or [] if part)
+
+def _merge_summaries(
+    directory: str,
+    summaries: list[str],
+    cache_stats: llm_cache.CacheStats | None = None,
+    request_counter: ai_client.RequestCounter | None = None
+) -> str:
+    """
+    Consolida vários resumos de um mesmo diretório em um só (Reduce intermediário).
+    Em caso de erro, devolve os resumos originais concatenados.
+    """
+    module = directory or "(raiz do projeto)"
+    summaries_text = f"Módulo: {module}\n\n" + "\n\n".join(summaries)
+    cache_key = llm_cache.make_key(_phase_model("merge"), MERGE_PROMPT_INSTRUCTIONS, summaries_text)
+    merged = llm_cache.get(cache_key, cache_stats)
+
+    if merged is None:
+        messages = [{"role": "user", "content": MERGE_PROMPT_INSTRUCTIONS + summaries_text}]
+        call_info = {}
+        try:
+            merged = _chat(messages, "merge", call_info, request_counter)
+        except Exception:
+            return "\n\n".join(summaries)
+        if _cacheable(call_info, "merge"):
+            llm_cache.put(cache_key, merged)
+
+    return f"Módulo {module}:\n{merged}"
+
+def _reduce_level(
+    items: list[tuple[str, str]],
+    budget: int,
+    cache_stats: llm_cache.CacheStats | None,
+    stats: dict,
+    request_counter: ai_client.RequestCounter | None = None
+) -> list[tuple[str, str]]:
+    """
+    Um nível da redução em árvore: agrupa os resumos por diretório, consolida em paralelo
+    os grupos que cabem no orçamento e sobe cada resultado para o diretório pai.
+
     Args:
-        scanned_files (list[dict]): Lista de arquivos escaneados.
-        security_findings (list[dict]): Lista de achados de segurança.
-        
+        items (list[tuple[str, str]]): Pares (diretório, resumo), na ordem do projeto.
+        budget (int): Tokens de entrada de cada consolidação (orçamento do modelo do Map).
+
     Returns:
-        str: Relatório completo em Markdown.
+        list[tuple[str, str]]: Pares (diretório pai, resumo) do próximo nível.
     """
-    
-    if not scanned_files:
-        return "# Relatório de Análise\n\nNenhum arquivo encontrado para análise."
+    capacity = max(1, budget - token_budget.count_tokens(MERGE_PROMPT_INSTRUCTIONS))
+
+    # 1. Agrupa por diretório, mantendo a ordem de aparição
+    groups = {}
+    for directory, summary in items:
+        groups.setdefault(directory, []).append(summary)
+
+    # 2. Divide cada grupo em partes que cabem em uma requisição
+    chunks = []
+    for directory, summaries in groups.items():
+        current = []
+        current_tokens = 0
+        for summary in summaries:
+            summary_tokens = token_budget.count_tokens(summary)
+            if current and current_tokens + summary_tokens > capacity:
+                chunks.append((directory, current))
+                current = []
+                current_tokens = 0
+            current.append(summary)
+            current_tokens += summary_tokens
+        chunks.append((directory, current))
+
+    # 3. Consolida em paralelo as partes com mais de um resumo; as demais apenas sobem de nível
+    merges = [(directory, summaries) for directory, summaries in chunks if len(summaries) > 1]
+    stats["reduce_merges"] += len(merges)
+    stats["estimated_tokens"] += sum(
+        token_budget.count_tokens(MERGE_PROMPT_INSTRUCTIONS + "\n\n".join(summaries))
+        for _, summaries in merges
+    )
+
+    workers = max(1, config.LLM_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        merged = iter(list(executor.map(
+            lambda job: _merge_summaries(job[0], job[1], cache_stats, request_counter), merges
+        )))
+
+    return [
+        (os.path.dirname(directory), next(merged) if len(summaries) > 1 else summaries[0])
+        for directory, summaries in chunks
+    ]
+
+def _tree_reduce(
+    items: list[tuple[str, str]],
+    budget: int,
+    cache_stats: llm_cache.CacheStats | None,
+    stats: dict,
+    cancel: threading.Event | None = None,
+    request_counter: ai_client.RequestCounter | None = None
+) -> list[str]:
+    """
+    Consolida os resumos por diretório, nível a nível (das pastas mais profundas para a raiz),
+    até que o total caiba no orçamento do Reduce final (budget). Cada consolidação é uma
+    requisição ao modelo do Map, então o tamanho das partes segue o orçamento desse modelo.
+
+    Returns:
+        list[str]: Resumos (originais ou consolidados) para o prompt final.
+    """
+    total = sum(token_budget.count_tokens(summary) for _, summary in items)
+    merge_budget = token_budget.map_token_budget(_phase_model("merge"))
+
+    while total > budget and len(items) > 1:
+        _check_cancel(cancel)
+        at_root = all(directory == "" for directory, _ in items)
+        items = _reduce_level(items, merge_budget, cache_stats, stats, request_counter)
+        stats["reduce_levels"] += 1
+
+        new_total = sum(token_budget.count_tokens(summary) for _, summary in items)
+        if at_root and new_total >= total:
+            # Nenhuma consolidação possível (ex: falhas da API); segue com o que há
+            break
+        total = new_total
+
+    return [summary for _, summary in items]
+
+# Grupos de duplicatas listados no prompt final (os com mais cópias primeiro) e membros por grupo
+DUPLICATES_MAX_GROUPS = 20
+DUPLICATES_MAX_MEMBERS = 10
+
+def _unique_files(files: Iterable, deduplicator: dedup.Deduplicator, dedup_stats: dict) -> Iterator:
+    """
+    Repassa só o primeiro arquivo de cada grupo de duplicatas; as cópias não vão para a IA
+    (o resumo do representante vale para todas, ver _format_duplicates).
+    """
+    for file_info in files:
+        content = None if isinstance(file_info, scanner.FileHandle) and file_info.is_large else file_info["content"]
+        if content is None:
+            # Binários, ilegíveis e arquivos grandes (lidos em pedaços) seguem sem comparação
+            yield file_info
+            continue
+
+        match = deduplicator.check(file_info["path"], content)
+        if match is None:
+            yield file_info
+            continue
+
+        saved = token_budget.count_tokens(content) + token_budget.count_tokens(token_budget._file_header(file_info["path"]))
+        dedup_stats["files"] += 1
+        dedup_stats["tokens_saved"] += saved
+        metrics.registry.inc("dedup_files", kind=match[1])
+        metrics.registry.inc("dedup_tokens_saved", saved)
+        scanner.release(file_info)
+
+def _compressed_files(
+    files: Iterable,
+    all_findings: FindingIndex | FindingCollector,
+    compression_stats: dict
+) -> Iterator:
+    """
+    Troca o conteúdo de cada arquivo pelo seu esboço (outline.compress) antes da montagem dos lotes.
+
+    Os segredos são mascarados antes, pois o esboço não mantém a numeração das linhas dos achados.
+    Os esboços são gerados em um pool de processos (config.PROMPT_COMPRESSION_WORKERS), mas os
+    arquivos saem na ordem de chegada: os lotes e as chaves do cache não mudam entre execuções.
+    """
+    workers = config.PROMPT_COMPRESSION_WORKERS
+    executor = None
+    if workers > 1:
+        # "spawn" em vez de fork: o app e os jobs em segundo plano têm várias threads, e um processo
+        # criado por fork herdaria travas em uso por elas (risco de travar o processo auxiliar)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    # (arquivo, conteúdo mascarado, esboço ou Future do esboço); conteúdo None = repassado sem esboço
+    pending = deque()
+
+    def finish(file_info, safe_content, result):
+        if safe_content is None:
+            return file_info
+        if isinstance(result, Future):
+            try:
+                result = result.result()
+            except Exception:
+                # Falha no processo auxiliar: o arquivo segue completo
+                result = None
+
+        path = file_info["path"]
+        tokens_before = token_budget.count_tokens(safe_content)
+        tokens_after = tokens_before if result is None else token_budget.count_tokens(result)
+        compression_stats["files"].append({"path": path, "tokens_before": tokens_before, "tokens_after": tokens_after})
+        if result is None:
+            return file_info
+
+        metrics.registry.inc("compressed_files")
+        metrics.registry.inc("compression_tokens_saved", tokens_before - tokens_after)
+        scanner.release(file_info)
+        return {"path": path, "content": result, "label": f"{path} (esboço)", "redacted": True}
+
+    try:
+        for file_info in files:
+            content = None if isinstance(file_info, scanner.FileHandle) and file_info.is_large else file_info["content"]
+            if content is None:
+                # Binários, ilegíveis e arquivos grandes (lidos em pedaços) seguem sem esboço
+                pending.append((file_info, None, None))
+            else:
+                path = file_info["path"]
+                safe_content = analyzer.redact_secrets(
+                    content, all_findings.for_file(path, category=SECRET_CATEGORY)
+                )
+                if executor is not None:
+                    result = executor.submit(outline.compress, path, safe_content)
+                else:
+                    result = outline.compress(path, safe_content)
+                pending.append((file_info, safe_content, result))
+
+            # Poucos arquivos adiantados, para a memória não crescer com o pool
+            while pending:
+                head = pending[0][2]
+                if len(pending) <= max(1, workers) * 2 and isinstance(head, Future) and not head.done():
+                    break
+                yield finish(*pending.popleft())
+
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def _format_duplicates(groups: dict) -> str:
+    """
+    Lista os grupos de arquivos duplicados para o prompt final: o resumo de cada representante
+    também descreve as suas cópias.
+    """
+    lines = []
+    ranked = sorted(groups.items(), key=lambda item: (-len(item[1]), item[0]))
+    for representative, members in ranked[:DUPLICATES_MAX_GROUPS]:
+        exact = [path for path, kind in members if kind == "exact"]
+        near = [path for path, kind in members if kind == "near"]
+        parts = []
+        for label, paths in (("idêntico", exact), ("quase idêntico", near)):
+            if paths:
+                shown = ", ".join(f"`{path}`" for path in paths[:DUPLICATES_MAX_MEMBERS])
+                extra = len(paths) - DUPLICATES_MAX_MEMBERS
+                parts.append(f"{label} em {shown}" + (f" e mais {extra}" if extra > 0 else ""))
+        lines.append(f"- `{representative}` (resumido): conteúdo {'; '.join(parts)}")
+    if len(ranked) > DUPLICATES_MAX_GROUPS:
+        lines.append(f"- ... e mais {len(ranked) - DUPLICATES_MAX_GROUPS} grupo(s) de duplicatas")
+    return "\n".join(lines)
+
+def coverage_detail(stop_reason: str | None) -> str:
+    """
+    Motivo de haver arquivos sem resumo, para o relatório e para a interface.
+
+    Args:
+        stop_reason (str | None): map_stop_reason das estatísticas ("deadline", "tokens" ou None,
+            quando os arquivos ficaram de fora só por falhas da IA).
+    """
+    if stop_reason == "deadline":
+        return "a análise parou no limite de prazo da fase de resumos."
+    if stop_reason == "tokens":
+        return "a análise parou no limite de orçamento de tokens da fase de resumos."
+    return "a IA falhou nos lotes dos demais."
+
+def _format_coverage(covered: int, uncovered: list[str], stop_reason: str | None, prioritized: bool = True) -> str:
+    """
+    Descreve para o prompt final quais arquivos ficaram sem resumo (limite de tempo ou de tokens do Map,
+    ou falha da IA nos seus lotes).
+    """
+    if not uncovered:
+        return ""
+    detail = coverage_detail(stop_reason)
+    lines = [
+        f"- Arquivos resumidos: {covered} de {covered + len(uncovered)}"
+        + (" (os mais importantes primeiro)" if prioritized else "") + f"; {detail}",
+        "- Arquivos não resumidos: " + ", ".join(f"`{path}`" for path in uncovered[:COVERAGE_MAX_FILES])
+        + (f" e mais {len(uncovered) - COVERAGE_MAX_FILES}" if len(uncovered) > COVERAGE_MAX_FILES else "")
+    ]
+    return "\n".join(lines)
+
+def _format_findings(findings: FindingIndex) -> str:
+    """
+    Agrega os achados de segurança por categoria e arquivo para o prompt final
+    (em vez de uma linha por achado).
+    """
+    if not findings:
+        return "Nenhum risco crítico encontrado."
+
+    lines = []
+    for category_name, occurrences in sorted(findings.categories().items()):
+        category_findings = findings.by_category(category_name)
+
+        # Os achados vêm ordenados por arquivo e linha
+        files = {}
+        for finding in category_findings:
+            files.setdefault(finding.file, []).append(finding.line)
+        lines.append(f"- **{category_name}**: {occurrences} ocorrência(s) em {len(files)} arquivo(s)")
+
+        descriptions = Counter(finding.description for finding in category_findings)
+        patterns = ", ".join(f"{description} ({count})" for description, count in descriptions.most_common())
+        lines.append(f"  - Tipos: {patterns}")
+
+        # Arquivos com mais ocorrências primeiro
+        ranked = sorted(files.items(), key=lambda item: (-len(item[1]), item[0]))
+        for path, file_lines in ranked[:FINDINGS_MAX_FILES_PER_CATEGORY]:
+            distinct_lines = sorted(set(file_lines))
+            shown = ", ".join(str(line) for line in distinct_lines[:FINDINGS_MAX_LINES_PER_FILE])
+            extra = len(distinct_lines) - FINDINGS_MAX_LINES_PER_FILE
+            suffix = f" e mais {extra}" if extra > 0 else ""
+            lines.append(f"  - `{path}` ({len(file_lines)}): linhas {shown}{suffix}")
+        if len(ranked) > FINDINGS_MAX_FILES_PER_CATEGORY:
+            lines.append(f"  - ... e mais {len(ranked) - FINDINGS_MAX_FILES_PER_CATEGORY} arquivo(s)")
+
+    return "\n".join(lines)
+
+def build_report_messages(
+    scanned_files: Iterable,
+    security_findings: Iterable,
+    stats: dict | None = None,
+    progress: dict | None = None,
+    cancel: threading.Event | None = None
+) -> list[dict] | None:
+    """
+    Executa a fase Map (resumo dos arquivos) e monta as mensagens da fase Reduce.
+
+    Os arquivos são consumidos como fluxo: apenas os lotes em andamento ficam carregados em memória.
+    Os lotes são montados pelo orçamento de tokens do modelo (token_budget.pack_batches)
+    e enviados à IA em paralelo (até config.LLM_CONCURRENCY por vez). Se os resumos não
+    couberem no orçamento do Reduce, são consolidados por diretório em vários níveis.
+
+    Args:
+        scanned_files (Iterable): Arquivos escaneados (lista de dicts ou FileHandles).
+        security_findings (Iterable): Achados de segurança (FindingIndex, FindingCollector ou lista de dicts).
+        stats (dict | None): Se informado, é preenchido com 'requests' (requisições HTTP enviadas à IA,
+            com novas tentativas, cópias "hedged" e trocas de modelo), 'hedges', 'fallbacks', 'estimated_tokens',
+            'map_batches', 'failed_batches' (lotes sem resumo por falha da IA), 'chunked_files', 'reduce_levels', 'reduce_merges', 'cache_hits',
+            'cache_misses', 'dedup_files' (cópias não enviadas à IA), 'dedup_tokens_saved',
+            'compressed_files', 'compression_tokens_before', 'compression_tokens_after' e
+            'compression' (tokens antes e depois do esboço, por arquivo; com config.PROMPT_COMPRESSION),
+            'prioritized', 'map_stop_reason' ("deadline", "tokens" ou None), 'covered_files' e
+            'uncovered_files' (caminhos resumidos e não resumidos por causa dos limites do Map ou de falhas da IA)
+            da execução. A estimativa de tokens já conta o prompt do Reduce; as requisições do Reduce
+            são somadas por generate_report / stream_report.
+        progress (dict | None): Se informado, é atualizado durante a execução com 'batches_total'
+            (lotes montados até o momento), 'batches_done' e 'phase'.
+        cancel (threading.Event | None): Se acionado, interrompe a execução com AnalysisCancelled.
+
+    Returns:
+        list[dict] | None: Mensagens para ai_client.chat / chat_stream, ou None se não houver
+        nenhum arquivo para analisar.
+    """
+
+    # Índice dos achados (consultas por arquivo e linha em vez de varrer a lista a cada arquivo).
+    # No pipeline, os achados chegam junto com os arquivos (FindingCollector) e o índice completo
+    # só é montado depois do Map.
+    findings_lookup = security_findings if hasattr(security_findings, "for_file") else as_index(security_findings)
+
+    # Prazo e orçamento de tokens do Map. Com limites (ou config.PRIORITIZE_FILES), os arquivos são
+    # ordenados por importância antes dos resumos; para isso, o fluxo de arquivos é lido por inteiro,
+    # mas só os metadados ficam na lista: o conteúdo é relido sob demanda na montagem dos lotes.
+    map_budget = scheduler.MapBudget()
+    prioritized = config.PRIORITIZE_FILES or map_budget.active
+    ranked_paths = []
+    if prioritized:
+        files = []
+        for file_info in scanned_files:
+            scanner.release(file_info)
+            files.append(file_info)
+        scanned_files = scheduler.rank_files(files, findings_lookup)
+        ranked_paths = [
+            f["path"] for f in scanned_files
+            if (f.skip_reason is None if isinstance(f, scanner.FileHandle) else f["content"] is not None)
+        ]
 
     # --- FASE 1: MAP (Resumo de Arquivos) ---
-    # Dividimos os arquivos em lotes para não exceder o limite de contexto da IA
-    batch_size = 5
-    file_summaries = []
-    
-    print(f"Processando {len(scanned_files)} arquivos...")
-    
-    for i in range(0, len(scanned_files), batch_size):
-        batch = scanned_files[i:i + batch_size]
-        summary = _summarize_batch(batch, security_findings)
-        file_summaries.append(summary)
+    # Agrupamos os arquivos em lotes que cabem no contexto da IA
+    # Cópias idênticas (ou quase) de arquivos já vistos não geram resumo próprio
+    dedup_stats = {"files": 0, "tokens_saved": 0}
+    deduplicator = dedup.Deduplicator() if config.DEDUP_ENABLED else None
+    if deduplicator is not None:
+        scanned_files = _unique_files(scanned_files, deduplicator, dedup_stats)
 
-    combined_summaries = "\n\n".join(file_summaries)
+    # Esboços no lugar do conteúdo completo (opcional)
+    compression_stats = {"files": []}
+    if config.PROMPT_COMPRESSION:
+        scanned_files = _compressed_files(scanned_files, findings_lookup, compression_stats)
+
+    pack_stats = {}
+    batches = token_budget.pack_batches(scanned_files, stats=pack_stats)
+    # Diretório e caminhos de cada lote, na ordem de envio (os diretórios agrupam os resumos no Reduce)
+    batch_directories = []
+    batch_paths = []
+    # Arquivos de todos os lotes montados (enviados ou não), na ordem de montagem
+    packed_paths = {}
+    # Arquivos com ao menos um lote resumido, na ordem de envio
+    covered = {}
 
-    # Formatar achados de segurança para o contexto
-    security_context = "Nenhum risco crítico encontrado."
-    if security_findings:
-        security_items = []
-        for f in security_findings:
-            security_items.append(
-                f"- **{f['file']}** (Linha {f['line']}): {f['category']} - {f['description']}"
+    def tagged_batches():
+        emitted_tokens = 0
+        for batch in batches:
+            batch_tokens = pack_stats["estimated_tokens"] - emitted_tokens
+            emitted_tokens = pack_stats["estimated_tokens"]
+            for item in batch:
+                packed_paths.setdefault(item["path"])
+            if not map_budget.admit(batch_tokens):
+                # Lote montado mas não enviado: sai das estatísticas, e nenhum outro é montado
+                pack_stats["batches"] -= 1
+                pack_stats["estimated_tokens"] -= batch_tokens
+                break
+            batch_paths.append([item["path"] for item in batch])
+            batch_directories.append(_batch_directory(batch))
+            if progress is not None:
+                progress["batches_total"] += 1
+            yield batch
+
+    if progress is not None:
+        progress.update(phase="map", batches_total=0, batches_done=0)
+
+    cache_stats = llm_cache.CacheStats()
+    request_counter = ai_client.RequestCounter()
+    summaries = []
+    # Lotes em que a IA falhou (a mensagem de erro segue no lugar do resumo); lotes sem resposta
+    # no prazo (resumo None) não contam como falha
+    failed_batches = 0
+    with metrics.registry.timer("map"):
+        results = _map_batches(
+            tagged_batches(), findings_lookup, cache_stats=cache_stats, cancel=cancel, budget=map_budget,
+            request_counter=request_counter
+        )
+        for index, (summary, ok) in enumerate(results):
+            summaries.append(summary)
+            if ok:
+                for path in batch_paths[index]:
+                    covered.setdefault(path)
+            elif summary is not None:
+                failed_batches += 1
+            if progress is not None:
+                progress["batches_done"] += 1
+    file_summaries = [
+        (directory, summary)
+        for directory, summary in zip(batch_directories, summaries)
+        if summary
+    ]
+
+    # Formatar achados de segurança para o contexto (agregados por categoria e arquivo)
+    security_findings = as_index(findings_lookup)
+    security_context = _format_findings(security_findings)
+    duplicate_groups = deduplicator.duplicate_groups() if deduplicator is not None else {}
+    duplicates_context = _format_duplicates(duplicate_groups)
+
+    # Arquivos sem resumo por causa dos limites do Map ou de falhas da IA (cópias de duplicatas
+    # contam como resumidas). Sem a ordenação, todos os arquivos de texto passam pelos lotes.
+    duplicate_members = {member for members in duplicate_groups.values() for member, _ in members}
+    candidates = ranked_paths if prioritized else packed_paths
+    uncovered = [path for path in candidates if path not in covered and path not in duplicate_members]
+    coverage_context = _format_coverage(len(covered), uncovered, map_budget.stop_reason, prioritized)
+    if map_budget.stop_reason is not None:
+        metrics.registry.inc("map_stopped", reason=map_budget.stop_reason)
+        metrics.registry.inc("map_files_uncovered", len(uncovered))
+
+    # --- FASE 1.5: REDUCE EM ÁRVORE (projetos cujos resumos não cabem em uma requisição) ---
+    reduce_stats = {"reduce_levels": 0, "reduce_merges": 0, "estimated_tokens": 0}
+    budget = token_budget.reduce_token_budget()
+    summaries_budget = max(
+        budget // 4,
+        budget - REDUCE_PROMPT_OVERHEAD_TOKENS
+        - token_budget.count_tokens(security_context) - token_budget.count_tokens(duplicates_context)
+        - token_budget.count_tokens(coverage_context)
+    )
+    if file_summaries:
+        if progress is not None:
+            progress["phase"] = "tree_reduce"
+        with metrics.registry.timer("tree_reduce"):
+            file_summaries = _tree_reduce(
+                file_summaries, summaries_budget, cache_stats, reduce_stats, cancel, request_counter
             )
-        security_context = "\n".join(security_items)
+
+    # Mantém o cache de resumos dentro dos limites de tamanho e idade
+    llm_cache.evict()
+
+    metrics.registry.inc("map_batches", pack_stats["batches"])
+    metrics.registry.inc("map_batches_failed", failed_batches)
+    metrics.registry.inc("llm_cache_hits", cache_stats.hits)
+    metrics.registry.inc("llm_cache_misses", cache_stats.misses)
+
+    if stats is not None:
+        stats["map_batches"] = pack_stats["batches"]
+        stats["failed_batches"] = failed_batches
+        stats["chunked_files"] = pack_stats["chunked_files"]
+        stats["reduce_levels"] = reduce_stats["reduce_levels"]
+        stats["reduce_merges"] = reduce_stats["reduce_merges"]
+        # Requisições efetivamente enviadas (lotes do cache não contam; tentativas, cópias e trocas sim).
+        # Lotes abandonados no prazo contam só até aqui: as respostas tardias não são esperadas.
+        stats["requests"] = request_counter.requests
+        stats["hedges"] = request_counter.hedges
+        stats["fallbacks"] = request_counter.fallbacks
+        stats["estimated_tokens"] = pack_stats["estimated_tokens"] + reduce_stats["estimated_tokens"]
+        stats["cache_hits"] = cache_stats.hits
+        stats["cache_misses"] = cache_stats.misses
+        stats["dedup_files"] = dedup_stats["files"]
+        stats["dedup_groups"] = len(duplicate_groups)
+        stats["dedup_tokens_saved"] = dedup_stats["tokens_saved"]
+        compressed = compression_stats["files"]
+        stats["compressed_files"] = sum(1 for f in compressed if f["tokens_after"] < f["tokens_before"])
+        stats["compression_tokens_before"] = sum(f["tokens_before"] for f in compressed)
+        stats["compression_tokens_after"] = sum(f["tokens_after"] for f in compressed)
+        stats["compression"] = compressed
+        stats["prioritized"] = prioritized
+        stats["map_stop_reason"] = map_budget.stop_reason
+        stats["covered_files"] = list(covered)
+        stats["uncovered_files"] = uncovered
+
+    if not file_summaries:
+        return None
+
+    combined_summaries = "\n\n".join(file_summaries)
 
     # --- FASE 2: REDUCE (Geração do Relatório Final) ---
     
@@ -137,14 +804,37 @@ def generate_report(scanned_files: list[dict], security_findings: list[dict]) ->
     - Não invente funcionalidades que não estão nos resumos dos arquivos.
     """
 
+    # Cópias não resumidas: o resumo do representante descreve todas elas
+    duplicates_section = ""
+    if duplicates_context:
+        duplicates_section = f"""
+    Arquivos com cópias no projeto (o resumo do primeiro arquivo de cada grupo vale também para as cópias):
+    
+    --- DUPLICATAS ---
+    {duplicates_context}
+    ------------------
+    """
+
+    # Resumo parcial: o relatório precisa deixar claro o que ficou de fora
+    coverage_section = ""
+    if coverage_context:
+        coverage_section = f"""
+    Nem todos os arquivos foram resumidos. Informe no Resumo Executivo quantos arquivos foram
+    cobertos e cite os principais arquivos não analisados:
+    
+    --- COBERTURA ---
+    {coverage_context}
+    -----------------
+    """
+
     user_prompt = f"""
     Aqui estão os resumos técnicos dos arquivos do projeto:
     
     --- RESUMOS DOS ARQUIVOS ---
     {combined_summaries}
     ----------------------------
-    
-    Aqui estão os achados de segurança detectados:
+    {duplicates_section}{coverage_section}
+    Aqui estão os achados de segurança detectados (agrupados por categoria e arquivo):
     
     --- SEGURANÇA ---
     {security_context}
@@ -158,7 +848,78 @@ def generate_report(scanned_files: list[dict], security_findings: list[dict]) ->
         {"role": "user", "content": user_prompt}
     ]
 
+    if stats is not None:
+        stats["estimated_tokens"] += sum(token_budget.count_tokens(m["content"]) for m in messages)
+
+    return messages
+
+def _count_reduce_requests(call_info: dict, stats: dict | None) -> None:
+    # Soma as requisições do relatório final às do Map (stats de build_report_messages)
+    if stats is None:
+        return
+    stats["requests"] = stats.get("requests", 0) + call_info.get("requests", 0)
+    stats["fallbacks"] = stats.get("fallbacks", 0) + call_info.get("fallbacks", 0)
+
+def generate_report(scanned_files: Iterable, security_findings: Iterable, stats: dict | None = None) -> str:
+    """
+    Gera o relatório executivo completo usando IA.
+    Implementa chunking (map-reduce) para processar os arquivos.
+
+    Args:
+        scanned_files (Iterable): Arquivos escaneados (lista de dicts ou FileHandles).
+        security_findings (Iterable): Achados de segurança (FindingIndex, FindingCollector ou lista de dicts).
+        stats (dict | None): Estatísticas da execução (ver build_report_messages, com 'requests'
+            e 'fallbacks' já somando o relatório final), além de 'report_error' (mensagem do erro,
+            se o relatório final não pôde ser gerado).
+
+    Returns:
+        str: Relatório completo em Markdown.
+    """
+    messages = build_report_messages(scanned_files, security_findings, stats=stats)
+    if messages is None:
+        return EMPTY_REPORT
+
+    call_info = {}
     try:
-        return ai_client.chat(messages)
+        return _chat(messages, "reduce", call_info)
     except Exception as e:
+        if stats is not None:
+            stats["report_error"] = str(e)
         return f"Erro ao gerar relatório final: {str(e)}"
+    finally:
+        _count_reduce_requests(call_info, stats)
+
+def stream_report(messages: list[dict] | None, stats: dict | None = None) -> Iterator[str]:
+    """
+    Gera o relatório final (fase Reduce) em pedaços, à medida que a IA responde.
+
+    Args:
+        messages (list[dict] | None): Mensagens de build_report_messages.
+        stats (dict | None): Se informado, recebe 'ttft' (segundos até o primeiro pedaço),
+            'reduce_seconds' (duração total do Reduce), as requisições do Reduce somadas a
+            'requests' e 'fallbacks' e, em caso de falha, 'report_error'.
+
+    Yields:
+        str: Pedaços do relatório em Markdown. Em caso de erro, o último pedaço é a mensagem de erro.
+    """
+    if messages is None:
+        yield EMPTY_REPORT
+        return
+
+    call_info = {}
+    try:
+        for chunk in ai_client.chat_stream(messages, call_info=call_info, model=_phase_model("reduce")):
+            if stats is not None and "ttft" not in stats:
+                stats["ttft"] = call_info.get("ttft")
+            yield chunk
+    except Exception as e:
+        if stats is not None:
+            stats["report_error"] = str(e)
+        yield f"\n\nErro ao gerar relatório final: {str(e)}"
+    finally:
+        if "latency" in call_info:
+            metrics.registry.observe("llm_call_seconds", call_info["latency"], phase="reduce")
+            metrics.registry.observe("phase_seconds", call_info["latency"], phase="reduce")
+        if stats is not None:
+            stats["reduce_seconds"] = call_info.get("latency")
+        _count_reduce_requests(call_info, stats)
@@ -0,0 +1,47 @@
+import os
+import sys
+import pytest
+
+# Os módulos do analisador são importados pelo nome (ex: "import config"), como no app e na CLI
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_client
+import config
+import metrics
+import mock_openrouter
+from rate_limiter import RateLimiter
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    """
+    Inicia servidores simulados (mock_openrouter) e aponta o ai_client para o último iniciado,
+    sem limite por minuto, com esperas curtas entre tentativas, sem modelos reserva nem
+    requisições "hedged" e com estatísticas zeradas.
+
+    Uso: settings = mock_api(latency=0.1, error_rate=0.5) (argumentos de MockSettings).
+    """
+    servers = []
+
+    def start(**settings) -> mock_openrouter.MockSettings:
+        server, url = mock_openrouter.start_mock_server(mock_openrouter.MockSettings(**settings))
+        servers.append(server)
+        monkeypatch.setattr(config, "OPENROUTER_URL", url)
+        return server.settings
+
+    monkeypatch.setattr(config, "OPENROUTER_API_KEY", "teste")
+    monkeypatch.setattr(config, "RETRY_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(config, "RETRY_BACKOFF_MAX_SECONDS", 0.05)
+    # Sem modelos reserva nem cópias de requisições, a menos que o teste os configure
+    monkeypatch.setattr(config, "FALLBACK_MODELS", [])
+    monkeypatch.setattr(config, "HEDGE_REQUESTS", False)
+    monkeypatch.setattr(config, "HEDGE_DELAY_SECONDS", 0)
+    monkeypatch.setattr(ai_client, "rate_limiter", RateLimiter(0, 0))
+    monkeypatch.setattr(ai_client, "call_stats", ai_client.CallStats())
+    monkeypatch.setattr(ai_client, "_in_flight", None)
+    metrics.registry.reset()
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
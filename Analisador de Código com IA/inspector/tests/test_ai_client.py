@@ -0,0 +1,176 @@
+import socket
+import threading
+import time
+import pytest
+import ai_client
+import config
+import metrics
+from rate_limiter import RateLimiter
+
+MESSAGES = [{"role": "user", "content": "Arquivo: app.py\n```\nprint('oi')\n```"}]
+
+def test_chat_returns_response_and_usage(mock_api):
+    settings = mock_api()
+    call_info = {}
+
+    text = ai_client.chat(MESSAGES, call_info=call_info)
+
+    assert text.startswith("Resposta simulada (1 arquivo(s)")
+    assert call_info["attempts"] == 1
+    assert call_info["prompt_tokens"] > 0
+    assert settings.requests == 1
+
+def test_retries_server_errors(mock_api):
+    settings = mock_api(fail_first=2, error_status=503)
+    call_info = {}
+
+    ai_client.chat(MESSAGES, call_info=call_info)
+
+    assert settings.requests == 3
+    assert call_info["attempts"] == 3
+    assert ai_client.call_stats.summary()["retries"] == 2
+    assert metrics.registry.counter_value("llm_retries") == 2
+
+def test_gives_up_after_max_retries(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 2)
+    settings = mock_api(error_rate=1.0, error_status=500)
+
+    with pytest.raises(ai_client.RetryableError, match="500"):
+        ai_client.chat(MESSAGES)
+
+    assert settings.requests == 3
+    assert ai_client.call_stats.summary()["failures"] == 1
+
+def test_client_errors_are_not_retried(mock_api):
+    settings = mock_api(fail_first=1, error_status=400)
+
+    with pytest.raises(Exception, match="400"):
+        ai_client.chat(MESSAGES)
+
+    assert settings.requests == 1
+
+def test_rate_limit_pauses_shared_limiter(mock_api):
+    settings = mock_api(fail_first=1, error_status=429, retry_after=0.3)
+    started = time.monotonic()
+
+    ai_client.chat(MESSAGES)
+
+    assert settings.requests == 2
+    assert time.monotonic() - started >= 0.3
+    # A pausa vale para o limitador do processo, não só para a chamada que recebeu o 429
+    assert ai_client.rate_limiter._paused_until >= started + 0.3
+    assert metrics.registry.counter_value("llm_rate_limited") == 1
+
+def test_paused_limiter_blocks_other_threads():
+    limiter = RateLimiter(0, 0)
+    limiter.pause(0.2)
+    waited = []
+
+    thread = threading.Thread(target=lambda: waited.append(limiter.acquire()))
+    thread.start()
+    thread.join()
+
+    assert waited[0] >= 0.15
+
+def test_read_timeout_is_retried(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 1)
+    settings = mock_api(latency=0.5)
+
+    with pytest.raises(ai_client.RetryableError, match="tempo limite"):
+        ai_client.chat(MESSAGES)
+
+    assert settings.requests == 2
+
+def test_connect_timeout_is_retried(mock_api, monkeypatch):
+    # Servidor que nunca aceita conexões: com a fila de espera cheia, o kernel ignora novos
+    # SYNs e a conexão só termina pelo timeout de conexão (não pelo de leitura)
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    port = listener.getsockname()[1]
+    fillers = []
+    for _ in range(3):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(("127.0.0.1", port))
+        fillers.append(filler)
+
+    monkeypatch.setattr(config, "OPENROUTER_URL", f"http://127.0.0.1:{port}/api/v1/chat/completions")
+    monkeypatch.setattr(config, "CONNECT_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(config, "TIMEOUT_SECONDS", 30)
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 1)
+    call_info = {}
+    try:
+        with pytest.raises(ai_client.RetryableError):
+            ai_client.chat(MESSAGES, call_info=call_info)
+    finally:
+        for sock in fillers + [listener]:
+            sock.close()
+
+    assert call_info["attempts"] == 2
+    assert call_info["latency"] < 5
+
+def test_connection_refused_is_retryable(mock_api, monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(config, "OPENROUTER_URL", f"http://127.0.0.1:{port}/api/v1/chat/completions")
+    monkeypatch.setattr(config, "HTTP_MAX_RETRIES", 1)
+
+    with pytest.raises(ai_client.RetryableError, match="Não foi possível conectar"):
+        ai_client.chat(MESSAGES)
+
+def test_call_stats_percentiles():
+    stats = ai_client.CallStats()
+    for latency in range(1, 101):
+        stats.record(float(latency), attempts=1, ok=True)
+    stats.record(0.5, attempts=3, ok=False)
+
+    summary = stats.summary()
+
+    assert summary["calls"] == 101
+    assert summary["retries"] == 2
+    assert summary["failures"] == 1
+    assert summary["latency_p50"] == 50.0
+    assert summary["latency_p95"] == 95.0
+
+def test_call_stats_measures_latency(mock_api):
+    mock_api(latency=0.05)
+    for _ in range(3):
+        ai_client.chat(MESSAGES)
+
+    summary = ai_client.call_stats.summary()
+
+    assert summary["calls"] == 3
+    assert 0.05 <= summary["latency_p50"] <= summary["latency_p95"] < 2
+
+def test_stream_yields_chunks(mock_api):
+    mock_api(chunk_delay=0.01)
+    expected = ai_client.chat(MESSAGES)
+    call_info = {}
+
+    chunks = list(ai_client.chat_stream(MESSAGES, call_info=call_info))
+
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == expected
+    assert 0 < call_info["ttft"] < call_info["latency"]
+    assert call_info["prompt_tokens"] > 0
+
+def test_stream_retries_before_first_chunk(mock_api):
+    settings = mock_api(fail_first=1, error_status=503)
+    call_info = {}
+
+    text = "".join(ai_client.chat_stream(MESSAGES, call_info=call_info))
+
+    assert text.startswith("Resposta simulada")
+    assert settings.requests == 2
+    assert call_info["attempts"] == 2
+
+def test_stream_decodes_utf8(mock_api):
+    report = "## Relatório de segurança: ação recomendada — revisão das funções de autenticação"
+    mock_api(reply=report)
+
+    text = "".join(ai_client.chat_stream(MESSAGES))
+
+    assert text.strip() == report
@@ -0,0 +1,8 @@
+import analyzer
+import benchmark
+
+def test_every_risky_line_triggers_a_rule():
+    # Senão a árvore sintética teria menos achados do que o risky_ratio indica
+    for line in benchmark._RISKY_LINES:
+        findings = analyzer.analyze_security([{"path": "arquivo.py", "content": line + "\n"}])
+        assert len(findings) > 0, line
@@ -0,0 +1,39 @@
+import json
+import os
+import cli
+import config
+
+def _project(root) -> str:
+    os.makedirs(root / "projeto")
+    with open(root / "projeto" / "app.py", "w", encoding="utf-8") as f:
+        f.write("print('oi')\n")
+    return str(root / "projeto")
+
+def test_cli_succeeds(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    mock_api()
+    output_dir = tmp_path / "saida"
+
+    code = cli.main([_project(tmp_path), "--output-dir", str(output_dir)])
+
+    assert code == cli.EXIT_OK
+    with open(output_dir / "summary.json", encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["errors"] == []
+    assert len(summary["projects"]) == 1
+
+def test_cli_fails_when_llm_fails(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    mock_api(error_rate=1.0, error_status=400)
+    output_dir = tmp_path / "saida"
+
+    code = cli.main([_project(tmp_path), "--output-dir", str(output_dir)])
+
+    assert code == cli.EXIT_ERROR
+    with open(output_dir / "summary.json", encoding="utf-8") as f:
+        summary = json.load(f)
+    error = summary["errors"][0]["error"]
+    assert "1 de 1 lote(s) sem resumo" in error
+    assert "relatório final não gerado" in error
+    # O relatório incompleto continua gravado
+    assert len(summary["projects"]) == 1
@@ -0,0 +1,21 @@
+import config
+import summarizer
+
+def _module(i: int) -> str:
+    body = "\n".join(f"    total += valor * {n}" for n in range(40))
+    return f'"""Módulo {i}."""\nimport os\n\ndef calcula_{i}(valor):\n    total = 0\n{body}\n    return total\n'
+
+def test_outlines_in_worker_processes(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "PROMPT_COMPRESSION", True)
+    monkeypatch.setattr(config, "PROMPT_COMPRESSION_WORKERS", 2)
+    mock_api()
+    files = [{"path": f"modulo_{i}.py", "content": _module(i)} for i in range(6)]
+    stats = {}
+
+    summarizer.build_report_messages(files, [], stats=stats)
+
+    assert stats["compressed_files"] == 6
+    assert stats["compression_tokens_after"] < stats["compression_tokens_before"]
+    # Os arquivos saem na ordem de chegada, mesmo gerados em paralelo
+    assert [f["path"] for f in stats["compression"]] == [f["path"] for f in files]
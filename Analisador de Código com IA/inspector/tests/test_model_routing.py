@@ -0,0 +1,134 @@
+import pytest
+import ai_client
+import config
+import metrics
+import summarizer
+import token_budget
+
+MESSAGES = [{"role": "user", "content": "Arquivo: app.py\n```\nprint('oi')\n```"}]
+
+def test_hedge_wins_over_slow_request(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_DELAY_SECONDS", 0.1)
+    # Com esta semente, só a primeira requisição é lenta
+    settings = mock_api(slow_rate=0.5, slow_latency=1.0, seed=7)
+    call_info = {}
+
+    ai_client.chat(MESSAGES, call_info=call_info, hedge=True)
+
+    assert call_info["hedged"] is True
+    assert call_info["latency"] < 0.8
+    assert settings.requests == 2
+    assert settings.slow_requests == 1
+    summary = ai_client.call_stats.summary()
+    assert summary["hedges"] == 1
+    assert summary["hedge_wins"] == 1
+    # A cópia é uma requisição a mais à API
+    assert call_info["requests"] == 2
+    assert summary["requests"] == 2
+    assert metrics.registry.counter_value("llm_http_requests", model=config.OPENROUTER_MODEL) == 2
+    assert metrics.registry.counter_value("llm_hedges", model=config.OPENROUTER_MODEL) == 1
+
+def test_fast_request_is_not_hedged(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_DELAY_SECONDS", 0.5)
+    settings = mock_api()
+    call_info = {}
+
+    ai_client.chat(MESSAGES, call_info=call_info, hedge=True)
+
+    assert call_info["hedged"] is False
+    assert settings.requests == 1
+    assert ai_client.call_stats.summary()["hedges"] == 0
+
+def test_adaptive_hedge_waits_for_samples(mock_api):
+    settings = mock_api(slow_rate=1.0, slow_latency=0.2)
+    call_info = {}
+
+    # Sem HEDGE_DELAY_SECONDS e sem amostras do modelo, nenhuma cópia é enviada
+    ai_client.chat(MESSAGES, call_info=call_info, hedge=True)
+
+    assert "hedged" not in call_info
+    assert settings.requests == 1
+
+def test_falls_back_to_next_model(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "FALLBACK_MODELS", ["reserva/modelo"])
+    settings = mock_api(failing_models={"principal/modelo"})
+    call_info = {}
+
+    text = ai_client.chat(MESSAGES, call_info=call_info, model="principal/modelo")
+
+    assert text.startswith("Resposta simulada")
+    assert call_info["model"] == "reserva/modelo"
+    assert settings.models == {"principal/modelo": 1, "reserva/modelo": 1}
+    assert ai_client.call_stats.summary()["fallbacks"] == 1
+    assert metrics.registry.counter_value("llm_fallbacks", model="principal/modelo") == 1
+    assert call_info["requests"] == 2
+    assert call_info["fallbacks"] == 1
+
+def test_raises_when_every_model_fails(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "FALLBACK_MODELS", ["reserva/modelo"])
+    settings = mock_api(failing_models={"principal/modelo", "reserva/modelo"})
+
+    with pytest.raises(Exception, match="404"):
+        ai_client.chat(MESSAGES, model="principal/modelo")
+
+    assert settings.requests == 2
+
+def test_fallback_summaries_are_not_cached(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "MAP_MODEL", "principal/modelo")
+    monkeypatch.setattr(config, "FALLBACK_MODELS", ["reserva/modelo"])
+    files = [{"path": "app.py", "content": "print('oi')\n"}]
+
+    # 1. O modelo do Map está fora: o resumo vem do reserva e não entra no cache
+    settings = mock_api(failing_models={"principal/modelo"})
+    stats = {}
+    summarizer.build_report_messages(files, [], stats=stats)
+    summarizer.build_report_messages(files, [], stats=stats)
+    assert stats["cache_hits"] == 0
+    assert settings.models["reserva/modelo"] == 2
+
+    # 2. Com o modelo do Map de volta, o resumo é guardado e a execução seguinte usa o cache
+    mock_api()
+    summarizer.build_report_messages(files, [], stats=stats)
+    stats = {}
+    summarizer.build_report_messages(files, [], stats=stats)
+    assert stats["cache_hits"] == 1
+
+def test_report_stats_count_hedges_and_fallbacks(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "HEDGE_REQUESTS", True)
+    monkeypatch.setattr(config, "HEDGE_DELAY_SECONDS", 0.1)
+    monkeypatch.setattr(config, "MAP_MODEL", "principal/modelo")
+    monkeypatch.setattr(config, "REDUCE_MODEL", "principal/modelo")
+    monkeypatch.setattr(config, "FALLBACK_MODELS", ["reserva/modelo"])
+    # O modelo principal falha e o reserva demora: cada resumo vai a dois modelos e recebe uma cópia
+    settings = mock_api(failing_models={"principal/modelo"}, slow_rate=1.0, slow_latency=0.3)
+    files = [{"path": "app.py", "content": "print('oi')\n"}]
+    stats = {}
+
+    summarizer.generate_report(files, [], stats=stats)
+
+    # Map: principal + reserva + cópia do reserva; Reduce (sem hedge): principal + reserva
+    assert stats["requests"] == 5
+    assert stats["hedges"] == 1
+    assert stats["fallbacks"] == 2
+    assert stats["requests"] == settings.requests
+
+def test_tree_reduce_merges_within_map_budget(monkeypatch):
+    monkeypatch.setattr(config, "MAP_TOKEN_BUDGET", 300)
+    merged_sizes = []
+
+    def merge(directory, summaries, cache_stats=None, request_counter=None):
+        merged_sizes.append(token_budget.count_tokens("\n\n".join(summaries)))
+        return f"Módulo {directory}: consolidado"
+
+    monkeypatch.setattr(summarizer, "_merge_summaries", merge)
+    items = [(f"pkg{i % 2}", f"Resumo {i}: " + "detalhe " * 20) for i in range(80)]
+    stats = {"reduce_levels": 0, "reduce_merges": 0, "estimated_tokens": 0}
+
+    # Orçamento do Reduce final bem maior que o do Map: as consolidações seguem o do Map
+    summarizer._tree_reduce(items, 2000, None, stats)
+
+    assert merged_sizes
+    assert max(merged_sizes) <= 300
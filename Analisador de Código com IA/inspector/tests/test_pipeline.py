@@ -0,0 +1,99 @@
+import pytest
+import os
+import config
+import pipeline
+
+def _write(root, path: str, content: str) -> None:
+    full_path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def test_pipeline_reuses_scan_index(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "USE_SCAN_INDEX", True)
+    mock_api()
+    project = tmp_path / "projeto"
+    _write(project, "app.py", "import util\nprint(util.soma(1, 2))\n")
+    _write(project, "util.py", "def soma(a, b):\n    return a + b\n")
+    _write(project, "config.py", 'API_KEY = "sk-abcdefghijklmnopqrstuvwxyz123456"\n')
+
+    # 1. Primeira execução: todos os arquivos passam pelas regras
+    stats = {}
+    _, findings, _ = pipeline.run_pipeline(str(project), stats=stats)
+    assert stats["index"] == {"reused": 0, "recomputed": 3, "removed": 0}
+    first_findings = findings.to_dicts()
+    assert first_findings
+
+    # 2. Sem alterações: os achados vêm do índice
+    stats = {}
+    _, findings, _ = pipeline.run_pipeline(str(project), stats=stats)
+    assert stats["index"] == {"reused": 3, "recomputed": 0, "removed": 0}
+    assert findings.to_dicts() == first_findings
+
+    # 3. Um arquivo alterado e um removido
+    _write(project, "util.py", "def soma(a, b):\n    return b + a\n\n# alterado\n")
+    os.remove(project / "app.py")
+    stats = {}
+    pipeline.run_pipeline(str(project), stats=stats)
+    assert stats["index"] == {"reused": 1, "recomputed": 1, "removed": 1}
+
+def test_pipeline_without_scan_index(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "USE_SCAN_INDEX", False)
+    mock_api()
+    _write(tmp_path / "projeto", "app.py", "print('oi')\n")
+
+    stats = {}
+    pipeline.run_pipeline(str(tmp_path / "projeto"), stats=stats)
+
+    assert stats["index"] is None
+
+def test_warm_rerun_only_sends_changed_batches(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "MAP_TOKEN_BUDGET", 1500)
+    monkeypatch.setattr(config, "REDUCE_TOKEN_BUDGET", 1000000)
+    mock_api()
+    project = tmp_path / "projeto"
+    for i in range(120):
+        _write(project, f"pkg{i // 30}/modulo_{i}.py", f"VALOR_{i} = {i}\n" * (20 + i % 50))
+
+    cold = {}
+    pipeline.run_pipeline(str(project), stats=cold)
+    batches = cold["report"]["map_batches"]
+    assert batches > 10
+    assert cold["report"]["cache_misses"] == batches
+
+    _write(project, "pkg2/modulo_70.py", "VALOR_70 = 70\n" * 200)
+    warm = {}
+    pipeline.run_pipeline(str(project), stats=warm)
+
+    assert warm["report"]["map_batches"] >= batches
+    assert 1 <= warm["report"]["cache_misses"] <= 3
+
+def test_stage_error_stops_map_calls(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "USE_SCAN_INDEX", False)
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "LLM_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "MAP_MAX_FILES_PER_BATCH", 1)
+    settings = mock_api(latency=0.05)
+    project = tmp_path / "projeto"
+    for i in range(40):
+        _write(project, f"modulo_{i:02d}.py", f"VALOR_{i} = {i}\n")
+    analyze_file = pipeline.analyzer.analyze_file
+
+    def failing_analyze(handle):
+        if handle.path == "modulo_30.py":
+            raise RuntimeError("falha simulada na análise")
+        return analyze_file(handle)
+
+    monkeypatch.setattr(pipeline.analyzer, "analyze_file", failing_analyze)
+
+    with pytest.raises(RuntimeError, match="falha simulada"):
+        pipeline.run_pipeline(str(project))
+
+    # A análise chega ao arquivo com falha bem antes dos resumos: a execução para ali,
+    # sem resumir os arquivos que já estavam na fila
+    assert settings.requests < 10
@@ -0,0 +1,44 @@
+import os
+import threading
+import config
+import scan_index
+import scanner
+
+def _project(root, name: str, files: int) -> str:
+    folder = os.path.join(root, name)
+    os.makedirs(folder)
+    for i in range(files):
+        with open(os.path.join(folder, f"modulo_{i}.py"), "w", encoding="utf-8") as f:
+            f.write(f'API_KEY_{i} = "sk-abcdefghijklmnopqrstuvwxyz{i:06d}"\n')
+    return folder
+
+def test_open_index_does_not_lock_other_projects(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(scan_index, "INDEX_BUSY_TIMEOUT_SECONDS", 0.5)
+    first = _project(tmp_path, "primeiro", 3)
+    second = _project(tmp_path, "segundo", 3)
+
+    # 1. Um índice aberto e já com gravações, como no pipeline enquanto espera pela IA
+    index = scan_index.FileIndex(first)
+    for handle in scanner.iter_project(first):
+        index.analyze(handle)
+
+    # 2. Outra análise (em outra thread, como na CLI com --jobs) grava no mesmo banco
+    errors = []
+
+    def other_project():
+        try:
+            other = scan_index.FileIndex(second)
+            for handle in scanner.iter_project(second):
+                other.analyze(handle)
+            other.close()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=other_project)
+    thread.start()
+    thread.join()
+    index.close()
+
+    assert errors == []
+    assert index.stats() == {"reused": 0, "recomputed": 3, "removed": 0}
@@ -0,0 +1,130 @@
+import os
+import time
+import config
+import scanner
+import scheduler
+import summarizer
+from findings import FindingIndex
+
+def _write(root, path: str, content: str) -> None:
+    full_path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def _files(count: int) -> list[dict]:
+    return [{"path": f"modulo_{i}.py", "content": f"VALOR_{i} = {i}\n"} for i in range(count)]
+
+def test_rank_files_does_not_load_contents(tmp_path):
+    _write(tmp_path, "app.py", "import util\nprint(util.soma(1, 2))\n")
+    _write(tmp_path, "util.py", "def soma(a, b):\n    return a + b\n")
+    _write(tmp_path, "lib/helpers.py", "import util\n" + "# comentário\n" * 5000)
+    with open(tmp_path / "dados.py", "wb") as f:
+        f.write(b"\0\1\2")
+    handles = list(scanner.iter_project(str(tmp_path)))
+    scores = {}
+
+    ranked = scheduler.rank_files(handles, FindingIndex([]), scores)
+
+    assert not any(handle.is_loaded for handle in handles)
+    assert ranked[0].path == "app.py"
+    # util.py é importado por dois arquivos; o de helpers está no início, dentro do trecho lido
+    assert scores["util.py"] > scores["dados.py"]
+    assert next(h for h in handles if h.path == "dados.py").skip_reason == "binary"
+
+def test_deadline_stops_waiting_for_in_flight_batches(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "LLM_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "MAP_MAX_FILES_PER_BATCH", 1)
+    monkeypatch.setattr(config, "MAP_DEADLINE_SECONDS", 0.3)
+    mock_api(latency=0.6)
+    stats = {}
+    started = time.monotonic()
+
+    summarizer.build_report_messages(_files(4), [], stats=stats)
+
+    # O primeiro lote é aguardado; o segundo, já enviado, não (o prazo passou durante o primeiro)
+    assert time.monotonic() - started < 1.0
+    assert stats["map_stop_reason"] == "deadline"
+    assert len(stats["covered_files"]) == 1
+    assert len(stats["uncovered_files"]) == 3
+    assert stats["failed_batches"] == 0
+
+def test_failed_batches_are_not_covered(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "LLM_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "MAP_MAX_FILES_PER_BATCH", 1)
+    monkeypatch.setattr(config, "PRIORITIZE_FILES", True)
+    mock_api(fail_first=1, error_status=400)
+    stats = {}
+
+    summarizer.build_report_messages(_files(3), [], stats=stats)
+
+    assert stats["failed_batches"] == 1
+    assert len(stats["covered_files"]) == 2
+    assert len(stats["uncovered_files"]) == 1
+    assert stats["uncovered_files"][0] not in stats["covered_files"]
+    assert stats["map_stop_reason"] is None
+
+def test_failed_batches_are_uncovered_without_prioritization(mock_api, monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "LLM_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "MAP_MAX_FILES_PER_BATCH", 1)
+    mock_api(fail_first=1, error_status=400)
+    stats = {}
+
+    messages = summarizer.build_report_messages(_files(3), [], stats=stats)
+
+    assert stats["prioritized"] is False
+    assert stats["uncovered_files"] == ["modulo_0.py"]
+    assert "Arquivos resumidos: 2 de 3;" in messages[-1]["content"]
+
+def test_deadline_starts_with_first_batch():
+    budget = scheduler.MapBudget(deadline_seconds=0.05)
+    # Tempo gasto antes do primeiro lote (leitura, análise e ordenação) não conta
+    time.sleep(0.1)
+
+    assert budget.deadline is None
+    assert budget.admit(10)
+    assert budget.admit(10)
+    assert budget.stop_reason is None
+
+def test_coverage_detail_names_each_stop_reason():
+    assert "prazo" in summarizer.coverage_detail("deadline")
+    assert "orçamento de tokens" in summarizer.coverage_detail("tokens")
+    assert "falhou" in summarizer.coverage_detail(None)
+
+def test_late_batches_are_not_cached(mock_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "LLM_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "MAP_MAX_FILES_PER_BATCH", 1)
+    monkeypatch.setattr(config, "MAP_DEADLINE_SECONDS", 0.3)
+    mock_api(latency=0.6)
+    files = _files(3)
+    summarizer.build_report_messages(files, [], stats={})
+    # O segundo lote, abandonado no prazo, termina em segundo plano
+    time.sleep(1.0)
+
+    monkeypatch.setattr(config, "MAP_DEADLINE_SECONDS", 0)
+    mock_api()
+    stats = {}
+    summarizer.build_report_messages(files, [], stats=stats)
+
+    assert stats["cache_hits"] == 1
+
+def test_rank_files_resolves_native_separators(monkeypatch):
+    # Caminhos como o scanner gera no Windows (os.sep = "\\")
+    monkeypatch.setattr(scheduler.os, "sep", "\\")
+    files = [
+        {"path": "pkg\\app.py", "content": "import pkg.util\n"},
+        {"path": "pkg\\util.py", "content": "VALOR = 1\n"},
+        {"path": "pkg\\sub\\outro.py", "content": "import pkg.util\n"}
+    ]
+    scores = {}
+
+    scheduler.rank_files(files, FindingIndex([]), scores)
+
+    # util.py é importado pelos outros dois; a profundidade segue as pastas
+    assert scores["pkg\\util.py"] - scores["pkg\\sub\\outro.py"] > 2 * scheduler.IMPORTER_WEIGHT
+    assert scores["pkg\\app.py"] > scheduler.ENTRY_POINT_WEIGHT - scheduler.DEPTH_PENALTY - 1
@@ -0,0 +1,39 @@
+import random
+import token_budget
+
+def _project(seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {"path": f"pkg{i // 25}/modulo_{i}.py", "content": "x = 1\n" * rng.randint(5, 400)}
+        for i in range(300)
+    ]
+
+def _keys(batches) -> list[tuple]:
+    return [tuple((f["path"], f["content"]) for f in batch) for batch in batches]
+
+def test_batches_fit_budget():
+    budget = 4000
+    for batch in token_budget.pack_batches(_project(), budget=budget):
+        tokens = sum(token_budget.count_tokens(f["content"]) for f in batch)
+        assert len(batch) == 1 or tokens <= budget
+
+def test_one_changed_file_keeps_other_batches():
+    files = _project()
+    before = _keys(token_budget.pack_batches([dict(f) for f in files], budget=4000))
+
+    # O arquivo do meio cresce: só o seu lote (e no máximo os seguintes até a próxima âncora) muda
+    files[150]["content"] += "y = 2\n" * 200
+    after = _keys(token_budget.pack_batches([dict(f) for f in files], budget=4000))
+
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 3
+    assert len(after) > 15
+
+def test_added_file_keeps_other_batches():
+    files = _project()
+    before = _keys(token_budget.pack_batches([dict(f) for f in files], budget=4000))
+
+    files.insert(100, {"path": "pkg4/novo.py", "content": "z = 3\n"})
+    after = _keys(token_budget.pack_batches([dict(f) for f in files], budget=4000))
+
+    assert 1 <= len(set(after) - set(before)) <= 3
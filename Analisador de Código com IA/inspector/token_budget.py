@@ -0,0 +1,223 @@
+import threading
+import zlib
+from typing import Iterable, Iterator
+import config
+import scanner
+
+# Encoder do tiktoken, carregado na primeira contagem (None = ainda não tentou, False = indisponível)
+_encoder = None
+_encoder_lock = threading.Lock()
+
+# Tokens aproximados do texto fixo do prompt do Map (instruções)
+MAP_PROMPT_OVERHEAD_TOKENS = 80
+
+# Em média, um a cada tantos caminhos é "âncora": sempre abre um lote novo (ver pack_batches)
+_BATCH_ANCHOR_FILES = 8
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # tiktoken ausente ou sem acesso para baixar o vocabulário: usa a estimativa simples
+                    _encoder = False
+    return _encoder
+
+def count_tokens(text: str) -> int:
+    """
+    Conta (ou estima) os tokens de um texto.
+    Usa o tiktoken quando disponível; caso contrário, ~4 caracteres por token.
+    """
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def map_token_budget(model: str | None = None) -> int:
+    """
+    Orçamento de tokens de entrada de cada requisição do Map para o modelo informado.
+
+    Usa config.MAP_TOKEN_BUDGET se definido; caso contrário, metade da janela de contexto
+    do modelo (o restante fica para a resposta), limitado a config.MAP_TOKEN_BUDGET_CAP.
+    """
+    if config.MAP_TOKEN_BUDGET > 0:
+        return config.MAP_TOKEN_BUDGET
+    model = model or config.MAP_MODEL
+    context = config.MODEL_CONTEXT_TOKENS.get(model, config.DEFAULT_CONTEXT_TOKENS)
+    return min(context // 2, config.MAP_TOKEN_BUDGET_CAP)
+
+def reduce_token_budget(model: str | None = None) -> int:
+    """
+    Orçamento de tokens dos resumos enviados em uma requisição do Reduce.
+    Usa config.REDUCE_TOKEN_BUDGET se definido; caso contrário, o mesmo cálculo do Map
+    para o modelo do Reduce (config.REDUCE_MODEL).
+    """
+    if config.REDUCE_TOKEN_BUDGET > 0:
+        return config.REDUCE_TOKEN_BUDGET
+    return map_token_budget(model or config.REDUCE_MODEL)
+
+def _file_header(path: str) -> str:
+    return f"Arquivo: {path}\n```\n\n```"
+
+def _split_file(path: str, content: str, budget: int, line_offset: int = 0) -> list[dict]:
+    """
+    Divide um arquivo grande em segmentos de linhas que cabem no orçamento.
+    Linhas maiores que o orçamento (ex: código minificado) são quebradas em pedaços.
+    line_offset é o número de linhas antes de content (pedaços de arquivos lidos em partes).
+
+    Returns:
+        list[dict]: Segmentos com 'path', 'content', 'line_offset' (linhas antes do segmento),
+        'first_line', 'last_line' e 'label' (descrição usada no prompt).
+    """
+    # Pedaços (índice da linha, texto), com linhas muito longas já quebradas
+    pieces = []
+    max_chars = max(1, budget * 2)
+    for line_index, line in enumerate(content.splitlines(keepends=True), start=line_offset):
+        for start in range(0, len(line), max_chars):
+            pieces.append((line_index, line[start:start + max_chars]))
+
+    segments = []
+    current = []
+    current_tokens = 0
+    for line_index, text in pieces:
+        piece_tokens = count_tokens(text)
+        if current and current_tokens + piece_tokens > budget:
+            segments.append(current)
+            current = []
+            current_tokens = 0
+        current.append((line_index, text))
+        current_tokens += piece_tokens
+    if current:
+        segments.append(current)
+
+    total = len(segments)
+    return [
+        {
+            "path": path,
+            "content": "".join(text for _, text in segment),
+            "line_offset": segment[0][0],
+            "first_line": segment[0][0] + 1,
+            "last_line": segment[-1][0] + 1,
+            "label": f"{path} (parte {i}/{total}, linhas {segment[0][0] + 1}-{segment[-1][0] + 1})"
+        }
+        for i, segment in enumerate(segments, start=1)
+    ]
+
+def _large_file_segments(handle: scanner.FileHandle, budget: int) -> Iterator[dict]:
+    """
+    Segmentos de um arquivo grande demais para ser carregado (FileHandle.is_large), lido em pedaços.
+    Apenas os primeiros config.LARGE_FILE_SUMMARY_SEGMENTS segmentos são gerados; o restante
+    do arquivo nem chega a ser lido.
+    """
+    produced = 0
+    for line_offset, text in handle.iter_chunks():
+        for segment in _split_file(handle.path, text, budget, line_offset):
+            if produced >= config.LARGE_FILE_SUMMARY_SEGMENTS:
+                return
+            produced += 1
+            segment["label"] = (
+                f"{handle.path} (arquivo grande, trecho {produced}, "
+                f"linhas {segment['first_line']}-{segment['last_line']})"
+            )
+            yield segment
+
+def pack_batches(
+    files: Iterable,
+    budget: int | None = None,
+    max_files: int | None = None,
+    stats: dict | None = None
+) -> Iterator[list]:
+    """
+    Agrupa os arquivos, na ordem recebida, em lotes que cabem no orçamento de tokens de cada requisição.
+
+    As fronteiras dos lotes são estáveis entre execuções, para que o cache de resumos (chave pelo
+    conteúdo do lote) continue valendo quando só alguns arquivos mudam: um lote novo começa quando
+    o próximo arquivo não cabe ou quando o caminho dele é uma "âncora" (hash do caminho múltiplo de
+    _BATCH_ANCHOR_FILES). Alterar, incluir ou remover um arquivo muda apenas o seu lote (e, se o
+    tamanho passar do orçamento, os seguintes até a próxima âncora). Arquivos maiores que
+    o orçamento são divididos em segmentos de linhas, cada um em seu próprio lote. Arquivos
+    grandes demais para a memória (FileHandle.is_large) são lidos em pedaços e só o início
+    deles é resumido (config.LARGE_FILE_SUMMARY_SEGMENTS segmentos).
+
+    Args:
+        files (Iterable): Arquivos já carregados (dicts ou FileHandles de scanner.prefetch).
+        budget (int | None): Tokens de entrada por requisição. Padrão: map_token_budget().
+        max_files (int | None): Máximo de arquivos por lote. Padrão: config.MAP_MAX_FILES_PER_BATCH.
+        stats (dict | None): Se informado, acumula 'batches', 'estimated_tokens', 'chunked_files'
+            e 'large_files' (lidos em pedaços).
+
+    Yields:
+        list: Lotes de arquivos (ou segmentos) para o _summarize_batch.
+    """
+    budget = budget or map_token_budget()
+    max_files = max_files or config.MAP_MAX_FILES_PER_BATCH
+    # Espaço disponível para arquivos, descontadas as instruções do prompt
+    capacity = max(1, budget - MAP_PROMPT_OVERHEAD_TOKENS)
+
+    if stats is not None:
+        stats.setdefault("batches", 0)
+        stats.setdefault("estimated_tokens", 0)
+        stats.setdefault("chunked_files", 0)
+        stats.setdefault("large_files", 0)
+
+    def emit(tokens: int, items: list) -> list:
+        if stats is not None:
+            stats["batches"] += 1
+            stats["estimated_tokens"] += tokens + MAP_PROMPT_OVERHEAD_TOKENS
+        return items
+
+    # Lote aberto: [tokens, itens]
+    open_bin = None
+
+    for file_info in files:
+        # 0. Arquivo grande demais para a memória: segmentos lidos em pedaços, um por lote
+        if isinstance(file_info, scanner.FileHandle) and file_info.is_large:
+            segment_budget = capacity - count_tokens(_file_header(file_info.path)) - 32
+            for segment in _large_file_segments(file_info, max(1, segment_budget)):
+                segment_cost = count_tokens(segment["content"]) + count_tokens(_file_header(segment["label"]))
+                yield emit(segment_cost, [segment])
+            if stats is not None and file_info.skip_reason is None:
+                stats["large_files"] += 1
+            continue
+
+        content = file_info["content"]
+        if content is None:
+            # Arquivo binário ou ilegível (detectado apenas na leitura sob demanda)
+            continue
+
+        path = file_info["path"]
+        cost = count_tokens(content) + count_tokens(_file_header(path))
+
+        # 1. Arquivo grande demais para uma requisição: vira vários segmentos
+        if cost > capacity:
+            if stats is not None:
+                stats["chunked_files"] += 1
+            segment_budget = capacity - count_tokens(_file_header(path)) - 16
+            for segment in _split_file(path, content, max(1, segment_budget)):
+                if file_info.get("redacted"):
+                    # Esboço já mascarado: as linhas não são as do arquivo original
+                    segment["redacted"] = True
+                segment_cost = count_tokens(segment["content"]) + count_tokens(_file_header(segment["label"]))
+                yield emit(segment_cost, [segment])
+            # Os segmentos têm cópias próprias do texto
+            scanner.release(file_info)
+            continue
+
+        # 2. Fecha o lote aberto se o arquivo não couber nele ou se o caminho for uma âncora
+        anchor = zlib.crc32(path.encode("utf-8")) % _BATCH_ANCHOR_FILES == 0
+        if open_bin is not None and (
+            anchor or open_bin[0] + cost > capacity or len(open_bin[1]) >= max_files
+        ):
+            yield emit(*open_bin)
+            open_bin = None
+        if open_bin is None:
+            open_bin = [0, []]
+        open_bin[0] += cost
+        open_bin[1].append(file_info)
+
+    if open_bin is not None:
+        yield emit(*open_bin)